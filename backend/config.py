@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -40,6 +41,40 @@ class Settings(BaseSettings):
 
     email_verification_ttl_minutes: int = Field(default=60, ge=5, le=1440)
 
+    # Password hashing. Changing bcrypt_rounds upgrades hashes on next login.
+    bcrypt_rounds: int = Field(default=12, ge=10, le=16)
+    password_hash_workers: int = Field(default=4, ge=1, le=64)
+    password_hash_max_queue: int = Field(default=32, ge=0)
+
+    # Redis cache value encoding (see services/codec.py). Values at or above
+    # the threshold are zstd-compressed.
+    cache_codec: Literal["json", "msgpack"] = Field(default="msgpack")
+    cache_compress_min_bytes: int = Field(default=1024, ge=0)
+
+    # Title autocomplete: each process rebuilds its in-memory index this often.
+    autocomplete_refresh_seconds: int = Field(default=900, ge=30)
+
+    # Trending: each rating's weight halves every trending_half_life_hours.
+    trending_half_life_hours: float = Field(default=24.0, gt=0)
+
+    # Emotion recommendations: re-rank the precomputed pool by the user's
+    # embedding (one extra query per request) instead of plain popularity.
+    emotion_personalize: bool = Field(default=False)
+
+    # Circuit breaker for backend → ML service calls (one per service).
+    ml_breaker_window_seconds: float = Field(default=30.0, gt=0)
+    ml_breaker_min_calls: int = Field(default=10, ge=1)
+    ml_breaker_error_rate: float = Field(default=0.5, gt=0, le=1)
+    ml_breaker_slow_call_seconds: float = Field(default=2.0, gt=0)
+    ml_breaker_slow_call_rate: float = Field(default=0.8, gt=0, le=1)
+    ml_breaker_open_seconds: float = Field(default=15.0, gt=0)
+    ml_breaker_half_open_probes: int = Field(default=2, ge=1)
+
+    # Hedged requests for idempotent ML calls (/search, /recommend).
+    ml_hedge_enabled: bool = Field(default=True)
+    ml_hedge_min_delay_ms: int = Field(default=50, ge=1)
+    ml_hedge_default_delay_ms: int = Field(default=1000, ge=1)
+
     @field_validator("allowed_origins", mode="before")
     @classmethod
     def parse_origins(cls, v: str | list[str]) -> list[str]:
@@ -0,0 +1,42 @@
+"""add movies.rating_sum for incremental rating aggregates
+
+`avg_rating` / `rating_count` used to be rebuilt with `AVG(score)` and
+`COUNT(*)` over every rating of the movie on each write. Keeping a running
+`rating_sum` next to `rating_count` lets the ratings endpoints apply a delta
+instead, so the cost of a write no longer grows with the movie's popularity.
+
+The column is backfilled from `ratings` here; afterwards it is maintained by
+the ratings router and reconciled by `recompute_movie_ratings`.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE movies ADD COLUMN IF NOT EXISTS rating_sum NUMERIC(12,1) NOT NULL DEFAULT 0"
+    )
+    op.execute(
+        """
+        UPDATE movies m SET
+            rating_sum = r.total,
+            rating_count = r.cnt
+        FROM (
+            SELECT movie_id, SUM(score) AS total, COUNT(*)::int AS cnt
+            FROM ratings GROUP BY movie_id
+        ) r
+        WHERE m.id = r.movie_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE movies DROP COLUMN IF EXISTS rating_sum")
@@ -0,0 +1,44 @@
+"""incremental popularity scoring: change tracking + normalisation bounds
+
+`update_popularity_scores` used to rewrite every movie's score each hour.
+It now only revisits movies whose rating aggregates changed since its last
+run, so rating writes stamp `movies.ratings_changed_at`, and the min/max of
+the raw score used for normalisation is kept in the single-row
+`popularity_stats` table.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE movies ADD COLUMN IF NOT EXISTS ratings_changed_at TIMESTAMPTZ")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_movies_ratings_changed "
+        "ON movies(ratings_changed_at) WHERE ratings_changed_at IS NOT NULL"
+    )
+    # Empty on purpose: the first run finds no row and does a full recompute.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS popularity_stats (
+            id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            raw_min DOUBLE PRECISION NOT NULL,
+            raw_max DOUBLE PRECISION NOT NULL,
+            last_run_at TIMESTAMPTZ NOT NULL,
+            full_recompute_at TIMESTAMPTZ NOT NULL
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS popularity_stats")
+    op.execute("DROP INDEX IF EXISTS idx_movies_ratings_changed")
+    op.execute("ALTER TABLE movies DROP COLUMN IF EXISTS ratings_changed_at")
@@ -0,0 +1,33 @@
+"""precomputed onboarding pool
+
+The onboarding endpoint used to aggregate COUNT / STDDEV over the whole
+ratings table on every cache miss. `refresh_onboarding_pool` (Celery beat)
+now stores the ranked divisive-movie pool here and the endpoint only reads it.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS onboarding_pool (
+            rank SMALLINT PRIMARY KEY,
+            movie_id INTEGER NOT NULL REFERENCES movies(id) ON DELETE CASCADE,
+            divisive_score DOUBLE PRECISION NOT NULL,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS onboarding_pool")
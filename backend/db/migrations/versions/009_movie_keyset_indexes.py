@@ -0,0 +1,42 @@
+"""composite (sort key, id) indexes for keyset pagination of /movies
+
+`list_movies` pages with an opaque (sort key, id) cursor and orders by
+`<key> DESC, id ASC`. One index per `order_by` lets each page be a range
+scan that stops after `limit + 1` rows. Nullable keys are indexed as
+`COALESCE(col, -1)`, matching the expressions in the query.
+
+`idx_movies_popularity` is superseded by the popularity composite index.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_movies_popularity_id "
+        "ON movies (popularity_score DESC, id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_movies_rating_key_id "
+        "ON movies ((COALESCE(avg_rating, -1)) DESC, id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_movies_year_key_id "
+        "ON movies ((COALESCE(year, -1)) DESC, id)"
+    )
+    op.execute("DROP INDEX IF EXISTS idx_movies_popularity")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS idx_movies_popularity ON movies(popularity_score DESC)")
+    op.execute("DROP INDEX IF EXISTS idx_movies_year_key_id")
+    op.execute("DROP INDEX IF EXISTS idx_movies_rating_key_id")
+    op.execute("DROP INDEX IF EXISTS idx_movies_popularity_id")
@@ -0,0 +1,34 @@
+"""precomputed item-to-item neighbours for /movies/{id}/similar
+
+One row per movie holding its top-K most similar movies by embedding cosine
+similarity, best first. Written by the `refresh_movie_neighbors` Celery task;
+the endpoint reads a single row by primary key instead of scanning
+`embedding <=> ...` per request.
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS movie_neighbors (
+            movie_id INTEGER PRIMARY KEY REFERENCES movies(id) ON DELETE CASCADE,
+            neighbor_ids INTEGER[] NOT NULL,
+            similarities REAL[] NOT NULL,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS movie_neighbors")
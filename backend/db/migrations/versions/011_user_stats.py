@@ -0,0 +1,79 @@
+"""materialised per-user rating stats for /auth/me/stats
+
+`get_me_stats` used to run three aggregates over the user's ratings on every
+profile view. The ratings endpoints now keep these up to date by delta:
+
+- `user_stats`: one row per user — count, score sum, first / last rating
+  time, and a 10-bucket score histogram (index i holds score (i + 1) / 2).
+- `user_genre_counts`: ratings per (user, genre).
+
+`reconcile_user_stats` (Celery beat) corrects any drift. Both tables are
+backfilled from `ratings` here.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "011"
+down_revision = "010"
+branch_labels = None
+depends_on = None
+
+_HIST_BUCKETS = ", ".join(f"COUNT(*) FILTER (WHERE r.score * 2 = {b})" for b in range(1, 11))
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            total INTEGER NOT NULL DEFAULT 0,
+            score_sum NUMERIC(12,1) NOT NULL DEFAULT 0,
+            score_hist INTEGER[] NOT NULL DEFAULT ARRAY_FILL(0, ARRAY[10]),
+            first_at TIMESTAMPTZ,
+            last_at TIMESTAMPTZ
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_genre_counts (
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            genre_id SMALLINT NOT NULL REFERENCES genres(id) ON DELETE CASCADE,
+            cnt INTEGER NOT NULL,
+            PRIMARY KEY (user_id, genre_id)
+        )
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO user_stats (user_id, total, score_sum, score_hist, first_at, last_at)
+        SELECT
+            r.user_id,
+            COUNT(*)::int,
+            SUM(r.score),
+            ARRAY[{_HIST_BUCKETS}]::int[],
+            MIN(r.created_at),
+            MAX(r.created_at)
+        FROM ratings r
+        GROUP BY r.user_id
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_genre_counts (user_id, genre_id, cnt)
+        SELECT r.user_id, mg.genre_id, COUNT(*)::int
+        FROM ratings r
+        JOIN movie_genres mg ON mg.movie_id = r.movie_id
+        GROUP BY r.user_id, mg.genre_id
+        ON CONFLICT (user_id, genre_id) DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS user_genre_counts")
+    op.execute("DROP TABLE IF EXISTS user_stats")
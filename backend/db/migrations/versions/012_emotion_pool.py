@@ -0,0 +1,35 @@
+"""precomputed emotion recommendation pools
+
+The emotion endpoint ran a movies x genres GROUP BY on every request even
+though its answer only depends on the detected emotion.
+`refresh_emotion_pools` (Celery beat) stores the ranked pool per emotion here
+and the API serves it from a Redis copy.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "012"
+down_revision = "011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS emotion_pool (
+            emotion TEXT NOT NULL,
+            rank SMALLINT NOT NULL,
+            movie_id INTEGER NOT NULL REFERENCES movies(id) ON DELETE CASCADE,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (emotion, rank)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS emotion_pool")
@@ -0,0 +1,34 @@
+"""stamp ratings_changed_at when a movie is inserted
+
+`update_popularity_scores` also had to pick up newly imported movies, and
+matching `ratings_changed_at > $1 OR created_at > $1` can't use either
+index, so every hourly run scanned the whole catalog. New rows now get
+`ratings_changed_at` on insert and the task filters on that column alone.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "013"
+down_revision = "012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE movies ALTER COLUMN ratings_changed_at SET DEFAULT NOW()")
+    # Movies imported since the last popularity run would otherwise be missed.
+    op.execute(
+        """
+        UPDATE movies m SET ratings_changed_at = m.created_at
+        FROM popularity_stats s
+        WHERE m.ratings_changed_at IS NULL
+          AND m.created_at > s.last_run_at - INTERVAL '5 minutes'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE movies ALTER COLUMN ratings_changed_at DROP DEFAULT")
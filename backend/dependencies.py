@@ -5,7 +5,8 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 
 from config import get_settings
-from db.database import get_connection
+from db.database import execute_one, get_connection
+from services.user_cache import get_principal, set_principal
 
 security = HTTPBearer(auto_error=False)
 
@@ -23,8 +24,13 @@ async def get_redis(request: Request) -> Any:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
-    db: Any = Depends(get_db),
+    redis: Any = Depends(get_redis),
 ) -> dict[str, Any]:
+    """Resolve the bearer token to the user principal.
+
+    The principal is served from `services.user_cache` when possible; the DB
+    (and a pool connection) is only touched on a cache miss.
+    """
     if credentials is None:
         raise HTTPException(
             status_code=401,
@@ -63,19 +69,22 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = await db.fetchrow(
-        "SELECT id::text, email, display_name, is_active, email_verified "
-        "FROM users WHERE id = $1::uuid",
-        user_id,
-    )
-
+    cached = await get_principal(redis, user_id)
+    user = cached.principal
     if user is None:
-        raise HTTPException(status_code=401, detail={"code": "USER_NOT_FOUND"})
+        user = await execute_one(
+            "SELECT id::text, email, display_name, is_active, email_verified "
+            "FROM users WHERE id = $1::uuid",
+            user_id,
+        )
+        if user is None:
+            raise HTTPException(status_code=401, detail={"code": "USER_NOT_FOUND"})
+        await set_principal(redis, user, cached.version)
 
     if not user["is_active"]:
         raise HTTPException(status_code=403, detail={"code": "ACCOUNT_DISABLED"})
 
-    return dict(user)
+    return user
 
 
 async def get_verified_user(
@@ -96,12 +105,12 @@ async def get_verified_user(
 
 async def get_optional_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
-    db: Any = Depends(get_db),
+    redis: Any = Depends(get_redis),
 ) -> dict[str, Any] | None:
     """Returns user dict if authenticated, None otherwise (no error)."""
     if credentials is None:
         return None
     try:
-        return await get_current_user(credentials=credentials, db=db)
+        return await get_current_user(credentials=credentials, redis=redis)
     except HTTPException:
         return None
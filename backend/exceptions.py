@@ -51,6 +51,15 @@ class AccountDisabledError(AppException):
         super().__init__("ACCOUNT_DISABLED", "This account has been disabled", 403)
 
 
+class PasswordHasherBusyError(AppException):
+    def __init__(self) -> None:
+        super().__init__(
+            "AUTH_BUSY",
+            "Authentication is temporarily overloaded, please retry shortly",
+            503,
+        )
+
+
 class EmailAlreadyTakenError(AppException):
     def __init__(self) -> None:
         super().__init__("EMAIL_TAKEN", "This email is already registered", 409)
@@ -85,6 +94,11 @@ class MLServiceUnavailableError(AppException):
         )
 
 
+class InvalidCursorError(AppException):
+    def __init__(self) -> None:
+        super().__init__("INVALID_CURSOR", "Malformed or mismatched pagination cursor", 400)
+
+
 class RatingNotFoundError(AppException):
     def __init__(self) -> None:
         super().__init__("RATING_NOT_FOUND", "Rating not found", 404)
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
@@ -15,6 +16,7 @@ from exceptions import AppException
 from middleware.logging import RequestLoggingMiddleware
 from middleware.rate_limit import RateLimitMiddleware
 from routers import auth, health, movies, ratings, recommendations, watchlist
+from services import autocomplete
 
 
 @asynccontextmanager
@@ -29,14 +31,18 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
 
     app.state.redis = await aioredis.from_url(
         settings.redis_url,
-        decode_responses=True,
+        # Cache values are binary (services/codec.py); callers decode as needed.
+        decode_responses=False,
         max_connections=20,
     )
     logger.info("redis_connected")
 
+    autocomplete_refresh = asyncio.create_task(autocomplete.refresh_forever())
+
     logger.info("application_ready")
     yield
 
+    autocomplete_refresh.cancel()
     await close_db_pool()
     await app.state.redis.aclose()
     logger.info("application_stopped")
@@ -61,7 +67,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["X-Request-ID", "X-Process-Time"],
+    expose_headers=[
+        "X-Request-ID",
+        "X-Process-Time",
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "Retry-After",
+    ],
 )
 app.add_middleware(RateLimitMiddleware, redis_url=settings.redis_url)
 app.add_middleware(RequestLoggingMiddleware)
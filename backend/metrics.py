@@ -23,12 +23,59 @@ ml_service_up = Gauge(
     ["service"],
 )
 
+ml_circuit_state = Gauge(
+    "moviematch_ml_circuit_state",
+    "ML service circuit breaker state (0=closed 1=open 2=half_open)",
+    ["service"],
+)
+
+ml_circuit_error_rate = Gauge(
+    "moviematch_ml_circuit_error_rate",
+    "ML service error rate over the circuit breaker window",
+    ["service"],
+)
+
+ml_circuit_transitions = Counter(
+    "moviematch_ml_circuit_transitions_total",
+    "ML service circuit breaker state transitions",
+    ["service", "state"],
+)
+
+ml_circuit_rejections = Counter(
+    "moviematch_ml_circuit_rejections_total",
+    "ML calls short-circuited while the breaker was open",
+    ["service"],
+)
+
+ml_hedged_requests = Counter(
+    "moviematch_ml_hedged_requests_total",
+    "Hedged ML calls, labelled by which attempt answered first",
+    ["service", "winner"],
+)
+
 auth_events = Counter(
     "moviematch_auth_events_total",
     "Authentication events",
     ["event"],
 )
 
+password_hash_queue_depth = Gauge(
+    "moviematch_password_hash_queue_depth",
+    "bcrypt jobs waiting for a free hashing thread",
+)
+
+password_hash_rejections = Counter(
+    "moviematch_password_hash_rejections_total",
+    "bcrypt jobs rejected because the hashing pool was saturated",
+)
+
+password_hash_duration = Histogram(
+    "moviematch_password_hash_duration_seconds",
+    "bcrypt job duration including queueing",
+    ["op"],
+    buckets=[0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0],
+)
+
 
 @contextlib.contextmanager
 def recommendation_timer(rec_type: str) -> Iterator[None]:
@@ -2,12 +2,11 @@ import logging
 import os
 import time
 import uuid
-from typing import Awaitable, Callable
+from typing import Any
 
 import structlog
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 _is_dev = os.getenv("LOG_LEVEL", "INFO").upper() == "DEBUG"
 _level_name = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -27,35 +26,64 @@ structlog.configure(
 )
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable[[Request], Awaitable[Response]],
-    ) -> Response:
+class RequestLoggingMiddleware:
+    """Pure ASGI middleware: request id, timing headers and one access-log line.
+
+    Written against the raw ASGI interface rather than `BaseHTTPMiddleware`,
+    which runs every request through an extra task and a memory stream.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        scope.setdefault("state", {})["request_id"] = request_id
         start_ns = time.perf_counter_ns()
+        status_code = 500
+        duration_ms = 0
 
-        logger = structlog.get_logger().bind(
-            request_id=request_id,
-            http_method=request.method,
-            http_path=request.url.path,
-        )
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code, duration_ms
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = str(duration_ms)
+            await send(message)
 
         try:
-            response = await call_next(request)
-            duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
-            logger.info(
-                "http_request",
-                status_code=response.status_code,
-                duration_ms=duration_ms,
-                user_agent=request.headers.get("user-agent", "")[:100],
-            )
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(duration_ms)
-            return response
+            await self.app(scope, receive, send_with_headers)
         except Exception as exc:
             duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
-            logger.error("http_request_failed", error=str(exc), duration_ms=duration_ms)
+            self._logger(scope, request_id).error(
+                "http_request_failed", error=str(exc), duration_ms=duration_ms
+            )
             raise
+
+        self._logger(scope, request_id).info(
+            "http_request",
+            status_code=status_code,
+            duration_ms=duration_ms,
+            user_agent=_header(scope, b"user-agent")[:100],
+        )
+
+    @staticmethod
+    def _logger(scope: Scope, request_id: str) -> Any:
+        return structlog.get_logger().bind(
+            request_id=request_id,
+            http_method=scope["method"],
+            http_path=scope["path"],
+        )
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return str(value.decode("latin-1"))
+    return ""
@@ -1,12 +1,25 @@
+"""Sliding-window rate limiter with an in-process pre-filter.
+
+Counting happens in Redis with one Lua call per sync: `INCRBY` the current
+fixed window, set its TTL on first write and read the previous window, all in
+a single round trip. The sliding estimate weights the previous window by how
+much of it still overlaps the last `window` seconds.
+
+Each process also keeps a small token bucket per (client, path). After a sync
+that shows the client well under its limit, the bucket gets a slice of the
+remaining allowance; requests that find a token are admitted without touching
+Redis and their hits are flushed with the next sync (`INCRBY n`). Near the
+limit the bucket stays empty, so every request goes to Redis and the limit is
+exact again. Worst-case overshoot is one bucket per process.
+"""
 import time
-from typing import Any, Awaitable, Callable
+from collections import OrderedDict
+from typing import Any
 
 import structlog
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 RATE_LIMITS: dict[str, tuple[int, int]] = {
     "/v1/recommendations/emotion": (10, 60),
@@ -14,16 +27,52 @@ RATE_LIMITS: dict[str, tuple[int, int]] = {
     "/v1/recommendations/search": (60, 60),
     "/v1/auth/login": (10, 60),
     "/v1/auth/register": (5, 60),
+    # Type-ahead: one request per keystroke, served from memory.
+    "/v1/movies/autocomplete": (600, 60),
 }
 DEFAULT_RATE: tuple[int, int] = (120, 60)
 SKIP_PATHS: set[str] = {"/health", "/ready", "/metrics", "/docs", "/openapi.json", "/redoc"}
 
+# Local tokens are only handed out while the client is below this share of its limit,
+LOCAL_HEADROOM = 0.5
+# and at most this share of what remains.
+LOCAL_SHARE = 0.1
+# Hits absorbed locally are flushed to Redis at least this often (seconds).
+SYNC_INTERVAL = 1.0
+MAX_LOCAL_BUCKETS = 10_000
+
+# KEYS[1] current window, KEYS[2] previous window; ARGV[1] hits, ARGV[2] ttl.
+_SLIDING_WINDOW_LUA = """
+local hits = tonumber(ARGV[1])
+local curr = redis.call('INCRBY', KEYS[1], hits)
+if curr == hits then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+return {curr, prev}
+"""
+
+
+class _LocalBucket:
+    __slots__ = ("window_index", "tokens", "pending", "synced_at", "estimate")
+
+    def __init__(self, window_index: int, tokens: int, synced_at: float, estimate: float) -> None:
+        self.window_index = window_index
+        self.tokens = tokens
+        self.pending = 0
+        self.synced_at = synced_at
+        self.estimate = estimate
+
+
+class RateLimitMiddleware:
+    """Pure ASGI sliding-window rate limiter backed by Redis."""
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp, redis_url: str) -> None:
-        super().__init__(app)
+        self.app = app
         self._redis_url = redis_url
         self._redis: Any = None
+        self._script: Any = None
+        self._buckets: OrderedDict[str, _LocalBucket] = OrderedDict()
 
     async def _get_redis(self) -> Any:
         if self._redis is None:
@@ -32,54 +81,125 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             self._redis = await aioredis.from_url(self._redis_url, decode_responses=True)
         return self._redis
 
+    async def _get_script(self) -> Any:
+        if self._script is None:
+            redis = await self._get_redis()
+            # register_script sends EVALSHA and falls back to EVAL on NOSCRIPT.
+            self._script = redis.register_script(_SLIDING_WINDOW_LUA)
+        return self._script
+
     def _get_limit(self, path: str) -> tuple[int, int]:
         for prefix, limit in RATE_LIMITS.items():
             if path.startswith(prefix):
                 return limit
         return DEFAULT_RATE
 
-    def _get_identifier(self, request: Request) -> str:
-        user = getattr(getattr(request.state, "user", None), "id", None)
+    def _get_identifier(self, scope: Scope) -> str:
+        user = getattr(scope.get("state", {}).get("user"), "id", None)
         if user:
             return f"u:{user}"
-        return f"ip:{request.client.host if request.client else 'unknown'}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable[[Request], Awaitable[Response]],
-    ) -> Response:
-        if request.url.path in SKIP_PATHS:
-            return await call_next(request)
+    def _take_local(self, key: str, window_index: int, now: float) -> _LocalBucket | None:
+        bucket = self._buckets.get(key)
+        if (
+            bucket is None
+            or bucket.window_index != window_index
+            or bucket.tokens <= 0
+            or now - bucket.synced_at >= SYNC_INTERVAL
+        ):
+            return None
+        bucket.tokens -= 1
+        bucket.pending += 1
+        return bucket
 
-        max_req, window = self._get_limit(request.url.path)
-        identifier = self._get_identifier(request)
-        window_key = int(time.time() // window)
-        key = f"rl:{identifier}:{request.url.path}:{window_key}"
+    async def _sync(
+        self, key: str, max_req: int, window: int, window_index: int, now: float
+    ) -> _LocalBucket:
+        # Claim the pending hits before awaiting, so a concurrent sync for the
+        # same key can't flush them a second time.
+        previous = self._buckets.get(key)
+        hits = 1
+        if previous is not None:
+            hits += previous.pending
+            previous.pending = 0
 
+        script = await self._get_script()
+        curr, prev = await script(
+            keys=[f"{key}:{window_index}", f"{key}:{window_index - 1}"],
+            args=[hits, window * 2],
+        )
+        overlap = 1.0 - (now % window) / window
+        estimate = int(prev) * overlap + int(curr)
+
+        tokens = 0
+        if estimate < max_req * LOCAL_HEADROOM:
+            tokens = int((max_req - estimate) * LOCAL_SHARE)
+        bucket = _LocalBucket(window_index, tokens, now, estimate)
+        # Hits admitted locally while the script ran (from the bucket we started
+        # with, or one a concurrent sync installed) go out with the next flush.
+        for old in {b for b in (previous, self._buckets.get(key)) if b is not None}:
+            bucket.pending += old.pending
+            old.pending = 0
+
+        self._buckets[key] = bucket
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > MAX_LOCAL_BUCKETS:
+            self._buckets.popitem(last=False)
+        return bucket
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        max_req, window = self._get_limit(path)
+        key = f"rl:{self._get_identifier(scope)}:{path}"
+        now = time.time()
+        window_index = int(now // window)
+
+        remaining: int | None = None
+        bucket = self._take_local(key, window_index, now)
         try:
-            redis = await self._get_redis()
-            count = await redis.incr(key)
-            if count == 1:
-                await redis.expire(key, window + 1)
-
-            if count > max_req:
-                return JSONResponse(
-                    status_code=429,
-                    content={
-                        "error": {
-                            "code": "RATE_LIMIT_EXCEEDED",
-                            "message": f"Rate limit: {max_req} requests per {window}s",
-                            "request_id": getattr(request.state, "request_id", ""),
-                        }
-                    },
-                    headers={
-                        "Retry-After": str(window),
-                        "X-RateLimit-Limit": str(max_req),
-                    },
-                )
+            if bucket is None:
+                bucket = await self._sync(key, max_req, window, window_index, now)
+            remaining = max(max_req - int(bucket.estimate) - bucket.pending, 0)
+            limited = bucket.estimate > max_req
         except Exception as e:
             structlog.get_logger().warning("rate_limit_redis_error", error=str(e))
             # Fail open — don't block requests when Redis is down
+            limited = False
+
+        if limited:
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "error": {
+                        "code": "RATE_LIMIT_EXCEEDED",
+                        "message": f"Rate limit: {max_req} requests per {window}s",
+                        "request_id": scope.get("state", {}).get("request_id", ""),
+                    }
+                },
+                headers={
+                    "Retry-After": str(window),
+                    "X-RateLimit-Limit": str(max_req),
+                    "X-RateLimit-Remaining": "0",
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        if remaining is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(max_req)
+                headers["X-RateLimit-Remaining"] = str(remaining)
+            await send(message)
 
-        return await call_next(request)
+        await self.app(scope, receive, send_with_headers)
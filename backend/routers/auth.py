@@ -4,9 +4,8 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-import bcrypt
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
 
 import metrics
 from jose import JWTError, jwt
@@ -17,6 +16,7 @@ from exceptions import (
     AccountDisabledError,
     EmailAlreadyTakenError,
     InvalidCredentialsError,
+    PasswordHasherBusyError,
     TokenExpiredError,
     TokenRevokedError,
 )
@@ -34,28 +34,11 @@ from schemas.auth import (
     VerifyEmailRequest,
     VerifyEmailResponse,
 )
+from services.passwords import DUMMY_HASH, hash_password, needs_rehash, verify_password
+from services.user_cache import invalidate_principal
 
 router = APIRouter()
 
-_BCRYPT_ROUNDS = 12
-_MAX_PW_BYTES = 72
-
-
-def _hash_password(password: str) -> str:
-    pw = password.encode("utf-8")[:_MAX_PW_BYTES]
-    return bcrypt.hashpw(pw, bcrypt.gensalt(rounds=_BCRYPT_ROUNDS)).decode("utf-8")
-
-
-def _verify_password(password: str, hashed: str) -> bool:
-    try:
-        pw = password.encode("utf-8")[:_MAX_PW_BYTES]
-        return bcrypt.checkpw(pw, hashed.encode("utf-8"))
-    except (ValueError, TypeError):
-        return False
-
-
-_DUMMY_HASH = _hash_password("dummy-password-for-timing-safety")
-
 
 def _new_verification_token() -> tuple[str, str]:
     """Return (raw_token, sha256_hash). Only the hash lives in DB."""
@@ -127,7 +110,7 @@ async def register(data: RegisterRequest) -> TokenResponse:
     if existing is not None:
         raise EmailAlreadyTakenError()
 
-    password_hash = _hash_password(data.password)
+    password_hash = await hash_password(data.password)
 
     user = await execute_one(
         """
@@ -154,16 +137,36 @@ async def register(data: RegisterRequest) -> TokenResponse:
     return _build_tokens(user["id"])
 
 
+async def _rehash(user_id: str, password: str) -> None:
+    """Re-hash with the current cost after a successful login. Best effort:
+    runs after the response is sent, and skips when the hasher pool is
+    saturated — the next login retries."""
+    from db.database import execute_write
+
+    try:
+        new_hash = await hash_password(password)
+        await execute_write(
+            "UPDATE users SET password_hash = $1 WHERE id = $2::uuid",
+            new_hash,
+            user_id,
+        )
+        structlog.get_logger().info("password_rehashed", user_id=user_id)
+    except PasswordHasherBusyError:
+        structlog.get_logger().debug("password_rehash_skipped", user_id=user_id)
+    except Exception as e:
+        structlog.get_logger().warning("password_rehash_failed", user_id=user_id, error=str(e))
+
+
 @router.post("/login", response_model=TokenResponse)
-async def login(data: LoginRequest) -> TokenResponse:
+async def login(data: LoginRequest, background_tasks: BackgroundTasks) -> TokenResponse:
     from db.database import execute_one
 
     user = await execute_one(
         "SELECT id::text AS id, email, password_hash, is_active FROM users WHERE email = $1",
         data.email,
     )
-    hash_to_verify = user["password_hash"] if user else _DUMMY_HASH
-    is_valid = _verify_password(data.password, hash_to_verify)
+    hash_to_verify = user["password_hash"] if user else DUMMY_HASH
+    is_valid = await verify_password(data.password, hash_to_verify)
 
     if user is None or not is_valid:
         metrics.auth_events.labels(event="login_failure").inc()
@@ -176,13 +179,17 @@ async def login(data: LoginRequest) -> TokenResponse:
         "UPDATE users SET last_login_at = now() WHERE id = $1::uuid RETURNING id",
         user["id"],
     )
+    if needs_rehash(user["password_hash"]):
+        background_tasks.add_task(_rehash, user["id"], data.password)
     structlog.get_logger().info("user_login", user_id=user["id"])
     metrics.auth_events.labels(event="login_success").inc()
     return _build_tokens(user["id"])
 
 
 @router.post("/verify-email", response_model=VerifyEmailResponse)
-async def verify_email(data: VerifyEmailRequest) -> VerifyEmailResponse:
+async def verify_email(
+    data: VerifyEmailRequest, redis: Any = Depends(get_redis)
+) -> VerifyEmailResponse:
     from db.database import execute_one, execute_write
 
     token_hash = hashlib.sha256(data.token.encode("utf-8")).hexdigest()
@@ -226,6 +233,7 @@ async def verify_email(data: VerifyEmailRequest) -> VerifyEmailResponse:
         "UPDATE email_verification_tokens SET used_at = now() WHERE id = $1",
         row["id"],
     )
+    await invalidate_principal(redis, row["user_id"])
     structlog.get_logger().info("email_verified", user_id=row["user_id"])
     metrics.auth_events.labels(event="email_verified").inc()
     return VerifyEmailResponse(email=row["email"], already_verified=False)
@@ -316,6 +324,8 @@ async def logout(data: RefreshRequest, redis: Any = Depends(get_redis)) -> Respo
         remaining = max(exp_ts - now_ts, 1)
         if jti:
             await redis.setex(f"blacklist:{jti}", remaining, "1")
+        if payload.get("sub"):
+            await invalidate_principal(redis, payload["sub"])
     except JWTError:
         pass
     return Response(status_code=204)
@@ -353,6 +363,7 @@ async def get_me(current_user: dict[str, Any] = Depends(get_current_user)) -> Us
 async def update_me(
     data: UpdateProfileRequest,
     current_user: dict[str, Any] = Depends(get_current_user),
+    redis: Any = Depends(get_redis),
 ) -> UserResponse:
     from db.database import execute_one
 
@@ -385,6 +396,7 @@ async def update_me(
     row = await execute_one(query, *values)
     if row is None:
         raise HTTPException(status_code=404, detail={"code": "USER_NOT_FOUND"})
+    await invalidate_principal(redis, current_user["id"])
     return _to_user_response(dict(row))
 
 
@@ -399,10 +411,10 @@ async def change_password(
         "SELECT password_hash FROM users WHERE id = $1::uuid",
         current_user["id"],
     )
-    if row is None or not _verify_password(data.current_password, row["password_hash"]):
+    if row is None or not await verify_password(data.current_password, row["password_hash"]):
         raise InvalidCredentialsError()
 
-    new_hash = _hash_password(data.new_password)
+    new_hash = await hash_password(data.new_password)
     await execute_one(
         "UPDATE users SET password_hash = $1, updated_at = now() WHERE id = $2::uuid "
         "RETURNING id",
@@ -421,24 +433,28 @@ async def delete_me(
     redis: Any = Depends(get_redis),
 ) -> Response:
     from db.database import execute_one
-    from services.cache import invalidate_user
+    from routers.ratings import delete_user_ratings
+    from services.cache import purge_user
 
     row = await execute_one(
         "SELECT password_hash FROM users WHERE id = $1::uuid",
         current_user["id"],
     )
-    if row is None or not _verify_password(data.password, row["password_hash"]):
+    if row is None or not await verify_password(data.password, row["password_hash"]):
         raise InvalidCredentialsError()
 
     user_id = current_user["id"]
 
-    # DB cascade handles: ratings, watchlist, user_embeddings (ON DELETE CASCADE)
+    # Ratings go first so the movies' running aggregates are adjusted; the
+    # cascade handles watchlist and user_embeddings (ON DELETE CASCADE).
+    await delete_user_ratings(user_id)
     await execute_one(
         "DELETE FROM users WHERE id = $1::uuid RETURNING id",
         user_id,
     )
     # Wipe personalised caches (recommendation results keyed by user_id)
-    await invalidate_user(redis, str(user_id))
+    await purge_user(redis, str(user_id))
+    await invalidate_principal(redis, str(user_id))
     # Block any outstanding refresh tokens for this user. We can't enumerate
     # issued JTIs (JWTs are stateless), so we plant a per-user "revoked after"
     # marker; refresh checks it against the token's iat.
@@ -456,53 +472,6 @@ async def delete_me(
 async def get_me_stats(
     current_user: dict[str, Any] = Depends(get_current_user),
 ) -> UserStatsResponse:
-    from db.database import execute_one, execute_query
+    from services.user_stats import get_stats
 
-    summary = await execute_one(
-        """
-        SELECT COUNT(*)::int AS total,
-               AVG(score)::float AS avg_score,
-               MIN(created_at) AS first_at,
-               MAX(created_at) AS last_at
-        FROM ratings WHERE user_id = $1::uuid
-        """,
-        current_user["id"],
-    )
-    total = int(summary["total"]) if summary else 0
-
-    genres: list[dict[str, Any]] = []
-    score_dist: dict[str, int] = {}
-    if total > 0:
-        genre_rows = await execute_query(
-            """
-            SELECT g.slug, g.name, COUNT(*)::int AS cnt
-            FROM ratings r
-            JOIN movie_genres mg ON mg.movie_id = r.movie_id
-            JOIN genres g ON g.id = mg.genre_id
-            WHERE r.user_id = $1::uuid
-            GROUP BY g.id, g.slug, g.name
-            ORDER BY cnt DESC
-            LIMIT 10
-            """,
-            current_user["id"],
-        )
-        genres = [dict(r) for r in genre_rows]
-
-        dist_rows = await execute_query(
-            """
-            SELECT score::text AS score, COUNT(*)::int AS cnt
-            FROM ratings WHERE user_id = $1::uuid
-            GROUP BY score ORDER BY score
-            """,
-            current_user["id"],
-        )
-        score_dist = {r["score"]: int(r["cnt"]) for r in dist_rows}
-
-    return UserStatsResponse(
-        total_ratings=total,
-        avg_rating=float(summary["avg_score"]) if summary and summary["avg_score"] is not None else None,
-        first_rated_at=summary["first_at"].isoformat() if summary and summary["first_at"] else None,
-        last_rated_at=summary["last_at"].isoformat() if summary and summary["last_at"] else None,
-        top_genres=[{"slug": g["slug"], "name": g["name"], "count": g["cnt"]} for g in genres],
-        score_distribution=score_dist,
-    )
+    return UserStatsResponse(**await get_stats(current_user["id"]))
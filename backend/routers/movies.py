@@ -1,18 +1,37 @@
-import json
+import asyncio
+import base64
+import re
 from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, Query, Request
+import orjson
+from fastapi import APIRouter, Depends, Query, Request, Response
 
 from db.database import execute_one, execute_query
 from dependencies import get_redis
-from exceptions import MovieNotFoundError
+from exceptions import InvalidCursorError, MovieNotFoundError
 from schemas.movies import (
     CreditResponse,
+    MovieBatchRequest,
+    MovieBatchResponse,
     MovieDetailResponse,
     MovieListResponse,
     MovieResponse,
+    MovieSuggestion,
     PersonResponse,
 )
+from services import autocomplete as autocomplete_index
+from services import onboarding
+from services.cache import (
+    acquire_lock,
+    get_bodies,
+    get_body,
+    release_lock,
+    set_response,
+    set_responses,
+)
+from services.codec import decode, dumps_json
+from services.jobs import enqueue_once
+from services.trending import top_movie_ids
 
 router = APIRouter()
 
@@ -37,10 +56,54 @@ def _row_to_movie(row: dict[str, Any]) -> MovieResponse:
     )
 
 
+# order_by -> (sort key expression, SQL type of the key). NULL keys are
+# coalesced to -1 so they sort last under DESC and the key can be compared
+# by keyset; each expression has a matching (expr DESC, id) index (009).
+_SORT_KEYS: dict[str, tuple[str, str]] = {
+    "popularity": ("m.popularity_score", "numeric"),
+    "rating": ("COALESCE(m.avg_rating, -1)", "numeric"),
+    "year": ("COALESCE(m.year, -1)", "int"),
+}
+
+
+_PG_INT_MAX = 2**31 - 1
+# ASCII only: Python's int()/Decimal() also accept other digits, "_" and "NaN".
+_KEY_FORMATS = {
+    "int": re.compile(r"-?[0-9]{1,10}"),
+    "numeric": re.compile(r"-?[0-9]{1,20}(\.[0-9]{1,20})?"),
+}
+
+
+def _encode_cursor(order_by: str, key: Any, movie_id: int) -> str:
+    raw = orjson.dumps([order_by, str(key), movie_id])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _decode_cursor(cursor: str, order_by: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, key, movie_id = orjson.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursorError() from None
+    # Cursors are client-supplied: reject anything Postgres would fail to
+    # bind or cast (a 500 instead of a 400). bool is an int subclass.
+    if (
+        cursor_order != order_by
+        or not isinstance(key, str)
+        or not _KEY_FORMATS[_SORT_KEYS[order_by][1]].fullmatch(key)
+        or type(movie_id) is not int
+        or not 0 < movie_id <= _PG_INT_MAX
+    ):
+        raise InvalidCursorError()
+    if _SORT_KEYS[order_by][1] == "int" and abs(int(key)) > _PG_INT_MAX:
+        raise InvalidCursorError()
+    return key, movie_id
+
+
 @router.get("", response_model=MovieListResponse)
 @router.get("/", response_model=MovieListResponse, include_in_schema=False)
 async def list_movies(
-    cursor: int | None = Query(None, ge=0),
+    cursor: str | None = Query(None, max_length=200),
     limit: int = Query(20, ge=1, le=50),
     year_from: int | None = Query(None),
     year_to: int | None = Query(None),
@@ -48,11 +111,12 @@ async def list_movies(
     min_rating: float | None = Query(None, ge=0.5, le=5.0),
     order_by: Literal["popularity", "rating", "year"] = "popularity",
 ) -> MovieListResponse:
-    order_column = {
-        "popularity": "m.popularity_score",
-        "rating": "m.avg_rating",
-        "year": "m.year",
-    }[order_by]
+    """Browse movies, paginated by an opaque (sort key, id) keyset cursor.
+
+    Each page is an index range scan that stops after `limit + 1` rows, so
+    deep pages cost the same as the first one.
+    """
+    sort_expr, sort_type = _SORT_KEYS[order_by]
 
     conditions: list[str] = []
     params: list[Any] = []
@@ -62,7 +126,12 @@ async def list_movies(
         return f"${len(params)}"
 
     if cursor is not None:
-        conditions.append(f"m.id > {p(cursor)}")
+        key, after_id = _decode_cursor(cursor, order_by)
+        k = f"{p(key)}::text::{sort_type}"
+        # The `<=` half is the index range bound; the OR breaks ties by id.
+        conditions.append(
+            f"{sort_expr} <= {k} AND ({sort_expr} < {k} OR m.id > {p(after_id)})"
+        )
     if year_from is not None:
         conditions.append(f"m.year >= {p(year_from)}")
     if year_to is not None:
@@ -70,40 +139,68 @@ async def list_movies(
     if min_rating is not None:
         conditions.append(f"m.avg_rating >= {p(min_rating)}")
     if genres:
+        # Slugs resolve to ids once (an InitPlan); the per-row probe is then a
+        # primary-key lookup on movie_genres.
         conditions.append(
-            f"EXISTS (SELECT 1 FROM movie_genres mg2 "
-            f"JOIN genres g2 ON g2.id = mg2.genre_id "
-            f"WHERE mg2.movie_id = m.id AND g2.slug = ANY({p(genres)}))"
+            f"EXISTS (SELECT 1 FROM movie_genres mg2 WHERE mg2.movie_id = m.id "
+            f"AND mg2.genre_id = ANY(ARRAY("
+            f"SELECT id FROM genres WHERE slug = ANY({p(genres)}))))"
         )
 
     where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
 
+    # Page over `movies` alone so LIMIT stops the index scan early; genres
+    # are only fetched for the rows on the page.
     query = f"""
+        WITH page AS (
+            SELECT
+                m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
+                {sort_expr} AS sort_key
+            FROM movies m
+            {where_clause}
+            ORDER BY {sort_expr} DESC, m.id ASC
+            LIMIT {p(limit + 1)}
+        )
         SELECT
-            m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
-            ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres
-        FROM movies m
-        LEFT JOIN movie_genres mg ON mg.movie_id = m.id
-        LEFT JOIN genres g ON g.id = mg.genre_id
-        {where_clause}
-        GROUP BY m.id
-        ORDER BY {order_column} DESC NULLS LAST, m.id ASC
-        LIMIT {p(limit + 1)}
+            page.*,
+            ARRAY(
+                SELECT g.name FROM movie_genres mg
+                JOIN genres g ON g.id = mg.genre_id
+                WHERE mg.movie_id = page.id
+                ORDER BY g.name
+            ) AS genres
+        FROM page
+        ORDER BY page.sort_key DESC, page.id ASC
     """
 
     rows = await execute_query(query, *params)
     items = [_row_to_movie(r) for r in rows[:limit]]
-    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(order_by, last["sort_key"], last["id"])
     return MovieListResponse(items=items, next_cursor=next_cursor)
 
 
+TRENDING_LIMIT = 20
+
+
 @router.get("/trending", response_model=list[MovieResponse])
-async def trending(request: Request, redis: Any = Depends(get_redis)) -> list[MovieResponse]:
+async def trending(
+    request: Request, redis: Any = Depends(get_redis)
+) -> list[MovieResponse] | Response:
+    """Movies with the most (time-decayed) rating activity right now.
+
+    Ranking comes from `services.trending`; the response is cached for a
+    minute only so it follows the event stream closely. While there isn't
+    enough recent activity, the list is padded with all-time popular titles.
+    """
     cache_key = "movies:trending"
-    cached = await redis.get(cache_key)
-    if cached:
-        return [MovieResponse(**m) for m in json.loads(cached)]
+    cached = await get_body(redis, cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
 
+    ids = await top_movie_ids(redis, TRENDING_LIMIT)
     rows = await execute_query(
         """
         SELECT
@@ -112,14 +209,34 @@ async def trending(request: Request, redis: Any = Depends(get_redis)) -> list[Mo
         FROM movies m
         LEFT JOIN movie_genres mg ON mg.movie_id = m.id
         LEFT JOIN genres g ON g.id = mg.genre_id
-        WHERE m.rating_count > 50
+        WHERE m.id = ANY($1::int[])
         GROUP BY m.id
-        ORDER BY m.popularity_score DESC
-        LIMIT 20
-        """
+        """,
+        ids,
     )
-    items = [_row_to_movie(r) for r in rows]
-    await redis.setex(cache_key, 1800, json.dumps([i.model_dump() for i in items]))
+    by_id = {r["id"]: r for r in rows}
+    ordered = [by_id[i] for i in ids if i in by_id]
+
+    if len(ordered) < TRENDING_LIMIT:
+        ordered += await execute_query(
+            """
+            SELECT
+                m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
+                ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres
+            FROM movies m
+            LEFT JOIN movie_genres mg ON mg.movie_id = m.id
+            LEFT JOIN genres g ON g.id = mg.genre_id
+            WHERE m.rating_count > 50 AND m.id <> ALL($1::int[])
+            GROUP BY m.id
+            ORDER BY m.popularity_score DESC
+            LIMIT $2
+            """,
+            list(by_id),
+            TRENDING_LIMIT - len(ordered),
+        )
+
+    items = [_row_to_movie(r) for r in ordered]
+    await set_response(redis, cache_key, 60, [i.model_dump() for i in items])
     return items
 
 
@@ -133,65 +250,50 @@ async def onboarding_movies(
     Selects movies with high rating_count × stddev(rating) so the user's
     ratings carry information (not just "everyone likes this").
     Diversifies by genre: greedy round-robin across genres to avoid all
-    drama / all action.
+    drama / all action. The ranked pool is precomputed (see
+    `services.onboarding`); every `limit` is served from the same copy.
     """
-    cache_key = f"movies:onboarding:{limit}"
-    cached = await redis.get(cache_key)
-    if cached:
-        return [MovieResponse(**m) for m in json.loads(cached)]
-
-    rows = await execute_query(
-        """
-        WITH stats AS (
-            SELECT movie_id, COUNT(*) AS cnt, STDDEV(score) AS stdev
-            FROM ratings
-            GROUP BY movie_id
-            HAVING COUNT(*) >= 100
-        )
-        SELECT
-            m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
-            ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres,
-            s.cnt * COALESCE(s.stdev, 0) AS divisive_score
-        FROM movies m
-        JOIN stats s ON s.movie_id = m.id
-        LEFT JOIN movie_genres mg ON mg.movie_id = m.id
-        LEFT JOIN genres g ON g.id = mg.genre_id
-        WHERE m.poster_path IS NOT NULL AND m.poster_path != ''
-        GROUP BY m.id, s.cnt, s.stdev
-        ORDER BY divisive_score DESC
-        LIMIT 200
-        """
-    )
-
-    selected: list[dict[str, Any]] = []
-    seen_ids: set[int] = set()
-    genre_quota: dict[str, int] = {}
-    max_per_genre = max(3, limit // 6)
-
-    for r in rows:
-        if r["id"] in seen_ids:
-            continue
-        genres = list(r.get("genres") or [])
-        primary = genres[0] if genres else "_none"
-        if genre_quota.get(primary, 0) >= max_per_genre:
-            continue
-        selected.append(r)
-        seen_ids.add(r["id"])
-        genre_quota[primary] = genre_quota.get(primary, 0) + 1
-        if len(selected) >= limit:
-            break
-
-    if len(selected) < limit:
-        for r in rows:
-            if r["id"] not in seen_ids:
-                selected.append(r)
-                seen_ids.add(r["id"])
-                if len(selected) >= limit:
-                    break
-
-    items = [_row_to_movie(r) for r in selected]
-    await redis.setex(cache_key, 3600, json.dumps([i.model_dump() for i in items]))
-    return items
+    pool = await _onboarding_pool(redis)
+    return [MovieResponse(**r) for r in onboarding.select_diverse(pool, limit)]
+
+
+async def _read_onboarding_pool() -> tuple[list[dict[str, Any]], bool]:
+    """The precomputed pool, or popular titles while it's still empty."""
+    rows = await execute_query(onboarding.READ_POOL_SQL)
+    if rows:
+        return [_row_to_movie(r).model_dump() for r in rows], True
+    rows = await execute_query(onboarding.FALLBACK_POOL_SQL, onboarding.POOL_SIZE)
+    return [_row_to_movie(r).model_dump() for r in rows], False
+
+
+async def _onboarding_pool(redis: Any) -> list[dict[str, Any]]:
+    raw = await redis.get(onboarding.POOL_KEY)
+    if raw:
+        return list(decode(raw))
+
+    # Single flight: one request rebuilds the Redis copy, the rest wait for it.
+    token = await acquire_lock(redis, onboarding.POOL_LOCK_KEY, 30)
+    if token is not None:
+        try:
+            pool, ready = await _read_onboarding_pool()
+            if not ready:
+                # Beat hasn't filled the table yet (fresh deploy), or nothing
+                # qualifies yet; either way one kick per beat interval is enough.
+                await enqueue_once(redis, onboarding.REFRESH_TASK, onboarding.POOL_TTL)
+            ttl = onboarding.POOL_TTL if ready else onboarding.FALLBACK_TTL
+            await set_response(redis, onboarding.POOL_KEY, ttl, pool)
+            return pool
+        finally:
+            await release_lock(redis, onboarding.POOL_LOCK_KEY, token)
+
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        raw = await redis.get(onboarding.POOL_KEY)
+        if raw:
+            return list(decode(raw))
+    # The rebuild is taking unusually long; both reads are cheap.
+    pool, _ = await _read_onboarding_pool()
+    return pool
 
 
 @router.get("/search", response_model=list[MovieResponse])
@@ -218,41 +320,55 @@ async def search_movies(
     return [_row_to_movie(r) for r in rows]
 
 
-@router.get("/{movie_id}", response_model=MovieDetailResponse)
-async def get_movie(movie_id: int, redis: Any = Depends(get_redis)) -> MovieDetailResponse:
-    cache_key = f"movie:{movie_id}"
-    cached = await redis.get(cache_key)
-    if cached:
-        return MovieDetailResponse(**json.loads(cached))
+@router.get("/autocomplete", response_model=list[MovieSuggestion])
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=autocomplete_index.TOP_K),
+) -> list[MovieSuggestion]:
+    """Type-ahead title suggestions from the in-process index (no DB query)."""
+    index = await autocomplete_index.get_index()
+    return [
+        MovieSuggestion(
+            id=m["id"],
+            title=m["title"],
+            year=m["year"],
+            poster_url=_poster_url(m["poster_path"]),
+        )
+        for m in index.search(q, limit)
+    ]
 
-    movie = await execute_one(
-        """
-        SELECT
-            m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
-            m.description, m.runtime_minutes, m.imdb_id,
-            ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres
-        FROM movies m
-        LEFT JOIN movie_genres mg ON mg.movie_id = m.id
-        LEFT JOIN genres g ON g.id = mg.genre_id
-        WHERE m.id = $1
-        GROUP BY m.id
-        """,
-        movie_id,
-    )
-    if movie is None:
-        raise MovieNotFoundError(movie_id)
 
-    credit_rows = await execute_query(
-        """
-        SELECT p.id, p.name, p.profile_path, mc.role, mc.character_name, mc.order_index
-        FROM movie_credits mc
-        JOIN people p ON p.id = mc.person_id
-        WHERE mc.movie_id = $1
-        ORDER BY mc.order_index NULLS LAST
-        LIMIT 20
-        """,
-        movie_id,
-    )
+MOVIE_DETAIL_TTL = 3600
+
+# Movie, genres and top-20 credits for every id in $1, one row per movie.
+_DETAILS_SQL = """
+    SELECT
+        m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
+        m.description, m.runtime_minutes, m.imdb_id,
+        ARRAY(
+            SELECT g.name FROM movie_genres mg
+            JOIN genres g ON g.id = mg.genre_id
+            WHERE mg.movie_id = m.id
+            ORDER BY g.name
+        ) AS genres,
+        (
+            SELECT COALESCE(json_agg(c ORDER BY c.order_index NULLS LAST), '[]')
+            FROM (
+                SELECT p.id, p.name, p.profile_path, mc.role, mc.character_name,
+                    mc.order_index
+                FROM movie_credits mc
+                JOIN people p ON p.id = mc.person_id
+                WHERE mc.movie_id = m.id
+                ORDER BY mc.order_index NULLS LAST
+                LIMIT 20
+            ) c
+        ) AS credits
+    FROM movies m
+    WHERE m.id = ANY($1::int[])
+"""
+
+
+def _row_to_detail(row: dict[str, Any]) -> MovieDetailResponse:
     credits = [
         CreditResponse(
             person=PersonResponse(
@@ -262,23 +378,75 @@ async def get_movie(movie_id: int, redis: Any = Depends(get_redis)) -> MovieDeta
             character_name=c.get("character_name"),
             order_index=c.get("order_index"),
         )
-        for c in credit_rows
+        for c in orjson.loads(row["credits"])
     ]
-
-    detail = MovieDetailResponse(
-        id=movie["id"],
-        title=movie["title"],
-        year=movie.get("year"),
-        avg_rating=float(movie["avg_rating"]) if movie.get("avg_rating") is not None else None,
-        rating_count=movie.get("rating_count") or 0,
-        genres=list(movie.get("genres") or []),
-        poster_url=_poster_url(movie.get("poster_path")),
-        description=movie.get("description"),
-        runtime_minutes=movie.get("runtime_minutes"),
-        imdb_id=movie.get("imdb_id"),
+    return MovieDetailResponse(
+        id=row["id"],
+        title=row["title"],
+        year=row.get("year"),
+        avg_rating=float(row["avg_rating"]) if row.get("avg_rating") is not None else None,
+        rating_count=row.get("rating_count") or 0,
+        genres=list(row.get("genres") or []),
+        poster_url=_poster_url(row.get("poster_path")),
+        description=row.get("description"),
+        runtime_minutes=row.get("runtime_minutes"),
+        imdb_id=row.get("imdb_id"),
         credits=credits,
     )
-    await redis.setex(cache_key, 3600, detail.model_dump_json())
+
+
+async def _load_details(redis: Any, movie_ids: list[int]) -> dict[int, MovieDetailResponse]:
+    """Build details for `movie_ids` in one query and cache them in one pipeline."""
+    rows = await execute_query(_DETAILS_SQL, movie_ids)
+    details = {r["id"]: _row_to_detail(r) for r in rows}
+    if details:
+        await set_responses(
+            redis,
+            MOVIE_DETAIL_TTL,
+            {f"movie:{i}": d.model_dump() for i, d in details.items()},
+        )
+    return details
+
+
+@router.post("/batch", response_model=MovieBatchResponse)
+async def movies_batch(
+    data: MovieBatchRequest, redis: Any = Depends(get_redis)
+) -> Response:
+    """Details for many movies at once, in request order.
+
+    Cache hits come from one `MGET` and are spliced into the response as
+    stored JSON; only the misses are queried. Unknown ids are listed in
+    `missing`.
+    """
+    ids = list(dict.fromkeys(data.ids))
+    bodies = await get_bodies(redis, [f"movie:{i}" for i in ids])
+    misses = [i for i, body in zip(ids, bodies, strict=True) if body is None]
+    loaded = await _load_details(redis, misses) if misses else {}
+
+    items: list[bytes] = []
+    missing: list[int] = []
+    for movie_id, body in zip(ids, bodies, strict=True):
+        if body is not None:
+            items.append(body)
+        elif movie_id in loaded:
+            items.append(dumps_json(loaded[movie_id].model_dump()))
+        else:
+            missing.append(movie_id)
+    content = b'{"items":[' + b",".join(items) + b'],"missing":' + dumps_json(missing) + b"}"
+    return Response(content=content, media_type="application/json")
+
+
+@router.get("/{movie_id}", response_model=MovieDetailResponse)
+async def get_movie(
+    movie_id: int, redis: Any = Depends(get_redis)
+) -> MovieDetailResponse | Response:
+    cached = await get_body(redis, f"movie:{movie_id}")
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    detail = (await _load_details(redis, [movie_id])).get(movie_id)
+    if detail is None:
+        raise MovieNotFoundError(movie_id)
     return detail
 
 
@@ -287,6 +455,31 @@ async def similar_movies(
     movie_id: int,
     limit: int = Query(default=12, ge=1, le=30),
 ) -> list[MovieResponse]:
+    """Nearest movies by embedding, from the precomputed `movie_neighbors` row.
+
+    Movies without a row yet (no embedding, or added since the last
+    `refresh_movie_neighbors` run) fall back to a live query.
+    """
+    rows = await execute_query(
+        """
+        SELECT m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
+            ARRAY(
+                SELECT g.name FROM movie_genres mg
+                JOIN genres g ON g.id = mg.genre_id
+                WHERE mg.movie_id = m.id
+                ORDER BY g.name
+            ) AS genres
+        FROM movie_neighbors n
+        CROSS JOIN LATERAL UNNEST(n.neighbor_ids[1:$2]) WITH ORDINALITY AS u(id, ord)
+        JOIN movies m ON m.id = u.id
+        WHERE n.movie_id = $1
+        ORDER BY u.ord
+        """,
+        movie_id, limit,
+    )
+    if rows:
+        return [_row_to_movie(r) for r in rows]
+
     target = await execute_one("SELECT embedding FROM movies WHERE id = $1", movie_id)
     if target is None:
         raise MovieNotFoundError(movie_id)
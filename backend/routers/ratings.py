@@ -4,16 +4,45 @@ from fastapi import APIRouter, Depends, Query, Response
 
 import structlog
 
-from db.database import execute_one, execute_query, execute_write
+from db.database import execute_one, execute_query, get_connection
 from dependencies import get_current_user, get_redis, get_verified_user
 from exceptions import MovieNotFoundError, RatingNotFoundError
 from schemas.movies import MovieResponse
 from schemas.recommendations import RatingInput
+from services import user_stats
 from services.cache import invalidate_user
+from services.embedding_refresh import mark_dirty
+from services.trending import record_rating
 
 router = APIRouter()
 
 
+async def delete_user_ratings(user_id: Any) -> int:
+    """Delete every rating of `user_id`, backing each one out of its movie's
+    aggregates in the same statement. Returns the number of ratings removed."""
+    async with get_connection() as conn, conn.transaction():
+        # Each user has at most one rating per movie, so every affected movie
+        # joins exactly one deleted row.
+        rows = await conn.fetch(
+            """
+            WITH del AS (
+                DELETE FROM ratings WHERE user_id = $1::uuid RETURNING movie_id, score
+            )
+            UPDATE movies m SET
+                rating_sum = m.rating_sum - del.score,
+                rating_count = m.rating_count - 1,
+                avg_rating = ROUND((m.rating_sum - del.score) / NULLIF(m.rating_count - 1, 0), 2),
+                ratings_changed_at = NOW()
+            FROM del
+            WHERE m.id = del.movie_id
+            RETURNING m.id
+            """,
+            user_id,
+        )
+        await user_stats.reset(conn, user_id)
+    return len(rows)
+
+
 @router.post("", status_code=201)
 async def rate_movie(
     data: RatingInput,
@@ -25,32 +54,53 @@ async def rate_movie(
         raise MovieNotFoundError(data.movie_id)
 
     user_id = current_user["id"]
-    await execute_write(
-        """
-        INSERT INTO ratings (user_id, movie_id, score)
-        VALUES ($1::uuid, $2, $3)
-        ON CONFLICT (user_id, movie_id) DO UPDATE
-        SET score = EXCLUDED.score, updated_at = NOW()
-        """,
-        user_id,
-        data.movie_id,
-        data.score,
-    )
-    await execute_write(
-        """
-        UPDATE movies SET
-            avg_rating = (SELECT AVG(score) FROM ratings WHERE movie_id = $1),
-            rating_count = (SELECT COUNT(*) FROM ratings WHERE movie_id = $1)
-        WHERE id = $1
-        """,
-        data.movie_id,
-    )
+    # Upsert and apply the delta to the movie's running sum/count in one
+    # statement; `prev` sees the row as it was before the upsert.
+    async with get_connection() as conn, conn.transaction():
+        change = await conn.fetchrow(
+            """
+            WITH prev AS (
+                SELECT score FROM ratings WHERE user_id = $1::uuid AND movie_id = $2
+            ),
+            up AS (
+                INSERT INTO ratings (user_id, movie_id, score)
+                VALUES ($1::uuid, $2, $3)
+                ON CONFLICT (user_id, movie_id) DO UPDATE
+                SET score = EXCLUDED.score, updated_at = NOW()
+                RETURNING score
+            ),
+            d AS (
+                SELECT
+                    (SELECT score FROM prev) AS old_score,
+                    up.score AS new_score,
+                    up.score - COALESCE((SELECT score FROM prev), 0) AS dsum,
+                    CASE WHEN EXISTS (SELECT 1 FROM prev) THEN 0 ELSE 1 END AS dcnt
+                FROM up
+            )
+            UPDATE movies m SET
+                rating_sum = m.rating_sum + d.dsum,
+                rating_count = m.rating_count + d.dcnt,
+                avg_rating = ROUND(
+                    (m.rating_sum + d.dsum) / NULLIF(m.rating_count + d.dcnt, 0), 2
+                ),
+                ratings_changed_at = NOW()
+            FROM d
+            WHERE m.id = $2
+            RETURNING d.old_score, d.new_score
+            """,
+            user_id,
+            data.movie_id,
+            data.score,
+        )
+        await user_stats.apply_rating_change(
+            conn, user_id, data.movie_id, change["old_score"], change["new_score"]
+        )
 
     await invalidate_user(redis, user_id)
 
     try:
-        from workers.tasks.recommendations import refresh_user_embedding
-        refresh_user_embedding.delay(user_id)
+        await mark_dirty(redis, user_id)
+        await record_rating(redis, data.movie_id, data.score)
     except Exception:
         pass
 
@@ -120,25 +170,9 @@ async def delete_all_my_ratings(
 ) -> Response:
     """Wipe every rating the current user has — 'Start over' flow."""
     user_id = current_user["id"]
-    rows = await execute_query(
-        "DELETE FROM ratings WHERE user_id = $1::uuid RETURNING movie_id",
-        user_id,
-    )
-    if rows:
-        mids = [int(r["movie_id"]) for r in rows]
-        # Recompute movie aggregates for each affected film (cheap; max ~N rated).
-        for mid in mids:
-            await execute_write(
-                """
-                UPDATE movies SET
-                    avg_rating = COALESCE((SELECT AVG(score) FROM ratings WHERE movie_id = $1), 0),
-                    rating_count = COALESCE((SELECT COUNT(*) FROM ratings WHERE movie_id = $1), 0)
-                WHERE id = $1
-                """,
-                mid,
-            )
+    count = await delete_user_ratings(user_id)
     await invalidate_user(redis, user_id)
-    structlog.get_logger().info("ratings_bulk_deleted", user_id=user_id, count=len(rows))
+    structlog.get_logger().info("ratings_bulk_deleted", user_id=user_id, count=count)
     return Response(status_code=204)
 
 
@@ -149,22 +183,27 @@ async def delete_rating(
     redis: Any = Depends(get_redis),
 ) -> Response:
     user_id = current_user["id"]
-    deleted = await execute_one(
-        "DELETE FROM ratings WHERE user_id = $1::uuid AND movie_id = $2 RETURNING id",
-        user_id,
-        movie_id,
-    )
-    if deleted is None:
-        raise RatingNotFoundError()
-
-    await execute_write(
-        """
-        UPDATE movies SET
-            avg_rating = (SELECT AVG(score) FROM ratings WHERE movie_id = $1),
-            rating_count = (SELECT COUNT(*) FROM ratings WHERE movie_id = $1)
-        WHERE id = $1
-        """,
-        movie_id,
-    )
+    async with get_connection() as conn, conn.transaction():
+        deleted = await conn.fetchrow(
+            """
+            WITH del AS (
+                DELETE FROM ratings WHERE user_id = $1::uuid AND movie_id = $2 RETURNING score
+            )
+            UPDATE movies m SET
+                rating_sum = m.rating_sum - del.score,
+                rating_count = m.rating_count - 1,
+                avg_rating = ROUND((m.rating_sum - del.score) / NULLIF(m.rating_count - 1, 0), 2),
+                ratings_changed_at = NOW()
+            FROM del
+            WHERE m.id = $2
+            RETURNING del.score
+            """,
+            user_id,
+            movie_id,
+        )
+        if deleted is None:
+            raise RatingNotFoundError()
+        await user_stats.apply_rating_change(conn, user_id, movie_id, deleted["score"], None)
+
     await invalidate_user(redis, user_id)
     return Response(status_code=204)
@@ -1,6 +1,9 @@
+from collections.abc import AsyncIterator
 from typing import Any
 
-from fastapi import APIRouter, Depends, File, Request, UploadFile
+from fastapi import APIRouter, Depends, Request, Response
+from starlette.datastructures import UploadFile
+from starlette.requests import ClientDisconnect
 
 import metrics
 from config import get_settings
@@ -12,6 +15,7 @@ from schemas.recommendations import (
     SearchRequest,
 )
 from services import recommendations as reco_service
+from services.cache import CachedResponse
 
 router = APIRouter()
 
@@ -27,10 +31,82 @@ def _detect_image_mime(head: bytes) -> str | None:
     return None
 
 
-def _record(rec_type: str, result: RecommendResponse) -> None:
+_IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp")
+# Room for multipart boundaries and part headers around the file itself.
+_MULTIPART_OVERHEAD = 16 * 1024
+# nginx's "client closed request"; only ever seen in logs.
+_CLIENT_CLOSED_REQUEST = 499
+
+_EMOTION_BODY: dict[str, Any] = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            **{t: {"schema": {"type": "string", "format": "binary"}} for t in _IMAGE_TYPES},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"image": {"type": "string", "format": "binary"}},
+                    "required": ["image"],
+                }
+            },
+        },
+    }
+}
+
+
+def _too_large(limit: int) -> InvalidImageError:
+    return InvalidImageError(f"File exceeds {limit // 1024 // 1024}MB limit")
+
+
+def _check_mime(head: bytes) -> None:
+    mime = _detect_image_mime(head[:16])
+    if mime not in _IMAGE_TYPES:
+        raise InvalidImageError(f"Unsupported image type {mime or 'unknown'}, use JPEG or PNG")
+
+
+async def _stream_body(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """The raw request body as it arrives: type-checked on the first bytes and
+    cut off with `InvalidImageError` once it passes `limit`."""
+    chunks = request.stream()
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= 16:
+            break
+    _check_mime(head)
+    if len(head) > limit:
+        raise _too_large(limit)
+
+    async def _forward() -> AsyncIterator[bytes]:
+        size = len(head)
+        yield head
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > limit:
+                raise _too_large(limit)
+            yield chunk
+
+    return _forward()
+
+
+async def _read_form_image(request: Request, limit: int) -> bytes:
+    async with request.form(max_files=1) as form:
+        upload = form.get("image")
+        if not isinstance(upload, UploadFile):
+            raise InvalidImageError("Missing 'image' file field")
+        # One byte past the limit is enough to know it's too big.
+        content = await upload.read(limit + 1)
+    if len(content) > limit:
+        raise _too_large(limit)
+    _check_mime(content)
+    return content
+
+
+def _record(rec_type: str, result: RecommendResponse | CachedResponse) -> None:
+    cached = isinstance(result, CachedResponse) or bool(result.cached)
     metrics.recommendations_total.labels(
         recommendation_type=rec_type,
-        cached=str(bool(result.cached)).lower(),
+        cached=str(cached).lower(),
         model_version=result.model_version or "unknown",
     ).inc()
 
@@ -41,7 +117,7 @@ async def collaborative(
     request: Request,
     current_user: dict[str, Any] = Depends(get_current_user),
     redis: Any = Depends(get_redis),
-) -> RecommendResponse:
+) -> RecommendResponse | Response:
     ratings = [r.model_dump() for r in body.ratings]
     if not ratings:
         # Fall back to the user's persisted ratings so the endpoint works
@@ -64,6 +140,8 @@ async def collaborative(
             request_id=getattr(request.state, "request_id", ""),
         )
     _record("collaborative", result)
+    if isinstance(result, CachedResponse):
+        return Response(content=result.body, media_type="application/json")
     return result
 
 
@@ -85,32 +163,45 @@ async def search(
     return result
 
 
-@router.post("/emotion", response_model=RecommendResponse)
+@router.post("/emotion", response_model=RecommendResponse, openapi_extra=_EMOTION_BODY)
 async def emotion(
     request: Request,
-    image: UploadFile = File(...),
     current_user: dict[str, Any] = Depends(get_current_user),
-) -> RecommendResponse:
-    settings = get_settings()
-    content = await image.read()
+    redis: Any = Depends(get_redis),
+) -> RecommendResponse | Response:
+    """Detect the mood in a photo and recommend for it.
+
+    Send the image as the raw body (`Content-Type: image/jpeg|png|webp`) to
+    have it streamed through to the CV service without being buffered here;
+    a multipart `image` field is still accepted.
+    """
+    limit = get_settings().max_upload_size_bytes
+    is_multipart = request.headers.get("content-type", "").startswith("multipart/form-data")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit + (
+        _MULTIPART_OVERHEAD if is_multipart else 0
+    ):
+        raise _too_large(limit)
 
     try:
-        if len(content) > settings.max_upload_size_bytes:
-            raise InvalidImageError(
-                f"File exceeds {settings.max_upload_size_bytes // 1024 // 1024}MB limit"
-            )
-
-        mime = _detect_image_mime(content[:16])
-        if mime not in ("image/jpeg", "image/png", "image/webp"):
-            raise InvalidImageError(f"Unsupported image type {mime or 'unknown'}, use JPEG or PNG")
-
-        with metrics.recommendation_timer("emotion"):
-            result = await reco_service.get_emotion_recommendations(
-                image_bytes=content,
-                limit=10,
-                request_id=getattr(request.state, "request_id", ""),
-            )
-        _record("emotion", result)
-        return result
-    finally:
-        del content
+        image: bytes | AsyncIterator[bytes] = (
+            await _read_form_image(request, limit)
+            if is_multipart
+            else await _stream_body(request, limit)
+        )
+        try:
+            with metrics.recommendation_timer("emotion"):
+                result = await reco_service.get_emotion_recommendations(
+                    image=image,
+                    limit=10,
+                    request_id=getattr(request.state, "request_id", ""),
+                    redis=redis,
+                    user_id=current_user["id"],
+                )
+        finally:
+            del image
+    except ClientDisconnect:
+        # The client went away mid-upload; nobody is left to read an error.
+        return Response(status_code=_CLIENT_CLOSED_REQUEST)
+    _record("emotion", result)
+    return result
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class GenreResponse(BaseModel):
@@ -30,6 +30,13 @@ class MovieResponse(BaseModel):
     poster_url: str | None = None
 
 
+class MovieSuggestion(BaseModel):
+    id: int
+    title: str
+    year: int | None = None
+    poster_url: str | None = None
+
+
 class MovieDetailResponse(MovieResponse):
     description: str | None = None
     runtime_minutes: int | None = None
@@ -37,7 +44,16 @@ class MovieDetailResponse(MovieResponse):
     imdb_id: str | None = None
 
 
+class MovieBatchRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=50)
+
+
+class MovieBatchResponse(BaseModel):
+    items: list[MovieDetailResponse]
+    missing: list[int] = []
+
+
 class MovieListResponse(BaseModel):
     items: list[MovieResponse]
-    next_cursor: int | None = None
+    next_cursor: str | None = None
     total: int | None = None
@@ -0,0 +1,151 @@
+"""Micro-benchmark: per-request overhead of the HTTP middleware stack.
+
+Usage (from backend/):
+    uv run python scripts/bench/middleware_overhead.py [--requests 5000]
+
+Drives `/health` and `/v1/movies` stubs in-process through httpx's ASGI
+transport (no network, no DB) with three stacks:
+
+- bare       — no middleware, the floor
+- base_http  — the old `BaseHTTPMiddleware` logging + rate-limit pair
+- asgi       — the current pure-ASGI `RequestLoggingMiddleware` + `RateLimitMiddleware`
+
+Redis is replaced with an in-memory counter so only middleware cost is measured.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+import structlog  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+from middleware.logging import RequestLoggingMiddleware  # noqa: E402
+from middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+
+# Silence access logs: we're timing the middleware, not stdout.
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL))
+
+
+class _MemoryRedis:
+    def __init__(self) -> None:
+        self._counts: dict[str, int] = {}
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        self._counts[key] = self._counts.get(key, 0) + amount
+        return self._counts[key]
+
+    async def expire(self, key: str, ttl: int) -> None:
+        pass
+
+    def register_script(self, _source: str) -> Any:
+        async def _sliding_window(keys: list[str], args: list[int]) -> list[int]:
+            return [await self.incr(keys[0], int(args[0])), self._counts.get(keys[1], 0)]
+
+        return _sliding_window
+
+
+class _BaseHTTPLogging(BaseHTTPMiddleware):
+    async def dispatch(
+        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        start_ns = time.perf_counter_ns()
+        response = await call_next(request)
+        duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        structlog.get_logger().info("http_request", status_code=response.status_code)
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Process-Time"] = str(duration_ms)
+        return response
+
+
+class _BaseHTTPRateLimit(BaseHTTPMiddleware):
+    def __init__(self, app: Any, redis: _MemoryRedis) -> None:
+        super().__init__(app)
+        self._redis = redis
+
+    async def dispatch(
+        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        key = f"rl:{request.url.path}:{int(time.time() // 60)}"
+        if await self._redis.incr(key) == 1:
+            await self._redis.expire(key, 61)
+        return await call_next(request)
+
+
+class _UnlimitedRateLimit(RateLimitMiddleware):
+    """The real limiter with the limit lifted above any benchmark run."""
+
+    def _get_limit(self, path: str) -> tuple[int, int]:
+        return 10**9, 60
+
+
+def _app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/v1/movies")
+    async def movies() -> dict[str, Any]:
+        return {"items": [{"id": i, "title": f"Movie {i}"} for i in range(20)]}
+
+    if stack == "base_http":
+        app.add_middleware(_BaseHTTPRateLimit, redis=_MemoryRedis())
+        app.add_middleware(_BaseHTTPLogging)
+    elif stack == "asgi":
+        app.add_middleware(_UnlimitedRateLimit, redis_url="redis://unused")
+        app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+
+async def _bench(stack: str, path: str, n: int) -> float:
+    app = _app(stack)
+    if stack == "asgi":
+        # Build the stack up front so the limiter instance can be reached
+        # and its Redis swapped for the stub.
+        app.middleware_stack = app.build_middleware_stack()
+        node: Any = app.middleware_stack
+        while not isinstance(node, RateLimitMiddleware):
+            node = node.app
+        node._redis = _MemoryRedis()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(n):
+            resp = await client.get(path)
+            resp.raise_for_status()
+        return (time.perf_counter() - start) / n * 1e6
+
+
+async def main(n: int) -> None:
+    for path in ("/health", "/v1/movies"):
+        results = {stack: await _bench(stack, path, n) for stack in ("bare", "base_http", "asgi")}
+        bare = results["bare"]
+        print(f"\n{path}  ({n} requests)")
+        for stack, us in results.items():
+            print(f"  {stack:<10} {us:8.1f} µs/req   overhead {us - bare:7.1f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,143 @@
+"""In-process title autocomplete index.
+
+Type-ahead fires on every keystroke, so it must not touch Postgres. Each API
+process holds a `TitleIndex` over every movie's `title` and `title_original`
+and rebuilds it in the background every `autocomplete_refresh_seconds`.
+
+Every word start of a normalised title becomes a key ("the dark knight",
+"dark knight", "knight"), kept in one sorted list, so a prefix query is a
+bisect plus a scan of the matching run. Very short prefixes match thousands
+of keys; their top results are precomputed at build time. Ranking is by
+`popularity_score`, with matches at the start of the title ahead of
+mid-title word matches.
+"""
+import asyncio
+import heapq
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Any
+
+import structlog
+
+from config import get_settings
+from db.database import execute_query
+
+# Prefixes up to this length are answered from the precomputed table.
+PREFIX_CACHE_LEN = 3
+# Results kept per precomputed prefix; also the largest `limit` served.
+TOP_K = 20
+# Popularity is normalised to [0, 100]; this puts every title-start match
+# above every mid-title match.
+_TITLE_START_BONUS = 1000.0
+
+_LOAD_SQL = """
+    SELECT id, title, title_original, year, poster_path, popularity_score
+    FROM movies
+"""
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents, and reduce punctuation to single spaces."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    chars = [
+        c if c.isalnum() else " "
+        for c in decomposed.casefold()
+        if not unicodedata.combining(c)
+    ]
+    return " ".join("".join(chars).split())
+
+
+class TitleIndex:
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self.movies = [
+            {
+                "id": r["id"],
+                "title": r["title"],
+                "year": r.get("year"),
+                "poster_path": r.get("poster_path"),
+            }
+            for r in rows
+        ]
+        entries: list[tuple[str, int, float]] = []
+        for doc, r in enumerate(rows):
+            popularity = float(r.get("popularity_score") or 0)
+            for title in {r["title"], r.get("title_original") or r["title"]}:
+                norm = normalize(title)
+                for pos, ch in enumerate(norm):
+                    if ch != " " and (pos == 0 or norm[pos - 1] == " "):
+                        bonus = _TITLE_START_BONUS if pos == 0 else 0.0
+                        entries.append((norm[pos:], doc, popularity + bonus))
+        entries.sort()
+        self._keys = [e[0] for e in entries]
+        self._docs = [e[1] for e in entries]
+        self._weights = [e[2] for e in entries]
+
+        # Walk entries best-first so each prefix list fills in rank order.
+        self._top: dict[str, list[int]] = {}
+        for i in sorted(range(len(entries)), key=self._weights.__getitem__, reverse=True):
+            key, doc = self._keys[i], self._docs[i]
+            for n in range(1, min(PREFIX_CACHE_LEN, len(key)) + 1):
+                top = self._top.setdefault(key[:n], [])
+                if len(top) < TOP_K and doc not in top:
+                    top.append(doc)
+
+    def __len__(self) -> int:
+        return len(self.movies)
+
+    def search(self, query: str, limit: int) -> list[dict[str, Any]]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) <= PREFIX_CACHE_LEN:
+            docs = self._top.get(prefix, [])[:limit]
+        else:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+            best: dict[int, float] = {}
+            for i in range(lo, hi):
+                doc, weight = self._docs[i], self._weights[i]
+                if weight > best.get(doc, -1.0):
+                    best[doc] = weight
+            docs = heapq.nlargest(limit, best, key=best.__getitem__)
+        return [self.movies[d] for d in docs]
+
+
+_index: TitleIndex | None = None
+_build_lock = asyncio.Lock()
+
+
+async def _build() -> TitleIndex:
+    rows = await execute_query(_LOAD_SQL)
+    start = time.perf_counter()
+    # Building is pure CPU; keep it off the event loop.
+    index = await asyncio.to_thread(TitleIndex, rows)
+    structlog.get_logger().info(
+        "autocomplete_index_built",
+        movies=len(index),
+        build_ms=round((time.perf_counter() - start) * 1000),
+    )
+    return index
+
+
+async def get_index() -> TitleIndex:
+    """The current index, building it on first use."""
+    global _index
+    if _index is None:
+        async with _build_lock:
+            if _index is None:
+                _index = await _build()
+    return _index
+
+
+async def refresh_forever() -> None:
+    """Rebuild periodically so new movies and popularity changes show up."""
+    global _index
+    interval = get_settings().autocomplete_refresh_seconds
+    while True:
+        try:
+            async with _build_lock:
+                _index = await _build()
+        except Exception as e:
+            structlog.get_logger().warning("autocomplete_index_refresh_failed", error=str(e))
+        await asyncio.sleep(interval)
@@ -1,6 +1,57 @@
+"""Per-user recommendation cache with generation-based invalidation.
+
+Every user has a generation counter at `reco:gen:{user_id}`. Entries live at
+`reco:{user_id}:{endpoint}:{params_hash}` and carry the generation they were
+computed under, so invalidating a user is a single `INCR` instead of a
+`SCAN MATCH` over the keyspace. Generation and entry are fetched together in
+one `MGET`.
+
+Entries whose generation is behind, or that are older than `FRESH_TTL`, are
+returned as *stale* until `STALE_TTL` — callers serve them immediately and
+recompute in the background (stale-while-revalidate).
+
+Values go through `services.codec`, and `get_body` / `set_response` expose the
+same encoding for plain response caches (`movies:*`) so hits can be returned
+as raw JSON bytes without re-validating Pydantic models.
+"""
 import hashlib
 import json
-from typing import Any
+import secrets
+import time
+from typing import Any, NamedTuple
+
+from services.codec import decode, dumps_json, encode, to_json_body
+
+FRESH_TTL = 1800
+STALE_TTL = 24 * 3600
+REFRESH_LOCK_TTL = 30
+# Delete the lock only while it still holds our token, so a holder that ran
+# past the TTL can't release a lock someone else has since taken.
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Outlives any entry, so an expired counter can never make an old entry look fresh.
+_GEN_TTL = 30 * 24 * 3600
+
+
+class CacheLookup(NamedTuple):
+    data: dict[str, Any] | None
+    stale: bool
+    generation: int
+
+
+class CachedResponse(NamedTuple):
+    """Ready-to-send JSON body for a cache hit, plus what metrics need from it."""
+
+    body: bytes
+    model_version: str
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> "CachedResponse":
+        return cls(dumps_json(data), str(data.get("model_version") or "unknown"))
 
 
 def _params_key(params: dict[str, Any] | None) -> str:
@@ -10,6 +61,10 @@ def _params_key(params: dict[str, Any] | None) -> str:
     return hashlib.sha1(payload.encode()).hexdigest()[:16]
 
 
+def _gen_key(user_id: str) -> str:
+    return f"reco:gen:{user_id}"
+
+
 def _build_key(user_id: str, endpoint: str, params: dict[str, Any] | None) -> str:
     return f"reco:{user_id}:{endpoint}:{_params_key(params)}"
 
@@ -19,14 +74,20 @@ async def get_cached(
     user_id: str,
     endpoint: str,
     params: dict[str, Any] | None,
-) -> dict[str, Any] | None:
-    raw = await redis.get(_build_key(user_id, endpoint, params))
+) -> CacheLookup:
+    raw_gen, raw = await redis.mget(
+        _gen_key(user_id), _build_key(user_id, endpoint, params)
+    )
+    generation = int(raw_gen or 0)
     if not raw:
-        return None
+        return CacheLookup(None, False, generation)
     try:
-        return dict(json.loads(raw))
-    except (ValueError, TypeError):
-        return None
+        entry = decode(raw)
+        data = dict(entry["d"])
+        stale = int(entry["g"]) != generation or time.time() - float(entry["t"]) > FRESH_TTL
+    except (ValueError, TypeError, KeyError):
+        return CacheLookup(None, False, generation)
+    return CacheLookup(data, stale, generation)
 
 
 async def set_cached(
@@ -35,14 +96,99 @@ async def set_cached(
     endpoint: str,
     params: dict[str, Any] | None,
     data: dict[str, Any],
-    ttl: int = 1800,
+    generation: int,
 ) -> None:
-    await redis.setex(_build_key(user_id, endpoint, params), ttl, json.dumps(data, default=str))
+    """Store `data` as computed under `generation` (read it *before* computing,
+    so a rating that lands mid-computation still marks the result stale)."""
+    entry = {"g": generation, "t": time.time(), "d": data}
+    await redis.setex(_build_key(user_id, endpoint, params), STALE_TTL, encode(entry))
+
+
+async def get_body(redis: Any, key: str) -> bytes | None:
+    """Cached value at `key` as a JSON response body, or None on miss/corruption."""
+    raw = await redis.get(key)
+    if not raw:
+        return None
+    try:
+        return to_json_body(raw)
+    except ValueError:
+        return None
+
+
+async def set_response(redis: Any, key: str, ttl: int, data: Any) -> None:
+    await redis.setex(key, ttl, encode(data))
+
+
+async def get_bodies(redis: Any, keys: list[str]) -> list[bytes | None]:
+    """`get_body` for many keys in one `MGET`; misses come back as None."""
+    bodies: list[bytes | None] = []
+    for raw in await redis.mget(*keys):
+        try:
+            bodies.append(to_json_body(raw) if raw else None)
+        except ValueError:
+            bodies.append(None)
+    return bodies
+
+
+async def set_responses(redis: Any, ttl: int, entries: dict[str, Any]) -> None:
+    """`set_response` for many keys in one pipelined round trip."""
+    pipe = redis.pipeline(transaction=False)
+    for key, data in entries.items():
+        pipe.setex(key, ttl, encode(data))
+    await pipe.execute()
+
+
+def _lock_key(user_id: str, endpoint: str, params: dict[str, Any] | None) -> str:
+    return f"reco:lock:{user_id}:{endpoint}:{_params_key(params)}"
+
+
+async def acquire_lock(redis: Any, key: str, ttl: int) -> str | None:
+    """Take `key` if free; returns the owner token for `release_lock`, or None."""
+    token = secrets.token_hex(16)
+    if await redis.set(key, token, nx=True, ex=ttl):
+        return token
+    return None
+
+
+async def release_lock(redis: Any, key: str, token: str) -> None:
+    await redis.eval(_RELEASE_LOCK_LUA, 1, key, token)
+
+
+async def acquire_refresh_lock(
+    redis: Any,
+    user_id: str,
+    endpoint: str,
+    params: dict[str, Any] | None,
+) -> str | None:
+    """Single-flight guard so only one worker recomputes a stale entry.
+
+    The holder must call `release_refresh_lock` with the returned token once
+    done, so the next stale read can refresh again without waiting out the TTL.
+    """
+    return await acquire_lock(redis, _lock_key(user_id, endpoint, params), REFRESH_LOCK_TTL)
+
+
+async def release_refresh_lock(
+    redis: Any,
+    user_id: str,
+    endpoint: str,
+    params: dict[str, Any] | None,
+    token: str,
+) -> None:
+    await release_lock(redis, _lock_key(user_id, endpoint, params), token)
 
 
 async def invalidate_user(redis: Any, user_id: str) -> None:
+    pipe = redis.pipeline(transaction=False)
+    pipe.incr(_gen_key(user_id))
+    pipe.expire(_gen_key(user_id), _GEN_TTL)
+    await pipe.execute()
+
+
+async def purge_user(redis: Any, user_id: str) -> None:
+    """Physically delete every cached entry for a user (account deletion only)."""
     pattern = f"reco:{user_id}:*"
-    keys: list[str] = []
+    keys: list[str] = [_gen_key(user_id)]
     async for key in redis.scan_iter(match=pattern, count=100):
         keys.append(key)
         if len(keys) >= 500:
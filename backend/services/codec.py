@@ -0,0 +1,88 @@
+"""Compact encoding for values stored in Redis.
+
+Every value written through `encode` starts with a one-byte tag naming the
+serializer (JSON or msgpack) plus a flag bit when the payload is
+zstd-compressed, so the codec can be switched without flushing Redis: old
+entries keep decoding. Untagged values that look like JSON text (written
+before this module existed) are still read as plain JSON.
+
+`to_json_body` is the fast path for HTTP caches: it turns a stored value into
+response bytes without materialising Pydantic models. For JSON-tagged values
+it is just a (possible) decompress.
+"""
+from typing import Any
+
+import msgpack
+import orjson
+import zstandard
+
+from config import get_settings
+
+_TAG_JSON = 0x01
+_TAG_MSGPACK = 0x02
+_FLAG_ZSTD = 0x80
+_LEGACY_JSON_PREFIXES = (ord("{"), ord("["), ord('"'))
+
+_zstd_c = zstandard.ZstdCompressor(level=3)
+_zstd_d = zstandard.ZstdDecompressor()
+
+
+def dumps_json(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=str)
+
+
+def _serializer() -> int:
+    return _TAG_MSGPACK if get_settings().cache_codec == "msgpack" else _TAG_JSON
+
+
+def encode(obj: Any) -> bytes:
+    tag = _serializer()
+    payload: bytes
+    if tag == _TAG_MSGPACK:
+        payload = msgpack.packb(obj, default=str, use_bin_type=True)
+    else:
+        payload = dumps_json(obj)
+    if len(payload) >= get_settings().cache_compress_min_bytes:
+        compressed = _zstd_c.compress(payload)
+        if len(compressed) < len(payload):
+            tag |= _FLAG_ZSTD
+            payload = compressed
+    return bytes((tag,)) + payload
+
+
+def _unframe(raw: bytes | str) -> tuple[int, bytes]:
+    if isinstance(raw, str):
+        raw = raw.encode()
+    if not raw:
+        raise ValueError("empty cache value")
+    tag = raw[0]
+    if tag in _LEGACY_JSON_PREFIXES:
+        return _TAG_JSON, raw
+    payload = raw[1:]
+    if tag & _FLAG_ZSTD:
+        payload = _zstd_d.decompress(payload)
+    return tag & ~_FLAG_ZSTD, payload
+
+
+def decode(raw: bytes | str) -> Any:
+    """Inverse of `encode`. Raises ValueError on anything it can't read."""
+    try:
+        tag, payload = _unframe(raw)
+        if tag == _TAG_MSGPACK:
+            return msgpack.unpackb(payload, raw=False)
+        if tag == _TAG_JSON:
+            return orjson.loads(payload)
+    except zstandard.ZstdError as e:
+        raise ValueError(str(e)) from e
+    raise ValueError(f"unknown cache tag {tag:#x}")
+
+
+def to_json_body(raw: bytes | str) -> bytes:
+    """Stored value → JSON response body, skipping any model validation."""
+    try:
+        tag, payload = _unframe(raw)
+    except zstandard.ZstdError as e:
+        raise ValueError(str(e)) from e
+    if tag == _TAG_JSON:
+        return payload
+    return dumps_json(decode(raw))
@@ -1,21 +1,31 @@
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
 
 from config import get_settings
 from exceptions import FaceNotDetectedError, MLServiceUnavailableError
+from services.resilience import guarded_call
 
 
-async def detect_emotion(image_bytes: bytes) -> dict[str, Any]:
+async def detect_emotion(image: bytes | AsyncIterator[bytes]) -> dict[str, Any]:
+    """POST the image to the CV service's raw-body `/detect/raw`.
+
+    `image` may be an async byte stream (e.g. the incoming request body); it
+    is forwarded chunk by chunk, never assembled here.
+    """
     settings = get_settings()
-    files = {"image": ("upload.bin", image_bytes, "application/octet-stream")}
-    try:
+
+    async def _post() -> dict[str, Any]:
         async with httpx.AsyncClient(
             base_url=settings.ml_cv_url,
             timeout=httpx.Timeout(connect=2.0, read=10.0, write=5.0, pool=5.0),
         ) as client:
-            resp = await client.post("/detect", files=files)
-            del files
+            resp = await client.post(
+                "/detect/raw",
+                content=image,
+                headers={"Content-Type": "application/octet-stream"},
+            )
             if resp.status_code == 422:
                 try:
                     body = resp.json()
@@ -33,5 +43,10 @@ async def detect_emotion(image_bytes: bytes) -> dict[str, Any]:
                     raise FaceNotDetectedError()
             resp.raise_for_status()
             return dict(resp.json())
+
+    try:
+        # Uploads are not hedged: doubling a multi-MB body is worse than waiting.
+        # A streamed body arrives at the client's pace, so that call isn't timed.
+        return await guarded_call("cv", _post, timed=isinstance(image, bytes))
     except (httpx.ConnectError, httpx.TimeoutException, httpx.HTTPStatusError):
         raise MLServiceUnavailableError("cv")
@@ -0,0 +1,16 @@
+"""Coalesced user-embedding refresh.
+
+Rating writes don't enqueue a Celery job per rating any more; they add the
+user to a Redis set. `refresh_dirty_user_embeddings` (Celery beat, every
+`REFRESH_INTERVAL` seconds) drains the set and recomputes every user in it in
+one pass, so a user who rates 40 movies during onboarding costs one refresh
+instead of 40.
+"""
+from typing import Any
+
+DIRTY_USERS_KEY = "user_emb:dirty"
+REFRESH_INTERVAL = 30.0
+
+
+async def mark_dirty(redis: Any, user_id: str) -> None:
+    await redis.sadd(DIRTY_USERS_KEY, str(user_id))
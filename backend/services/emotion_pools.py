@@ -0,0 +1,104 @@
+"""Precomputed per-emotion recommendation pools.
+
+The emotion endpoint's list depends only on the detected emotion: the most
+popular well-rated movies in that emotion's genres. The
+`refresh_emotion_pools` beat task ranks the top `POOL_SIZE` per emotion into
+the `emotion_pool` table; the API keeps all pools in one Redis entry under
+`POOLS_KEY`, so a request needs no query after the CV call. With
+`emotion_personalize` on, the pool is re-ranked by cosine similarity to the
+user's stored embedding (one primary-key lookup over the pool).
+
+Until the table has been filled (fresh deploy), an empty pool is cached
+briefly, requests fall back to the per-genre popularity query, and a worker
+is asked to build the pools.
+"""
+from typing import Any
+
+EMOTION_TO_GENRES: dict[str, list[str]] = {
+    "happy": ["Comedy", "Family", "Adventure"],
+    "sad": ["Drama", "Romance"],
+    "angry": ["Action", "Thriller", "Crime"],
+    "fear": ["Horror", "Thriller", "Mystery"],
+    "surprise": ["Science Fiction", "Fantasy", "Adventure"],
+    "disgust": ["Horror", "Crime"],
+    "neutral": ["Drama", "Documentary", "History"],
+}
+
+POOL_SIZE = 50
+POOLS_KEY = "reco:emotion:pools"
+POOLS_LOCK_KEY = "reco:emotion:pools:lock"
+POOLS_TTL = 3600
+# Short, so the real pools replace the empty stand-in soon after a worker builds them.
+FALLBACK_TTL = 60
+REFRESH_TASK = "workers.tasks.analytics.refresh_emotion_pools"
+
+_INSERT_POOL_SQL = """
+    INSERT INTO emotion_pool (emotion, rank, movie_id)
+    SELECT $1, ROW_NUMBER() OVER (ORDER BY popularity_score DESC, id), id
+    FROM (
+        SELECT m.id, m.popularity_score
+        FROM movies m
+        WHERE m.rating_count > 10
+          AND EXISTS (
+              SELECT 1
+              FROM movie_genres mg
+              JOIN genres g ON g.id = mg.genre_id
+              WHERE mg.movie_id = m.id AND g.name = ANY($2::text[])
+          )
+        ORDER BY m.popularity_score DESC, m.id
+        LIMIT $3
+    ) ranked
+"""
+
+READ_POOLS_SQL = """
+    SELECT
+        p.emotion, m.id, m.title, m.year, m.avg_rating, m.poster_path,
+        ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres
+    FROM emotion_pool p
+    JOIN movies m ON m.id = p.movie_id
+    LEFT JOIN movie_genres mg ON mg.movie_id = m.id
+    LEFT JOIN genres g ON g.id = mg.genre_id
+    GROUP BY p.emotion, p.rank, m.id
+    ORDER BY p.emotion, p.rank
+"""
+
+# Pool ids closest to the user's embedding first; movies without a
+# comparable embedding are left out and keep their pool order.
+PERSONALIZE_SQL = """
+    SELECT m.id
+    FROM user_embeddings u
+    JOIN movies m ON m.id = ANY($2::int[])
+    WHERE u.user_id = $1::uuid
+      AND m.embedding IS NOT NULL
+      AND vector_dims(m.embedding) = vector_dims(u.embedding)
+    ORDER BY m.embedding <=> u.embedding
+"""
+
+
+async def refresh_pools(conn: Any) -> int:
+    """Recompute every emotion's pool on an asyncpg connection; returns rows written."""
+    total = 0
+    async with conn.transaction():
+        await conn.execute("DELETE FROM emotion_pool")
+        for emotion, genres in EMOTION_TO_GENRES.items():
+            status = await conn.execute(_INSERT_POOL_SQL, emotion, genres, POOL_SIZE)
+            total += int(status.split()[-1])
+    return total
+
+
+def group_pools(rows: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    """`READ_POOLS_SQL` rows as {emotion: [movie, ...]} in rank order."""
+    pools: dict[str, list[dict[str, Any]]] = {emotion: [] for emotion in EMOTION_TO_GENRES}
+    for r in rows:
+        movie = dict(r)
+        if movie["avg_rating"] is not None:
+            movie["avg_rating"] = float(movie["avg_rating"])
+        movie["genres"] = list(movie["genres"] or [])
+        pools.setdefault(movie.pop("emotion"), []).append(movie)
+    return pools
+
+
+def rerank(pool: list[dict[str, Any]], ranked_ids: list[int]) -> list[dict[str, Any]]:
+    """`pool` with `ranked_ids` first, in that order, then the rest in pool order."""
+    position = {movie_id: i for i, movie_id in enumerate(ranked_ids)}
+    return sorted(pool, key=lambda m: position.get(m["id"], len(position)))
@@ -0,0 +1,34 @@
+"""Enqueue Celery tasks from the API.
+
+Tasks are sent by name, so the API never imports the worker task modules,
+and the broker publish runs off the event loop. Enqueueing is best effort:
+every caller has beat as the backstop.
+"""
+import asyncio
+from typing import Any
+
+import structlog
+
+from workers.celery_app import app as celery_app
+
+
+async def enqueue(task_name: str) -> None:
+    try:
+        await asyncio.to_thread(celery_app.send_task, task_name)
+    except Exception as e:
+        structlog.get_logger().warning("task_enqueue_failed", task=task_name, error=str(e))
+
+
+async def enqueue_once(redis: Any, task_name: str, every: int) -> None:
+    """`enqueue`, at most once per `every` seconds across all API processes.
+
+    For on-demand kicks of a beat task whose result may legitimately be
+    empty: without the guard, every cache refill would enqueue it again.
+    """
+    try:
+        if not await redis.set(f"jobs:enqueued:{task_name}", "1", nx=True, ex=every):
+            return
+    except Exception as e:
+        structlog.get_logger().warning("task_enqueue_failed", task=task_name, error=str(e))
+        return
+    await enqueue(task_name)
@@ -4,6 +4,7 @@ import httpx
 
 from config import get_settings
 from exceptions import MLServiceUnavailableError
+from services.resilience import guarded_call
 
 
 async def search(
@@ -20,14 +21,17 @@ async def search(
             if filters.get(k) is not None:
                 payload[k] = filters[k]
 
-    try:
+    async def _post() -> Any:
         async with httpx.AsyncClient(
             base_url=settings.ml_nlp_url,
             timeout=httpx.Timeout(connect=2.0, read=5.0, write=5.0, pool=5.0),
         ) as client:
             resp = await client.post("/search", json=payload)
             resp.raise_for_status()
-            data = resp.json()
-            return list(data.get("items", data) if isinstance(data, dict) else data)
+            return resp.json()
+
+    try:
+        data = await guarded_call("nlp", _post, hedge=True)
     except (httpx.ConnectError, httpx.TimeoutException, httpx.HTTPStatusError):
         raise MLServiceUnavailableError("nlp")
+    return list(data.get("items", data) if isinstance(data, dict) else data)
@@ -0,0 +1,112 @@
+"""Divisive-movie pool for cold-start onboarding.
+
+The pool (top `POOL_SIZE` movies by rating_count × stddev(score)) is
+recomputed by the `refresh_onboarding_pool` beat task into the
+`onboarding_pool` table. The API keeps a copy in Redis under `POOL_KEY` and
+picks a genre-diverse subset of it per request, so no request ever runs the
+ratings-wide aggregate.
+
+Until the table has been filled (fresh deploy), requests get the most popular
+titles instead (`FALLBACK_POOL_SQL`, an index scan) and ask a worker to build
+the real pool.
+"""
+from typing import Any
+
+POOL_SIZE = 200
+POOL_KEY = "movies:onboarding:pool"
+POOL_LOCK_KEY = "movies:onboarding:pool:lock"
+POOL_TTL = 3600
+# Short, so the real pool replaces the stand-in soon after a worker builds it.
+FALLBACK_TTL = 60
+REFRESH_TASK = "workers.tasks.analytics.refresh_onboarding_pool"
+
+_INSERT_POOL_SQL = """
+    WITH stats AS (
+        SELECT movie_id, COUNT(*) AS cnt, STDDEV(score) AS stdev
+        FROM ratings
+        GROUP BY movie_id
+        HAVING COUNT(*) >= 100
+    )
+    INSERT INTO onboarding_pool (rank, movie_id, divisive_score)
+    SELECT ROW_NUMBER() OVER (ORDER BY score DESC, id), id, score
+    FROM (
+        SELECT m.id, (s.cnt * COALESCE(s.stdev, 0))::float8 AS score
+        FROM movies m
+        JOIN stats s ON s.movie_id = m.id
+        WHERE m.poster_path IS NOT NULL AND m.poster_path != ''
+        ORDER BY score DESC, m.id
+        LIMIT $1
+    ) ranked
+"""
+
+READ_POOL_SQL = """
+    SELECT
+        m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
+        ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres
+    FROM onboarding_pool p
+    JOIN movies m ON m.id = p.movie_id
+    LEFT JOIN movie_genres mg ON mg.movie_id = m.id
+    LEFT JOIN genres g ON g.id = mg.genre_id
+    GROUP BY p.rank, m.id
+    ORDER BY p.rank
+"""
+
+FALLBACK_POOL_SQL = """
+    SELECT
+        m.id, m.title, m.year, m.avg_rating, m.rating_count, m.poster_path,
+        ARRAY_REMOVE(ARRAY_AGG(DISTINCT g.name), NULL) AS genres
+    FROM (
+        SELECT id, popularity_score
+        FROM movies
+        WHERE poster_path IS NOT NULL AND poster_path != ''
+        ORDER BY popularity_score DESC, id
+        LIMIT $1
+    ) top
+    JOIN movies m ON m.id = top.id
+    LEFT JOIN movie_genres mg ON mg.movie_id = m.id
+    LEFT JOIN genres g ON g.id = mg.genre_id
+    GROUP BY top.popularity_score, m.id
+    ORDER BY top.popularity_score DESC, m.id
+"""
+
+
+async def refresh_pool(conn: Any) -> int:
+    """Recompute the pool on an asyncpg connection; returns its new size."""
+    async with conn.transaction():
+        await conn.execute("DELETE FROM onboarding_pool")
+        status = await conn.execute(_INSERT_POOL_SQL, POOL_SIZE)
+    return int(status.split()[-1])
+
+
+def select_diverse(pool: list[dict[str, Any]], limit: int) -> list[dict[str, Any]]:
+    """Take `limit` movies in pool order, capping how many share a primary genre.
+
+    Greedy pass with a per-genre quota first, then top up from the rest of
+    the pool if the quota left it short.
+    """
+    selected: list[dict[str, Any]] = []
+    seen_ids: set[int] = set()
+    genre_quota: dict[str, int] = {}
+    max_per_genre = max(3, limit // 6)
+
+    for r in pool:
+        if r["id"] in seen_ids:
+            continue
+        genres = list(r.get("genres") or [])
+        primary = genres[0] if genres else "_none"
+        if genre_quota.get(primary, 0) >= max_per_genre:
+            continue
+        selected.append(r)
+        seen_ids.add(r["id"])
+        genre_quota[primary] = genre_quota.get(primary, 0) + 1
+        if len(selected) >= limit:
+            break
+
+    if len(selected) < limit:
+        for r in pool:
+            if r["id"] not in seen_ids:
+                selected.append(r)
+                seen_ids.add(r["id"])
+                if len(selected) >= limit:
+                    break
+    return selected
@@ -0,0 +1,100 @@
+"""bcrypt hashing on a dedicated, bounded thread pool.
+
+A 12-round bcrypt call takes ~250 ms of CPU. Run inline in an `async`
+handler it stalls the whole event loop, so every hash / verify goes through a
+small private executor instead (bcrypt releases the GIL while it works).
+Admission is capped at `password_hash_workers + password_hash_max_queue`
+jobs; past that, callers get `PasswordHasherBusyError` (503) immediately
+rather than queueing behind a login burst.
+
+`needs_rehash` lets login upgrade hashes transparently when
+`bcrypt_rounds` is changed.
+"""
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+import bcrypt
+
+import metrics
+from config import get_settings
+from exceptions import PasswordHasherBusyError
+
+T = TypeVar("T")
+
+_MAX_PW_BYTES = 72
+
+_executor: ThreadPoolExecutor | None = None
+_inflight = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_settings().password_hash_workers,
+            thread_name_prefix="bcrypt",
+        )
+    return _executor
+
+
+def _hash_sync(password: str, rounds: int) -> str:
+    pw = password.encode("utf-8")[:_MAX_PW_BYTES]
+    return bcrypt.hashpw(pw, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _verify_sync(password: str, hashed: str) -> bool:
+    try:
+        pw = password.encode("utf-8")[:_MAX_PW_BYTES]
+        return bcrypt.checkpw(pw, hashed.encode("utf-8"))
+    except (ValueError, TypeError):
+        return False
+
+
+def _publish_depth(workers: int) -> None:
+    metrics.password_hash_queue_depth.set(max(_inflight - workers, 0))
+
+
+async def _run(op: str, fn: Callable[[], T]) -> T:
+    global _inflight
+    settings = get_settings()
+    workers = settings.password_hash_workers
+    if _inflight >= workers + settings.password_hash_max_queue:
+        metrics.password_hash_rejections.inc()
+        raise PasswordHasherBusyError()
+
+    _inflight += 1
+    _publish_depth(workers)
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn)
+    finally:
+        _inflight -= 1
+        _publish_depth(workers)
+        metrics.password_hash_duration.labels(op=op).observe(time.perf_counter() - start)
+
+
+async def hash_password(password: str) -> str:
+    rounds = get_settings().bcrypt_rounds
+    return await _run("hash", lambda: _hash_sync(password, rounds))
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await _run("verify", lambda: _verify_sync(password, hashed))
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when `hashed` was made with a different cost than `bcrypt_rounds`."""
+    # Modular crypt format: $2b$<cost>$<salt+hash>
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return False
+    return int(parts[2]) != get_settings().bcrypt_rounds
+
+
+# Hash of a throwaway password, verified against when the email is unknown so
+# login timing doesn't reveal which accounts exist. Built once at import.
+DUMMY_HASH = _hash_sync("dummy-password-for-timing-safety", get_settings().bcrypt_rounds)
@@ -1,27 +1,34 @@
+import asyncio
 import time
+from collections.abc import AsyncIterator, Coroutine
 from typing import Any
 
 import structlog
 
+from config import get_settings
 from db.database import execute_query
 from exceptions import MLServiceUnavailableError
 from schemas.recommendations import MovieRecommendation, RecommendResponse
-from services import cv_client, nlp_client, recsys_client
-from services.cache import get_cached, set_cached
+from services import cv_client, emotion_pools, nlp_client, recsys_client
+from services.cache import (
+    CachedResponse,
+    acquire_lock,
+    acquire_refresh_lock,
+    get_cached,
+    release_lock,
+    release_refresh_lock,
+    set_cached,
+    set_response,
+)
+from services.codec import decode
+from services.emotion_pools import EMOTION_TO_GENRES
+from services.jobs import enqueue_once
 
 MODEL_VERSION = "1.0.0"
 COLD_START_THRESHOLD = 3
 TMDB_IMG_BASE = "https://image.tmdb.org/t/p/w500"
 
-EMOTION_TO_GENRES: dict[str, list[str]] = {
-    "happy": ["Comedy", "Family", "Adventure"],
-    "sad": ["Drama", "Romance"],
-    "angry": ["Action", "Thriller", "Crime"],
-    "fear": ["Horror", "Thriller", "Mystery"],
-    "surprise": ["Science Fiction", "Fantasy", "Adventure"],
-    "disgust": ["Horror", "Crime"],
-    "neutral": ["Drama", "Documentary", "History"],
-}
+_background_tasks: set[asyncio.Task[None]] = set()
 
 
 def _poster_url(path: str | None) -> str | None:
@@ -109,23 +116,13 @@ def _row_to_reco(
     )
 
 
-async def get_collaborative_recommendations(
+async def _compute_collaborative(
     user_id: str,
     ratings: list[dict[str, Any]],
     limit: int,
-    filters: dict[str, Any] | None,
-    redis: Any,
     request_id: str,
+    start: float,
 ) -> RecommendResponse:
-    start = time.perf_counter()
-    cache_params = {"limit": limit, "filters": filters, "n_ratings": len(ratings)}
-
-    cached = await get_cached(redis, user_id, "collaborative", cache_params)
-    if cached is not None:
-        cached["cached"] = True
-        cached["request_id"] = request_id
-        return RecommendResponse(**cached)
-
     is_cold_start = len(ratings) < COLD_START_THRESHOLD
     items: list[MovieRecommendation] = []
     model_version = MODEL_VERSION
@@ -153,14 +150,90 @@ async def get_collaborative_recommendations(
             model_version = "popularity"
 
     latency_ms = int((time.perf_counter() - start) * 1000)
-    response = RecommendResponse(
+    return RecommendResponse(
         items=items[:limit],
         model_version=model_version,
         latency_ms=latency_ms,
         request_id=request_id,
         cached=False,
     )
-    await set_cached(redis, user_id, "collaborative", cache_params, response.model_dump())
+
+
+async def _revalidate_collaborative(
+    user_id: str,
+    ratings: list[dict[str, Any]],
+    limit: int,
+    cache_params: dict[str, Any],
+    redis: Any,
+    generation: int,
+) -> None:
+    token: str | None = None
+    try:
+        token = await acquire_refresh_lock(redis, user_id, "collaborative", cache_params)
+        if token is None:
+            return
+        response = await _compute_collaborative(
+            user_id, ratings, limit, "", time.perf_counter()
+        )
+        await set_cached(
+            redis, user_id, "collaborative", cache_params, response.model_dump(), generation
+        )
+    except Exception as e:
+        structlog.get_logger().warning(
+            "reco_revalidate_failed", user_id=user_id, error=str(e)
+        )
+    finally:
+        if token is not None:
+            try:
+                await release_refresh_lock(
+                    redis, user_id, "collaborative", cache_params, token
+                )
+            except Exception as e:
+                structlog.get_logger().warning(
+                    "reco_lock_release_failed", user_id=user_id, error=str(e)
+                )
+
+
+def _spawn(coro: Coroutine[Any, Any, None]) -> None:
+    task = asyncio.create_task(coro)
+    # The loop only keeps weak references to tasks; hold one until it finishes.
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def get_collaborative_recommendations(
+    user_id: str,
+    ratings: list[dict[str, Any]],
+    limit: int,
+    filters: dict[str, Any] | None,
+    redis: Any,
+    request_id: str,
+) -> RecommendResponse | CachedResponse:
+    """Cache hits come back as `CachedResponse` (serialized body, no model
+    validation); misses as a freshly computed `RecommendResponse`."""
+    start = time.perf_counter()
+    # No rating count in the key: rating writes bump the user's cache
+    # generation, and a stable key is what lets the previous list be
+    # served stale while the new one is computed.
+    cache_params = {"limit": limit, "filters": filters}
+
+    lookup = await get_cached(redis, user_id, "collaborative", cache_params)
+    if lookup.data is not None:
+        if lookup.stale:
+            _spawn(
+                _revalidate_collaborative(
+                    user_id, ratings, limit, cache_params, redis, lookup.generation
+                )
+            )
+        cached = lookup.data
+        cached["cached"] = True
+        cached["request_id"] = request_id
+        return CachedResponse.from_data(cached)
+
+    response = await _compute_collaborative(user_id, ratings, limit, request_id, start)
+    await set_cached(
+        redis, user_id, "collaborative", cache_params, response.model_dump(), lookup.generation
+    )
     return response
 
 
@@ -212,30 +285,79 @@ EMOTION_VERDICT: dict[str, str] = {
 }
 
 
+async def _emotion_pools(redis: Any) -> dict[str, list[dict[str, Any]]]:
+    raw = await redis.get(emotion_pools.POOLS_KEY)
+    if raw:
+        return dict(decode(raw))
+
+    # Single flight: one request rebuilds the Redis copy, the rest wait for it.
+    token = await acquire_lock(redis, emotion_pools.POOLS_LOCK_KEY, 30)
+    if token is not None:
+        try:
+            pools = emotion_pools.group_pools(
+                await execute_query(emotion_pools.READ_POOLS_SQL)
+            )
+            ttl = emotion_pools.POOLS_TTL
+            if not any(pools.values()):
+                # Beat hasn't filled the table yet (fresh deploy), or nothing
+                # qualifies yet; either way one kick per beat interval is enough.
+                await enqueue_once(redis, emotion_pools.REFRESH_TASK, emotion_pools.POOLS_TTL)
+                ttl = emotion_pools.FALLBACK_TTL
+            await set_response(redis, emotion_pools.POOLS_KEY, ttl, pools)
+            return pools
+        finally:
+            await release_lock(redis, emotion_pools.POOLS_LOCK_KEY, token)
+
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        raw = await redis.get(emotion_pools.POOLS_KEY)
+        if raw:
+            return dict(decode(raw))
+    return emotion_pools.group_pools(await execute_query(emotion_pools.READ_POOLS_SQL))
+
+
+async def _personalize(user_id: str, pool: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    try:
+        rows = await execute_query(
+            emotion_pools.PERSONALIZE_SQL, user_id, [m["id"] for m in pool]
+        )
+    except Exception as e:
+        structlog.get_logger().warning("emotion_personalize_failed", error=str(e))
+        return pool
+    return emotion_pools.rerank(pool, [r["id"] for r in rows])
+
+
 async def get_emotion_recommendations(
-    image_bytes: bytes,
+    image: bytes | AsyncIterator[bytes],
     limit: int,
     request_id: str,
+    redis: Any,
+    user_id: str,
 ) -> RecommendResponse:
     start = time.perf_counter()
     try:
-        detection = await cv_client.detect_emotion(image_bytes)
+        detection = await cv_client.detect_emotion(image)
     finally:
-        del image_bytes
+        del image
 
     emotion = str(detection.get("emotion", "neutral")).lower()
     confidence = float(detection.get("confidence", 0.0))
-    genres = EMOTION_TO_GENRES.get(emotion, EMOTION_TO_GENRES["neutral"])
+    if emotion not in EMOTION_TO_GENRES:
+        emotion = "neutral"
     verdict = EMOTION_VERDICT.get(emotion, EMOTION_VERDICT["neutral"])
 
-    rows = await _popularity_fallback(limit, genres=genres)
+    pool = (await _emotion_pools(redis)).get(emotion) or []
+    if not pool:
+        pool = await _popularity_fallback(limit, EMOTION_TO_GENRES[emotion])
+    if get_settings().emotion_personalize:
+        pool = await _personalize(user_id, pool)
     items = [
-        _row_to_reco(r, confidence, f"Matches your mood: {emotion}") for r in rows
+        _row_to_reco(r, confidence, f"Matches your mood: {emotion}") for r in pool[:limit]
     ]
 
     latency_ms = int((time.perf_counter() - start) * 1000)
     return RecommendResponse(
-        items=items[:limit],
+        items=items,
         model_version=MODEL_VERSION,
         latency_ms=latency_ms,
         request_id=request_id,
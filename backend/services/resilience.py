@@ -0,0 +1,281 @@
+"""Circuit breaker + hedged requests for backend → ML service calls.
+
+One breaker per ML service, kept in process memory. While a breaker is open,
+calls fail immediately with `MLServiceUnavailableError`, so callers drop into
+their popularity fallback without waiting out the HTTP read timeout. After
+`open_seconds` the breaker goes half-open and lets a few probe calls through;
+enough consecutive successes close it again, any failure re-opens it.
+
+Hedging is opt-in per call and only meant for idempotent endpoints
+(`/search`, `/recommend`): if the primary attempt hasn't answered within the
+recent p95 latency, a second identical attempt is fired and whichever returns
+first wins.
+"""
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+import httpx
+import structlog
+
+import metrics
+from config import get_settings
+from exceptions import MLServiceUnavailableError
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUE = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+_LATENCY_SAMPLES = 200
+_MIN_HEDGE_SAMPLES = 20
+
+
+def is_service_failure(exc: BaseException) -> bool:
+    """Transport errors and 5xx count against the breaker; 4xx means the service answered."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        service: str,
+        *,
+        window_seconds: float = 30.0,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 2,
+        hedge_min_delay: float = 0.05,
+        hedge_default_delay: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.service = service
+        self._window = window_seconds
+        self._min_calls = min_calls
+        self._error_rate = error_rate
+        self._slow_call = slow_call_seconds
+        self._slow_rate = slow_call_rate
+        self._open_seconds = open_seconds
+        self._half_open_probes = half_open_probes
+        self._hedge_min_delay = hedge_min_delay
+        self._hedge_default_delay = hedge_default_delay
+        self._clock = clock
+
+        # (finished_at, failed, duration) per call inside the rolling window.
+        self._calls: deque[tuple[float, bool, float]] = deque()
+        self._latencies: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self._open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes_in_flight < self._half_open_probes:
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def p95_latency(self) -> float | None:
+        if len(self._latencies) < _MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95_latency()
+        if p95 is None:
+            return self._hedge_default_delay
+        return max(p95, self._hedge_min_delay)
+
+    def record(self, failed: bool, duration: float | None) -> None:
+        """`duration` None means the call wasn't timed; it never counts as slow."""
+        now = self._clock()
+        if not failed and duration is not None:
+            self._latencies.append(duration)
+
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            if failed:
+                self._trip(now)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self._half_open_probes:
+                self._calls.clear()
+                self._transition(CLOSED)
+            return
+
+        if self._state == OPEN:
+            # Stragglers that were in flight when the breaker tripped.
+            return
+
+        self._calls.append((now, failed, duration or 0.0))
+        self._evict(now)
+        self._maybe_trip(now)
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self._window
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _maybe_trip(self, now: float) -> None:
+        total = len(self._calls)
+        if total == 0:
+            metrics.ml_circuit_error_rate.labels(service=self.service).set(0)
+            return
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, d in self._calls if d >= self._slow_call)
+        error_rate = failures / total
+        metrics.ml_circuit_error_rate.labels(service=self.service).set(error_rate)
+        if total < self._min_calls:
+            return
+        if error_rate >= self._error_rate or slow / total >= self._slow_rate:
+            self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        self._opened_at = now
+        self._calls.clear()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        structlog.get_logger().warning(
+            "ml_circuit_state_change",
+            service=self.service,
+            from_state=self._state,
+            to_state=state,
+        )
+        self._state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        metrics.ml_circuit_transitions.labels(service=self.service, state=state).inc()
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.ml_circuit_state.labels(service=self.service).set(_STATE_VALUE[self._state])
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        hedge: bool = False,
+        timed: bool = True,
+    ) -> T:
+        """Run `fn` through the breaker.
+
+        Raises `MLServiceUnavailableError` without calling `fn` while open.
+        Exceptions raised by `fn` propagate unchanged. Pass `timed=False` when
+        `fn`'s duration depends on the caller (e.g. it streams a client
+        upload), so it neither counts as a slow call nor skews the hedge p95.
+        """
+        if not self.allow():
+            metrics.ml_circuit_rejections.labels(service=self.service).inc()
+            raise MLServiceUnavailableError(self.service)
+
+        # Never hedge a half-open probe — that would double the load on a
+        # service that is only just recovering.
+        use_hedge = hedge and self._state == CLOSED
+        start = self._clock()
+
+        def elapsed() -> float | None:
+            return self._clock() - start if timed else None
+
+        try:
+            if use_hedge:
+                result = await self._hedged(fn)
+            else:
+                result = await fn()
+        except asyncio.CancelledError:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            raise
+        except Exception as exc:
+            self.record(is_service_failure(exc), elapsed())
+            raise
+        self.record(False, elapsed())
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        primary = asyncio.ensure_future(fn())
+        pending: set[asyncio.Future[T]] = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done:
+                return primary.result()
+
+            backup = asyncio.ensure_future(fn())
+            pending.add(backup)
+            first_exc: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        metrics.ml_hedged_requests.labels(
+                            service=self.service,
+                            winner="hedge" if task is backup else "primary",
+                        ).inc()
+                        return task.result()
+                    first_exc = first_exc or exc
+            if first_exc is None:
+                raise RuntimeError("hedged call finished without a result")
+            raise first_exc
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(service: str) -> CircuitBreaker:
+    breaker = _breakers.get(service)
+    if breaker is None:
+        settings = get_settings()
+        breaker = CircuitBreaker(
+            service,
+            window_seconds=settings.ml_breaker_window_seconds,
+            min_calls=settings.ml_breaker_min_calls,
+            error_rate=settings.ml_breaker_error_rate,
+            slow_call_seconds=settings.ml_breaker_slow_call_seconds,
+            slow_call_rate=settings.ml_breaker_slow_call_rate,
+            open_seconds=settings.ml_breaker_open_seconds,
+            half_open_probes=settings.ml_breaker_half_open_probes,
+            hedge_min_delay=settings.ml_hedge_min_delay_ms / 1000,
+            hedge_default_delay=settings.ml_hedge_default_delay_ms / 1000,
+        )
+        _breakers[service] = breaker
+    return breaker
+
+
+async def guarded_call(
+    service: str,
+    fn: Callable[[], Awaitable[T]],
+    *,
+    hedge: bool = False,
+    timed: bool = True,
+) -> T:
+    """`get_breaker(service).call(...)` with hedging gated on settings."""
+    hedge = hedge and get_settings().ml_hedge_enabled
+    return await get_breaker(service).call(fn, hedge=hedge, timed=timed)
@@ -0,0 +1,66 @@
+"""Time-decayed trending movies, maintained in one Redis sorted set.
+
+Every rating adds `weight * 2^((t - epoch) / half_life)` to the movie's
+member in `trending:z`. Because later events get exponentially larger
+increments, the set's ordering is exactly the ordering by
+`sum(weight * 2^(-(now - t) / half_life))` — decayed scores — without ever
+rescoring old members. Top-N is a plain `ZREVRANGE` (O(log n + N)).
+
+Increments grow with time, so once they reach 2^REBASE_HALF_LIVES the script
+rescales the whole set back down (`ZUNIONSTORE ... WEIGHTS`) and moves the
+epoch forward. The set is capped at MAX_MEMBERS, dropping the coldest.
+"""
+import time
+from typing import Any
+
+from config import get_settings
+
+TRENDING_KEY = "trending:z"
+EPOCH_KEY = "trending:epoch"
+MAX_MEMBERS = 20_000
+REBASE_HALF_LIVES = 30
+
+# KEYS[1] zset, KEYS[2] epoch; ARGV: now, half_life_s, weight, member, rebase, max.
+_RECORD_LUA = """
+local now = tonumber(ARGV[1])
+local half_life = tonumber(ARGV[2])
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[2], ARGV[1])
+end
+local age = (now - epoch) / half_life
+if age > tonumber(ARGV[5]) then
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', 2 ^ (-age))
+    redis.call('SET', KEYS[2], ARGV[1])
+    age = 0
+end
+redis.call('ZINCRBY', KEYS[1], tonumber(ARGV[3]) * 2 ^ age, ARGV[4])
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[6])
+if excess > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+end
+return 1
+"""
+
+_script: Any = None
+
+
+def _get_script(redis: Any) -> Any:
+    global _script
+    if _script is None or _script.registered_client is not redis:
+        _script = redis.register_script(_RECORD_LUA)
+    return _script
+
+
+async def record_rating(redis: Any, movie_id: int, score: float) -> None:
+    """Count one rating event; better scores weigh more."""
+    half_life = get_settings().trending_half_life_hours * 3600
+    await _get_script(redis)(
+        keys=[TRENDING_KEY, EPOCH_KEY],
+        args=[time.time(), half_life, score / 5.0, movie_id, REBASE_HALF_LIVES, MAX_MEMBERS],
+    )
+
+
+async def top_movie_ids(redis: Any, n: int) -> list[int]:
+    return [int(m) for m in await redis.zrevrange(TRENDING_KEY, 0, n - 1)]
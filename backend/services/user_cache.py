@@ -0,0 +1,123 @@
+"""Short-lived cache of the authenticated user principal.
+
+`get_current_user` runs on every authenticated request; without a cache each
+one costs a `SELECT ... FROM users` and holds a pool connection. The principal
+(id, email, display name, active / verified flags) is cached in two tiers:
+
+- in-process, for `LOCAL_TTL` seconds — no I/O at all on a hit;
+- Redis at `user:principal:{id}`, for `REDIS_TTL` seconds — shared by workers.
+
+Endpoints that change those fields call `invalidate_principal`. That clears
+Redis and this process immediately; other processes may serve their local
+copy for at most `LOCAL_TTL` more seconds.
+
+Invalidation also bumps a per-user version at `user:principal:ver:{id}`. A
+cache miss reads the version together with the entry, and `set_principal`
+only writes back if it is unchanged, so a principal read from the DB just
+before a concurrent invalidation can't be put back in the cache.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+import structlog
+
+from services.codec import decode, encode
+
+LOCAL_TTL = 10.0
+REDIS_TTL = 120
+# Only has to outlive a single request's DB read.
+_VERSION_TTL = 24 * 3600
+_MAX_LOCAL = 10_000
+
+# KEYS[1] entry, KEYS[2] version; ARGV[1] version read on the miss,
+# ARGV[2] ttl, ARGV[3] encoded principal.
+_SET_IF_VERSION_LUA = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+return 1
+"""
+
+_local: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+
+class PrincipalLookup(NamedTuple):
+    principal: dict[str, Any] | None
+    # Version seen on a miss, to pass to `set_principal`; None if Redis failed.
+    version: int | None
+
+
+def _key(user_id: str) -> str:
+    return f"user:principal:{user_id}"
+
+
+def _version_key(user_id: str) -> str:
+    return f"user:principal:ver:{user_id}"
+
+
+async def get_principal(redis: Any, user_id: str) -> PrincipalLookup:
+    hit = _local.get(user_id)
+    now = time.monotonic()
+    if hit is not None:
+        if hit[0] > now:
+            return PrincipalLookup(dict(hit[1]), None)
+        del _local[user_id]
+
+    try:
+        raw, version = await redis.mget(_key(user_id), _version_key(user_id))
+        principal = dict(decode(raw)) if raw else None
+    except Exception:
+        # A Redis blip must not turn into a 401; fall through to the DB.
+        return PrincipalLookup(None, None)
+    if principal is not None:
+        _remember(user_id, principal)
+    return PrincipalLookup(principal, int(version or 0))
+
+
+async def set_principal(redis: Any, principal: dict[str, Any], version: int | None) -> None:
+    """Cache a principal read from the DB after a `get_principal` miss that
+    saw `version`; skipped if the user was invalidated since."""
+    if version is None:
+        return
+    user_id = str(principal["id"])
+    try:
+        written = await redis.eval(
+            _SET_IF_VERSION_LUA,
+            2,
+            _key(user_id),
+            _version_key(user_id),
+            version,
+            REDIS_TTL,
+            encode(principal),
+        )
+    except Exception as e:
+        structlog.get_logger().warning("principal_cache_write_failed", error=str(e))
+        return
+    if written:
+        _remember(user_id, principal)
+
+
+async def invalidate_principal(redis: Any, user_id: str) -> None:
+    """Best effort: callers have already committed the change, and a failed
+    delete only leaves the old principal around for up to `REDIS_TTL`."""
+    user_id = str(user_id)
+    _local.pop(user_id, None)
+    try:
+        pipe = redis.pipeline(transaction=True)
+        pipe.incr(_version_key(user_id))
+        pipe.expire(_version_key(user_id), _VERSION_TTL)
+        pipe.delete(_key(user_id))
+        await pipe.execute()
+    except Exception as e:
+        structlog.get_logger().warning(
+            "principal_invalidate_failed", user_id=user_id, error=str(e)
+        )
+
+
+def _remember(user_id: str, principal: dict[str, Any]) -> None:
+    _local[user_id] = (time.monotonic() + LOCAL_TTL, dict(principal))
+    _local.move_to_end(user_id)
+    if len(_local) > _MAX_LOCAL:
+        _local.popitem(last=False)
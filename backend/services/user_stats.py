@@ -0,0 +1,229 @@
+"""Per-user rating stats, maintained by delta on the rating write path.
+
+`user_stats` holds count, score sum, first / last rating time and a score
+histogram; `user_genre_counts` holds ratings per genre (migration 011). The
+ratings endpoints call `apply_rating_change` / `reset` inside the same
+transaction as the rating write, and `/auth/me/stats` reads one row.
+`reconcile_user_stats` in the analytics tasks repairs any drift.
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+
+from db.database import execute_one
+
+# Histogram bucket i counts scores of (i + 1) / 2, i.e. 0.5 ... 5.0.
+HIST_BUCKETS = 10
+
+_APPLY_SQL = """
+    WITH genres AS (
+        INSERT INTO user_genre_counts AS u (user_id, genre_id, cnt)
+        SELECT $1::uuid, mg.genre_id, $3
+        FROM movie_genres mg
+        WHERE mg.movie_id = $2 AND $3 <> 0
+        ON CONFLICT (user_id, genre_id) DO UPDATE SET cnt = u.cnt + EXCLUDED.cnt
+    )
+    INSERT INTO user_stats AS s (user_id, total, score_sum, score_hist, first_at, last_at)
+    VALUES (
+        $1::uuid, $3, $4, $5::int[],
+        CASE WHEN $3 > 0 THEN NOW() END,
+        CASE WHEN $3 > 0 THEN NOW() END
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        total = s.total + EXCLUDED.total,
+        score_sum = s.score_sum + EXCLUDED.score_sum,
+        score_hist = ARRAY(
+            SELECT a + b
+            FROM UNNEST(s.score_hist, EXCLUDED.score_hist) WITH ORDINALITY AS t(a, b, i)
+            ORDER BY i
+        ),
+        -- A delete may remove the earliest / latest rating; this statement
+        -- runs after it, so the subqueries already see it gone.
+        first_at = CASE WHEN $3 < 0
+            THEN (SELECT MIN(created_at) FROM ratings WHERE user_id = $1::uuid)
+            ELSE LEAST(s.first_at, EXCLUDED.first_at) END,
+        last_at = CASE WHEN $3 < 0
+            THEN (SELECT MAX(created_at) FROM ratings WHERE user_id = $1::uuid)
+            ELSE GREATEST(s.last_at, EXCLUDED.last_at) END
+"""
+
+_READ_SQL = """
+    SELECT
+        s.total, s.score_sum, s.score_hist, s.first_at, s.last_at,
+        (
+            SELECT COALESCE(json_agg(t), '[]')
+            FROM (
+                SELECT g.slug, g.name, u.cnt AS count
+                FROM user_genre_counts u
+                JOIN genres g ON g.id = u.genre_id
+                WHERE u.user_id = s.user_id AND u.cnt > 0
+                ORDER BY u.cnt DESC
+                LIMIT 10
+            ) t
+        ) AS top_genres
+    FROM user_stats s
+    WHERE s.user_id = $1::uuid
+"""
+
+
+_HIST_SQL = ", ".join(
+    f"COUNT(*) FILTER (WHERE r.score * 2 = {b})" for b in range(1, HIST_BUCKETS + 1)
+)
+
+# Reconcile runs in batches of users. Each batch locks its `user_stats` rows
+# before recomputing them, so a concurrent `apply_rating_change` either
+# committed first (and the recompute, a fresh READ COMMITTED snapshot, sees
+# its rating) or waits and applies its delta on top of the corrected row.
+_RECONCILE_BATCH = 1000
+
+# Users with ratings or genre counts but no stats row get an empty one, which
+# the batches then correct or delete.
+_RECONCILE_MISSING_SQL = """
+    INSERT INTO user_stats (user_id)
+    SELECT r.user_id FROM ratings r
+    WHERE NOT EXISTS (SELECT 1 FROM user_stats s WHERE s.user_id = r.user_id)
+    UNION
+    SELECT u.user_id FROM user_genre_counts u
+    WHERE NOT EXISTS (SELECT 1 FROM user_stats s WHERE s.user_id = u.user_id)
+    ON CONFLICT (user_id) DO NOTHING
+"""
+
+_RECONCILE_LOCK_SQL = """
+    SELECT user_id FROM user_stats
+    WHERE user_id > $1::uuid
+    ORDER BY user_id
+    LIMIT $2
+    FOR UPDATE
+"""
+
+_RECONCILE_STATS_SQL = f"""
+    WITH actual AS (
+        SELECT
+            r.user_id,
+            COUNT(*)::int AS total,
+            SUM(r.score) AS score_sum,
+            ARRAY[{_HIST_SQL}]::int[] AS score_hist,
+            MIN(r.created_at) AS first_at,
+            MAX(r.created_at) AS last_at
+        FROM ratings r
+        WHERE r.user_id = ANY($1::uuid[])
+        GROUP BY r.user_id
+    ),
+    stale AS (
+        DELETE FROM user_stats s
+        WHERE s.user_id = ANY($1::uuid[])
+          AND NOT EXISTS (SELECT 1 FROM ratings r WHERE r.user_id = s.user_id)
+    )
+    INSERT INTO user_stats AS s (user_id, total, score_sum, score_hist, first_at, last_at)
+    SELECT * FROM actual
+    ON CONFLICT (user_id) DO UPDATE SET
+        total = EXCLUDED.total,
+        score_sum = EXCLUDED.score_sum,
+        score_hist = EXCLUDED.score_hist,
+        first_at = EXCLUDED.first_at,
+        last_at = EXCLUDED.last_at
+    WHERE (s.total, s.score_sum, s.score_hist, s.first_at, s.last_at)
+        IS DISTINCT FROM
+        (EXCLUDED.total, EXCLUDED.score_sum, EXCLUDED.score_hist,
+         EXCLUDED.first_at, EXCLUDED.last_at)
+"""
+
+_RECONCILE_GENRES_SQL = """
+    WITH actual AS (
+        SELECT r.user_id, mg.genre_id, COUNT(*)::int AS cnt
+        FROM ratings r
+        JOIN movie_genres mg ON mg.movie_id = r.movie_id
+        WHERE r.user_id = ANY($1::uuid[])
+        GROUP BY r.user_id, mg.genre_id
+    ),
+    stale AS (
+        DELETE FROM user_genre_counts u
+        WHERE u.user_id = ANY($1::uuid[])
+          AND NOT EXISTS (
+            SELECT 1 FROM actual a WHERE a.user_id = u.user_id AND a.genre_id = u.genre_id
+          )
+    )
+    INSERT INTO user_genre_counts AS u (user_id, genre_id, cnt)
+    SELECT * FROM actual
+    ON CONFLICT (user_id, genre_id) DO UPDATE SET cnt = EXCLUDED.cnt
+    WHERE u.cnt IS DISTINCT FROM EXCLUDED.cnt
+"""
+
+
+def _bucket(score: Decimal) -> int:
+    return int(score * 2) - 1
+
+
+async def apply_rating_change(
+    conn: Any,
+    user_id: str,
+    movie_id: int,
+    old_score: Decimal | None,
+    new_score: Decimal | None,
+) -> None:
+    """Fold one rating insert / update / delete into the user's stats.
+
+    `old_score` is None for a new rating, `new_score` None for a delete.
+    Call on the connection (and transaction) that made the rating write.
+    """
+    hist = [0] * HIST_BUCKETS
+    if old_score is not None:
+        hist[_bucket(old_score)] -= 1
+    if new_score is not None:
+        hist[_bucket(new_score)] += 1
+    delta_count = (new_score is not None) - (old_score is not None)
+    delta_sum = (new_score or Decimal(0)) - (old_score or Decimal(0))
+    await conn.execute(_APPLY_SQL, user_id, movie_id, delta_count, delta_sum, hist)
+
+
+async def reset(conn: Any, user_id: str) -> None:
+    """Zero the stats after all of a user's ratings were deleted."""
+    # Stats row first, the order `reconcile` locks in, so the two can't deadlock.
+    await conn.execute("DELETE FROM user_stats WHERE user_id = $1::uuid", user_id)
+    await conn.execute("DELETE FROM user_genre_counts WHERE user_id = $1::uuid", user_id)
+
+
+async def reconcile(conn: Any) -> tuple[int, int]:
+    """Rewrite stats and genre-count rows that disagree with `ratings`.
+
+    Works through users in `_RECONCILE_BATCH`-sized transactions, never
+    holding locks on the whole table. Returns the number of (stats, genre)
+    rows inserted or corrected.
+    """
+    await conn.execute(_RECONCILE_MISSING_SQL)
+    stats = genres = 0
+    after = "00000000-0000-0000-0000-000000000000"
+    while True:
+        async with conn.transaction():
+            rows = await conn.fetch(_RECONCILE_LOCK_SQL, after, _RECONCILE_BATCH)
+            if not rows:
+                break
+            user_ids = [r["user_id"] for r in rows]
+            stats += int((await conn.execute(_RECONCILE_STATS_SQL, user_ids)).split()[-1])
+            genres += int((await conn.execute(_RECONCILE_GENRES_SQL, user_ids)).split()[-1])
+        after = str(user_ids[-1])
+    return stats, genres
+
+
+async def get_stats(user_id: str) -> dict[str, Any]:
+    row = await execute_one(_READ_SQL, user_id)
+    if row is None or not row["total"]:
+        return {
+            "total_ratings": 0,
+            "avg_rating": None,
+            "first_rated_at": None,
+            "last_rated_at": None,
+            "top_genres": [],
+            "score_distribution": {},
+        }
+    return {
+        "total_ratings": int(row["total"]),
+        "avg_rating": float(row["score_sum"]) / row["total"],
+        "first_rated_at": row["first_at"].isoformat() if row["first_at"] else None,
+        "last_rated_at": row["last_at"].isoformat() if row["last_at"] else None,
+        "top_genres": orjson.loads(row["top_genres"]),
+        "score_distribution": {
+            f"{(i + 1) / 2:.1f}": n for i, n in enumerate(row["score_hist"]) if n > 0
+        },
+    }
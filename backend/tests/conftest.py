@@ -170,12 +170,13 @@ def seed_movies(test_server) -> list[int]:
             ids = []
             ts = int(time.time() * 1000)
             for i in range(1, 11):
+                avg = round(3.0 + (i % 20) * 0.1, 1)
                 mid = await conn.fetchval(
                     """INSERT INTO movies (title, year, avg_rating, rating_count,
-                                          popularity_score, description)
-                       VALUES ($1, $2, $3, $4, $5, $6) RETURNING id""",
+                                          rating_sum, popularity_score, description)
+                       VALUES ($1, $2, $3, $4, $5, $6, $7) RETURNING id""",
                     f"Test Movie {ts}_{i}", 2000 + i,
-                    round(3.0 + (i % 20) * 0.1, 1), 50 * i,
+                    avg, 50 * i, avg * 50 * i,
                     float(i) / 10.0, f"A test movie about topic {i}",
                 )
                 ids.append(mid)
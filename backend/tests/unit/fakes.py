@@ -0,0 +1,70 @@
+"""In-memory stand-ins shared by the unit tests."""
+from typing import Any
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self._ops: list[tuple[str, tuple[Any, ...]]] = []
+
+    def __getattr__(self, name: str) -> Any:
+        def _queue(*args: Any, **kwargs: Any) -> "FakePipeline":
+            self._ops.append((name, args))
+            return self
+
+        return _queue
+
+    async def execute(self) -> list[Any]:
+        return [await getattr(self._redis, name)(*args) for name, args in self._ops]
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.store: dict[str, Any] = {}
+
+    async def get(self, key: str) -> Any:
+        return self.store.get(key)
+
+    async def delete(self, *keys: str) -> None:
+        for k in keys:
+            self.store.pop(k, None)
+
+    async def mget(self, *keys: str) -> list[Any]:
+        return [self.store.get(k) for k in keys]
+
+    async def setex(self, key: str, ttl: int, value: Any) -> None:
+        self.store[key] = value
+
+    async def incr(self, key: str) -> int:
+        self.store[key] = int(self.store.get(key, 0)) + 1
+        return int(self.store[key])
+
+    async def expire(self, key: str, ttl: int) -> None:
+        pass
+
+    async def set(self, key: str, value: Any, nx: bool = False, ex: int = 0) -> bool:
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    async def eval(self, script: str, numkeys: int, *args: Any) -> int:
+        # Python equivalents of the app's Lua scripts, matched by source.
+        from services import cache, user_cache
+
+        if script == cache._RELEASE_LOCK_LUA:
+            key, token = args
+            if self.store.get(key) == token:
+                del self.store[key]
+                return 1
+            return 0
+        if script == user_cache._SET_IF_VERSION_LUA:
+            key, version_key, version, _ttl, value = args
+            if int(self.store.get(version_key) or 0) != int(version):
+                return 0
+            self.store[key] = value
+            return 1
+        raise NotImplementedError(script)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
@@ -0,0 +1,54 @@
+from typing import Any
+
+from services.autocomplete import TitleIndex, normalize
+
+
+def _row(
+    movie_id: int, title: str, popularity: float, original: str | None = None
+) -> dict[str, Any]:
+    return {
+        "id": movie_id,
+        "title": title,
+        "title_original": original,
+        "year": 2000,
+        "poster_path": None,
+        "popularity_score": popularity,
+    }
+
+
+INDEX = TitleIndex(
+    [
+        _row(1, "The Dark Knight", 90.0),
+        _row(2, "Dark City", 40.0),
+        _row(3, "Darkman", 10.0),
+        _row(4, "Amélie", 50.0, original="Le Fabuleux Destin d'Amélie Poulain"),
+        _row(5, "Knight and Day", 20.0),
+    ]
+)
+
+
+def _ids(query: str, limit: int = 10) -> list[int]:
+    return [m["id"] for m in INDEX.search(query, limit)]
+
+
+def test_normalize_strips_accents_and_punctuation() -> None:
+    assert normalize("  Amélie: Poulain! ") == "amelie poulain"
+
+
+def test_title_start_ranks_above_word_match() -> None:
+    # "The Dark Knight" is more popular but only matches mid-title.
+    assert _ids("dark") == [2, 3, 1]
+    assert _ids("da") == [2, 3, 1, 5]
+
+
+def test_multi_word_prefix_and_original_title() -> None:
+    assert _ids("dark kn") == [1]
+    assert _ids("poulain") == [4]
+    assert _ids("AME") == [4]
+
+
+def test_each_movie_once_and_limit_respected() -> None:
+    assert _ids("knight") == [5, 1]
+    assert _ids("d", limit=2) == [2, 3]
+    assert _ids("zzz") == []
+    assert _ids("!!") == []
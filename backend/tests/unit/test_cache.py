@@ -0,0 +1,75 @@
+from typing import Any
+
+import pytest
+
+from schemas.recommendations import RecommendResponse
+from services import cache
+from services import recommendations as reco_service
+from tests.unit.fakes import FakeRedis
+
+
+async def test_miss_then_fresh_hit() -> None:
+    redis = FakeRedis()
+    miss = await cache.get_cached(redis, "u1", "collaborative", {"limit": 10})
+    assert miss.data is None
+
+    await cache.set_cached(redis, "u1", "collaborative", {"limit": 10}, {"x": 1}, miss.generation)
+    hit = await cache.get_cached(redis, "u1", "collaborative", {"limit": 10})
+    assert hit.data == {"x": 1}
+    assert hit.stale is False
+
+
+async def test_invalidate_marks_entry_stale() -> None:
+    redis = FakeRedis()
+    await cache.set_cached(redis, "u1", "collaborative", None, {"x": 1}, 0)
+    await cache.invalidate_user(redis, "u1")
+
+    lookup = await cache.get_cached(redis, "u1", "collaborative", None)
+    assert lookup.data == {"x": 1}
+    assert lookup.stale is True
+    assert lookup.generation == 1
+
+
+async def test_invalidate_is_per_user() -> None:
+    redis = FakeRedis()
+    await cache.set_cached(redis, "u2", "collaborative", None, {"x": 2}, 0)
+    await cache.invalidate_user(redis, "u1")
+
+    lookup = await cache.get_cached(redis, "u2", "collaborative", None)
+    assert lookup.stale is False
+
+
+async def test_refresh_lock_release_requires_owner_token() -> None:
+    redis = FakeRedis()
+    token = await cache.acquire_refresh_lock(redis, "u1", "collaborative", None)
+    assert token is not None
+    assert await cache.acquire_refresh_lock(redis, "u1", "collaborative", None) is None
+
+    await cache.release_refresh_lock(redis, "u1", "collaborative", None, "not-the-owner")
+    assert await cache.acquire_refresh_lock(redis, "u1", "collaborative", None) is None
+
+    await cache.release_refresh_lock(redis, "u1", "collaborative", None, token)
+    assert await cache.acquire_refresh_lock(redis, "u1", "collaborative", None) is not None
+
+
+async def test_second_stale_read_refreshes_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    redis = FakeRedis()
+    params = {"limit": 10, "filters": None}
+    computed: list[int] = []
+
+    async def fake_compute(*args: Any) -> RecommendResponse:
+        computed.append(1)
+        return RecommendResponse(
+            items=[], model_version="test", latency_ms=0, request_id="", cached=False
+        )
+
+    monkeypatch.setattr(reco_service, "_compute_collaborative", fake_compute)
+
+    for _ in range(2):
+        await cache.invalidate_user(redis, "u1")
+        lookup = await cache.get_cached(redis, "u1", "collaborative", params)
+        await reco_service._revalidate_collaborative(
+            "u1", [], 10, params, redis, lookup.generation
+        )
+
+    assert len(computed) == 2
@@ -0,0 +1,44 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from services import codec
+
+PAYLOAD = {"items": [{"id": i, "title": f"Movie {i}", "avg_rating": 3.5} for i in range(50)]}
+
+
+def _use(monkeypatch: pytest.MonkeyPatch, name: str, min_bytes: int = 1024) -> None:
+    settings = SimpleNamespace(cache_codec=name, cache_compress_min_bytes=min_bytes)
+    monkeypatch.setattr(codec, "get_settings", lambda: settings)
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack"])
+def test_roundtrip(monkeypatch: pytest.MonkeyPatch, name: str) -> None:
+    _use(monkeypatch, name)
+    assert codec.decode(codec.encode(PAYLOAD)) == PAYLOAD
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack"])
+def test_large_payload_is_compressed(monkeypatch: pytest.MonkeyPatch, name: str) -> None:
+    _use(monkeypatch, name, min_bytes=64)
+    raw = codec.encode(PAYLOAD)
+    assert len(raw) < len(json.dumps(PAYLOAD))
+    assert codec.decode(raw) == PAYLOAD
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack"])
+def test_json_body(monkeypatch: pytest.MonkeyPatch, name: str) -> None:
+    _use(monkeypatch, name, min_bytes=64)
+    assert json.loads(codec.to_json_body(codec.encode(PAYLOAD))) == PAYLOAD
+
+
+def test_legacy_json_value_still_decodes() -> None:
+    legacy = json.dumps([{"id": 1}])
+    assert codec.decode(legacy) == [{"id": 1}]
+    assert codec.to_json_body(legacy.encode()) == legacy.encode()
+
+
+def test_garbage_raises_value_error() -> None:
+    with pytest.raises(ValueError):
+        codec.decode(b"\x7fnope")
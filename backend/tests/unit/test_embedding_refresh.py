@@ -0,0 +1,45 @@
+from typing import Any
+
+import numpy as np
+
+from workers.tasks.recommendations import _refresh_users
+
+
+class FakeConn:
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self._rows = rows
+        self.upserted: tuple[list[str], list[str]] | None = None
+
+    async def fetch(self, query: str, *args: Any) -> list[dict[str, Any]]:
+        return self._rows
+
+    async def execute(self, query: str, ids: list[str], vectors: list[str]) -> None:
+        self.upserted = (ids, vectors)
+
+
+def _parse(vec: str) -> np.ndarray:
+    return np.array([float(x) for x in vec.strip("[]").split(",")])
+
+
+async def test_weighted_mean_per_user() -> None:
+    conn = FakeConn(
+        [
+            {"user_id": "a", "embedding": [1.0, 0.0], "score": 5.0},
+            {"user_id": "a", "embedding": [0.0, 1.0], "score": 2.5},
+            {"user_id": "b", "embedding": [0.0, 3.0], "score": 4.0},
+        ]
+    )
+    assert await _refresh_users(conn, ["a", "b"]) == 2
+    assert conn.upserted is not None
+
+    ids, vectors = conn.upserted
+    assert ids == ["a", "b"]
+    expected_a = np.array([2.0, 1.0]) / np.linalg.norm([2.0, 1.0])
+    np.testing.assert_allclose(_parse(vectors[0]), expected_a, atol=1e-6)
+    np.testing.assert_allclose(_parse(vectors[1]), [0.0, 1.0], atol=1e-6)
+
+
+async def test_zero_norm_user_is_skipped() -> None:
+    conn = FakeConn([{"user_id": "a", "embedding": [0.0, 0.0], "score": 4.0}])
+    assert await _refresh_users(conn, ["a"]) == 0
+    assert conn.upserted is None
@@ -0,0 +1,95 @@
+from typing import Any
+
+import pytest
+
+from services import cv_client, emotion_pools, jobs
+from services import recommendations as reco_service
+from tests.unit.fakes import FakeRedis
+
+
+def _row(emotion: str, movie_id: int) -> dict[str, Any]:
+    return {
+        "emotion": emotion,
+        "id": movie_id,
+        "title": f"Movie {movie_id}",
+        "year": 2000,
+        "avg_rating": None,
+        "poster_path": None,
+        "genres": ["Comedy"],
+    }
+
+
+def test_group_pools_keeps_rank_order_per_emotion() -> None:
+    pools = emotion_pools.group_pools([_row("happy", 3), _row("happy", 1), _row("sad", 2)])
+
+    assert [m["id"] for m in pools["happy"]] == [3, 1]
+    assert [m["id"] for m in pools["sad"]] == [2]
+    assert pools["fear"] == []
+    assert "emotion" not in pools["happy"][0]
+
+
+def test_rerank_puts_ranked_ids_first() -> None:
+    pool = [{"id": i} for i in (1, 2, 3, 4)]
+    assert [m["id"] for m in emotion_pools.rerank(pool, [3, 1])] == [3, 1, 2, 4]
+
+
+async def test_emotion_recommendations_read_cached_pool_only(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    redis = FakeRedis()
+    queries: list[str] = []
+
+    async def fake_detect(image_bytes: bytes) -> dict[str, Any]:
+        return {"emotion": "happy", "confidence": 0.9}
+
+    async def fake_query(sql: str, *args: Any) -> list[dict[str, Any]]:
+        queries.append(sql)
+        return [_row("happy", i) for i in range(1, 13)] + [_row("sad", 99)]
+
+    async def fake_set(key: str, value: Any, nx: bool = False, ex: int = 0) -> bool:
+        return True
+
+    monkeypatch.setattr(cv_client, "detect_emotion", fake_detect)
+    monkeypatch.setattr(reco_service, "execute_query", fake_query)
+    monkeypatch.setattr(redis, "set", fake_set, raising=False)
+
+    for _ in range(2):
+        resp = await reco_service.get_emotion_recommendations(b"img", 10, "r", redis, "u")
+        assert resp.emotion == "happy"
+        assert [i.movie_id for i in resp.items] == list(range(1, 11))
+
+    assert queries == [emotion_pools.READ_POOLS_SQL]
+
+
+async def test_empty_table_falls_back_to_genre_query_and_enqueues_refresh(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    redis = FakeRedis()
+    enqueued: list[str] = []
+    fallback_genres: list[list[str]] = []
+
+    async def fake_detect(image_bytes: bytes) -> dict[str, Any]:
+        return {"emotion": "sad", "confidence": 0.8}
+
+    async def fake_query(sql: str, *args: Any) -> list[dict[str, Any]]:
+        if sql == emotion_pools.READ_POOLS_SQL:
+            return []
+        fallback_genres.append(args[0])
+        return [_row("sad", 7)]
+
+    async def fake_enqueue(task_name: str) -> None:
+        enqueued.append(task_name)
+
+    monkeypatch.setattr(cv_client, "detect_emotion", fake_detect)
+    monkeypatch.setattr(reco_service, "execute_query", fake_query)
+    monkeypatch.setattr(jobs, "enqueue", fake_enqueue)
+
+    for _ in range(2):
+        resp = await reco_service.get_emotion_recommendations(b"img", 10, "r", redis, "u")
+        assert [i.movie_id for i in resp.items] == [7]
+        # The empty stand-in's short TTL ran out.
+        del redis.store[emotion_pools.POOLS_KEY]
+
+    assert fallback_genres == [emotion_pools.EMOTION_TO_GENRES["sad"]] * 2
+    assert enqueued == [emotion_pools.REFRESH_TASK]
+    assert emotion_pools.POOLS_LOCK_KEY not in redis.store
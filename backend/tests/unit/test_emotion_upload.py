@@ -0,0 +1,84 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+
+from exceptions import InvalidImageError
+from routers import recommendations as reco_router
+from services import recommendations as reco_service
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 12
+
+
+def _request(
+    chunks: list[bytes], content_type: str = "image/jpeg", *, disconnect: bool = False
+) -> Request:
+    messages = [
+        {"type": "http.request", "body": c, "more_body": disconnect or i < len(chunks) - 1}
+        for i, c in enumerate(chunks)
+    ]
+    if disconnect:
+        messages.append({"type": "http.disconnect"})
+
+    async def receive() -> dict[str, Any]:
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/v1/recommendations/emotion",
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    return Request(scope, receive)
+
+
+async def _drain(stream: Any) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def test_stream_body_forwards_chunks_unchanged() -> None:
+    chunks = [JPEG[:4], JPEG[4:], b"a" * 100, b"b" * 100]
+    stream = await reco_router._stream_body(_request(chunks), limit=1000)
+    assert await _drain(stream) == b"".join(chunks)
+
+
+async def test_stream_body_rejects_unknown_type_before_forwarding() -> None:
+    with pytest.raises(InvalidImageError):
+        await reco_router._stream_body(_request([b"GIF89a" + b"\x00" * 20]), limit=1000)
+
+
+async def test_stream_body_cuts_off_past_limit() -> None:
+    stream = await reco_router._stream_body(_request([JPEG, b"x" * 60, b"x" * 60]), limit=100)
+    with pytest.raises(InvalidImageError):
+        await _drain(stream)
+
+
+async def test_form_image_is_read_bounded() -> None:
+    boundary = "b0undary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="a.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + JPEG + b"x" * 50 + f"\r\n--{boundary}--\r\n".encode()
+    content_type = f"multipart/form-data; boundary={boundary}"
+
+    content = await reco_router._read_form_image(_request([body], content_type), limit=1000)
+    assert content == JPEG + b"x" * 50
+
+    with pytest.raises(InvalidImageError):
+        await reco_router._read_form_image(_request([body], content_type), limit=40)
+
+
+async def test_emotion_client_disconnect_is_not_a_server_error(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def fake_recommend(image: AsyncIterator[bytes], **kwargs: Any) -> None:
+        await _drain(image)
+
+    monkeypatch.setattr(reco_service, "get_emotion_recommendations", fake_recommend)
+    request = _request([JPEG, b"x" * 10], disconnect=True)
+    resp = await reco_router.emotion(request, current_user={"id": "u"}, redis=None)
+    assert isinstance(resp, Response)
+    assert resp.status_code == 499
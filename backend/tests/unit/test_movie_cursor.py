@@ -0,0 +1,49 @@
+import base64
+from decimal import Decimal
+from typing import Any
+
+import orjson
+import pytest
+
+from exceptions import InvalidCursorError
+from routers.movies import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip() -> None:
+    cursor = _encode_cursor("popularity", Decimal("87.1234"), 42)
+    assert _decode_cursor(cursor, "popularity") == ("87.1234", 42)
+
+
+def test_cursor_is_bound_to_order_by() -> None:
+    cursor = _encode_cursor("rating", Decimal("4.25"), 7)
+    with pytest.raises(InvalidCursorError):
+        _decode_cursor(cursor, "year")
+
+
+@pytest.mark.parametrize("cursor", ["123", "not-base64!", _encode_cursor("year", "19x9", 1)])
+def test_malformed_cursor_rejected(cursor: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        _decode_cursor(cursor, "year")
+
+
+def _forge(payload: list[Any]) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).rstrip(b"=").decode("ascii")
+
+
+@pytest.mark.parametrize(
+    ("order_by", "payload"),
+    [
+        ("rating", ["rating", 5, 1]),
+        ("year", ["year", 3.5, 1]),
+        ("year", ["year", "1999", True]),
+        ("year", ["year", "1999", 2**31]),
+        ("year", ["year", "1999", 0]),
+        ("year", ["year", "99999999999", 1]),
+        ("year", ["year", "1_999", 1]),
+        ("rating", ["rating", "NaN", 1]),
+        ("rating", ["rating", "\u0664.5", 1]),
+    ],
+)
+def test_forged_cursor_rejected(order_by: str, payload: list[Any]) -> None:
+    with pytest.raises(InvalidCursorError):
+        _decode_cursor(_forge(payload), order_by)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from workers.tasks.recommendations import top_k_neighbors
+
+
+def _normalised(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    m = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def test_matches_brute_force_across_blocks() -> None:
+    matrix = _normalised(300, 16)
+    rows = np.arange(300)
+    idx, sims = top_k_neighbors(matrix, rows, k=10, block=64)
+
+    full = matrix @ matrix.T
+    np.fill_diagonal(full, -np.inf)
+    expected = np.argsort(-full, axis=1, kind="stable")[:, :10]
+    np.testing.assert_array_equal(idx, expected)
+    np.testing.assert_allclose(sims, np.take_along_axis(full, expected, axis=1), rtol=1e-5)
+
+
+def test_excludes_self_and_caps_k() -> None:
+    matrix = _normalised(4, 3)
+    idx, _ = top_k_neighbors(matrix, np.array([2]), k=50)
+    assert idx.shape == (1, 3)
+    assert 2 not in idx[0]
@@ -0,0 +1,59 @@
+import json
+from typing import Any
+
+import pytest
+
+from routers import movies
+from schemas.movies import MovieBatchRequest
+from services.cache import set_response
+from tests.unit.fakes import FakeRedis
+
+
+def _row(movie_id: int) -> dict[str, Any]:
+    return {
+        "id": movie_id,
+        "title": f"Movie {movie_id}",
+        "year": 2000,
+        "avg_rating": None,
+        "rating_count": 0,
+        "poster_path": None,
+        "description": None,
+        "runtime_minutes": None,
+        "imdb_id": None,
+        "genres": ["Drama"],
+        "credits": json.dumps(
+            [
+                {
+                    "id": 1,
+                    "name": "A",
+                    "profile_path": None,
+                    "role": "director",
+                    "character_name": None,
+                    "order_index": 0,
+                }
+            ]
+        ),
+    }
+
+
+async def test_batch_serves_hits_and_queries_only_misses(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    redis = FakeRedis()
+    await set_response(redis, "movie:1", 60, {"id": 1, "title": "Cached"})
+    queried: list[list[int]] = []
+
+    async def fake_query(sql: str, ids: list[int]) -> list[dict[str, Any]]:
+        queried.append(ids)
+        return [_row(i) for i in ids if i != 404]
+
+    monkeypatch.setattr(movies, "execute_query", fake_query)
+    resp = await movies.movies_batch(MovieBatchRequest(ids=[2, 1, 404, 2]), redis)
+    body = json.loads(bytes(resp.body))
+
+    assert queried == [[2, 404]]
+    assert [m["id"] for m in body["items"]] == [2, 1]
+    assert body["items"][1]["title"] == "Cached"
+    assert body["items"][0]["credits"][0]["person"]["name"] == "A"
+    assert body["missing"] == [404]
+    assert "movie:2" in redis.store
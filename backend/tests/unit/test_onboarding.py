@@ -0,0 +1,57 @@
+from typing import Any
+
+import pytest
+
+from routers import movies
+from services import jobs, onboarding
+from services.onboarding import select_diverse
+from tests.unit.fakes import FakeRedis
+
+
+def _movie(movie_id: int, genre: str) -> dict[str, Any]:
+    return {"id": movie_id, "genres": [genre]}
+
+
+def test_caps_primary_genre_then_tops_up() -> None:
+    pool = [_movie(i, "Drama") for i in range(10)] + [_movie(100 + i, "Comedy") for i in range(3)]
+    picked = select_diverse(pool, 10)
+
+    assert len(picked) == 10
+    # Quota is max(3, 10 // 6) = 3 per genre on the first pass.
+    assert [m["id"] for m in picked[:6]] == [0, 1, 2, 100, 101, 102]
+    assert [m["id"] for m in picked[6:]] == [3, 4, 5, 6]
+
+
+def test_same_pool_serves_any_limit() -> None:
+    pool = [_movie(i, f"g{i % 5}") for i in range(200)]
+    assert len(select_diverse(pool, 10)) == 10
+    assert len(select_diverse(pool, 100)) == 100
+
+
+async def test_empty_table_serves_popular_titles_and_enqueues_refresh(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    redis = FakeRedis()
+    enqueued: list[str] = []
+
+    async def fake_query(sql: str, *args: Any) -> list[dict[str, Any]]:
+        if sql == onboarding.READ_POOL_SQL:
+            return []
+        return [{"id": 1, "title": "Popular", "genres": ["Drama"]}]
+
+    async def fake_enqueue(task_name: str) -> None:
+        enqueued.append(task_name)
+
+    monkeypatch.setattr(movies, "execute_query", fake_query)
+    monkeypatch.setattr(jobs, "enqueue", fake_enqueue)
+
+    for _ in range(2):
+        pool = await movies._onboarding_pool(redis)
+        assert [m["id"] for m in pool] == [1]
+        assert onboarding.POOL_LOCK_KEY not in redis.store
+        assert onboarding.POOL_KEY in redis.store
+        # The fallback's short TTL ran out.
+        del redis.store[onboarding.POOL_KEY]
+
+    # A refresh that finds nothing to rank must not be re-enqueued every minute.
+    assert enqueued == [onboarding.REFRESH_TASK]
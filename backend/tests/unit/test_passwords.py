@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from exceptions import PasswordHasherBusyError
+from services import passwords
+
+
+def _settings(**overrides) -> SimpleNamespace:
+    values = {"bcrypt_rounds": 10, "password_hash_workers": 1, "password_hash_max_queue": 0}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+async def test_hash_and_verify(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(passwords, "get_settings", lambda: _settings(password_hash_max_queue=4))
+    hashed = await passwords.hash_password("s3cret!")
+    assert await passwords.verify_password("s3cret!", hashed)
+    assert not await passwords.verify_password("wrong", hashed)
+
+
+async def test_rejects_when_saturated(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(passwords, "get_settings", lambda: _settings())
+    first = asyncio.ensure_future(passwords.hash_password("a"))
+    await asyncio.sleep(0)
+    with pytest.raises(PasswordHasherBusyError):
+        await passwords.hash_password("b")
+    await first
+
+
+def test_needs_rehash(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(passwords, "get_settings", lambda: _settings(bcrypt_rounds=12))
+    assert not passwords.needs_rehash("$2b$12$" + "x" * 53)
+    assert passwords.needs_rehash("$2b$10$" + "x" * 53)
+    assert not passwords.needs_rehash("not-a-bcrypt-hash")
+
+
+async def test_login_rehash_skips_when_saturated(monkeypatch: pytest.MonkeyPatch) -> None:
+    from routers import auth
+
+    async def busy(password: str) -> str:
+        raise PasswordHasherBusyError()
+
+    async def fail_write(*args: object) -> None:
+        raise AssertionError("rehash must not write without a new hash")
+
+    monkeypatch.setattr(auth, "hash_password", busy)
+    monkeypatch.setattr("db.database.execute_write", fail_write)
+    await auth._rehash("u1", "s3cret!")
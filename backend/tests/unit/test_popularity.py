@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any
+
+from workers.tasks.analytics import _update_popularity
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+LAST_RUN = NOW - timedelta(hours=1)
+STATS = {"raw_min": 1.0, "raw_max": 10.0, "last_run_at": LAST_RUN}
+
+
+class FakeConn:
+    def __init__(self, stats: dict[str, Any] | None, changed: list[dict[str, Any]]) -> None:
+        self._stats = stats
+        self._changed = changed
+        self.full = False
+        self.rescored: list[int] | None = None
+
+    async def fetchval(self, query: str, *args: Any) -> Any:
+        if query == "SELECT NOW()":
+            return NOW
+        self.full = True
+        return 7
+
+    async def fetchrow(self, query: str, *args: Any) -> dict[str, Any] | None:
+        return self._stats
+
+    async def fetch(self, query: str, *args: Any) -> list[dict[str, Any]]:
+        return self._changed
+
+    async def execute(self, query: str, *args: Any) -> str:
+        if "popularity_stats" in query:
+            return "UPDATE 1"
+        self.rescored = args[0]
+        return f"UPDATE {len(args[0])}"
+
+
+def _movie(
+    movie_id: int, old: str, raw: float, created_at: datetime = NOW - timedelta(days=30)
+) -> dict[str, Any]:
+    return {"id": movie_id, "old": Decimal(old), "raw": raw, "created_at": created_at}
+
+
+async def test_first_run_recomputes_everything() -> None:
+    conn = FakeConn(None, [])
+    assert await _update_popularity(conn) == ("full", 0, 7)
+    assert conn.full
+
+
+async def test_in_bounds_change_rescores_only_changed_movies() -> None:
+    conn = FakeConn(STATS, [_movie(1, "40", 5.0), _movie(2, "100", 10.0)])
+    assert await _update_popularity(conn) == ("incremental", 2, 2)
+    assert not conn.full
+    assert conn.rescored == [1, 2]
+
+
+async def test_change_outside_bounds_recomputes_everything() -> None:
+    conn = FakeConn(STATS, [_movie(1, "40", 5.0), _movie(2, "90", 12.0)])
+    assert await _update_popularity(conn) == ("full", 2, 7)
+    assert conn.rescored is None
+
+
+async def test_bound_holder_moving_off_bound_recomputes_everything() -> None:
+    conn = FakeConn(STATS, [_movie(1, "0", 2.0)])
+    assert (await _update_popularity(conn))[0] == "full"
+
+    conn = FakeConn(STATS, [_movie(1, "100", 9.0)])
+    assert (await _update_popularity(conn))[0] == "full"
+
+
+async def test_new_unscored_movie_is_not_a_bound_holder() -> None:
+    conn = FakeConn(STATS, [_movie(1, "0", 2.0, created_at=NOW - timedelta(minutes=10))])
+    assert await _update_popularity(conn) == ("incremental", 1, 1)
+    assert conn.rescored == [1]
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from starlette.types import ASGIApp
+
+from middleware.rate_limit import RateLimitMiddleware, _LocalBucket
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.counts: dict[str, int] = {}
+        self.calls = 0
+
+    def register_script(self, _source: str) -> Any:
+        async def _run(keys: list[str], args: list[int]) -> list[int]:
+            self.calls += 1
+            self.counts[keys[0]] = self.counts.get(keys[0], 0) + int(args[0])
+            return [self.counts[keys[0]], self.counts.get(keys[1], 0)]
+
+        return _run
+
+
+class FixedLimit(RateLimitMiddleware):
+    def __init__(self, app: ASGIApp, limit: tuple[int, int]) -> None:
+        super().__init__(app, redis_url="redis://unused")
+        self.limit = limit
+
+    def _get_limit(self, path: str) -> tuple[int, int]:
+        return self.limit
+
+
+def _client(limit: tuple[int, int]) -> tuple[TestClient, FakeRedis]:
+    app = Starlette(routes=[Route("/v1/x", lambda r: PlainTextResponse("ok"))])
+    limiter = FixedLimit(app, limit)
+    redis = FakeRedis()
+    limiter._redis = redis
+    return TestClient(limiter), redis
+
+
+def test_remaining_header_counts_down() -> None:
+    client, _ = _client((5, 60))
+    first = client.get("/v1/x")
+    second = client.get("/v1/x")
+    assert first.headers["X-RateLimit-Limit"] == "5"
+    assert int(second.headers["X-RateLimit-Remaining"]) < int(
+        first.headers["X-RateLimit-Remaining"]
+    )
+
+
+def test_rejects_over_limit() -> None:
+    client, _ = _client((3, 60))
+    statuses = [client.get("/v1/x").status_code for _ in range(5)]
+    assert statuses[:3] == [200, 200, 200]
+    assert statuses[-1] == 429
+
+
+def test_local_bucket_absorbs_under_limit_traffic() -> None:
+    client, redis = _client((1000, 60))
+    for _ in range(20):
+        assert client.get("/v1/x").status_code == 200
+    assert redis.calls < 20
+
+
+async def test_concurrent_syncs_flush_pending_hits_once() -> None:
+    limiter = FixedLimit(Starlette(), (1000, 60))
+    redis = FakeRedis()
+    limiter._redis = redis
+    release = asyncio.Event()
+    run = redis.register_script("")
+
+    async def slow_script(keys: list[str], args: list[int]) -> list[int]:
+        await release.wait()
+        result: list[int] = await run(keys, args)
+        return result
+
+    limiter._script = slow_script
+    previous = _LocalBucket(window_index=1, tokens=5, synced_at=0.0, estimate=0.0)
+    previous.pending = 3
+    limiter._buckets["k"] = previous
+
+    syncs = [asyncio.create_task(limiter._sync("k", 1000, 60, 1, 60.0)) for _ in range(2)]
+    await asyncio.sleep(0)
+    # A request admitted from the old bucket while both syncs are in flight.
+    previous.pending += 1
+    release.set()
+    await asyncio.gather(*syncs)
+
+    assert redis.counts["k:1"] == 3 + 2
+    assert limiter._buckets["k"].pending == 1
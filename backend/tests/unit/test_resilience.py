@@ -0,0 +1,133 @@
+import asyncio
+
+import httpx
+import pytest
+
+from exceptions import MLServiceUnavailableError
+from services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(
+    clock: FakeClock,
+    *,
+    min_calls: int = 4,
+    error_rate: float = 0.5,
+    open_seconds: float = 10.0,
+    half_open_probes: int = 2,
+) -> CircuitBreaker:
+    return CircuitBreaker(
+        "test",
+        window_seconds=30.0,
+        min_calls=min_calls,
+        error_rate=error_rate,
+        open_seconds=open_seconds,
+        half_open_probes=half_open_probes,
+        clock=clock,
+    )
+
+
+async def _fail() -> None:
+    raise httpx.ConnectError("down")
+
+
+async def _ok() -> str:
+    return "ok"
+
+
+class TestCircuitBreaker:
+    async def test_trips_after_error_rate(self) -> None:
+        clock = FakeClock()
+        cb = _breaker(clock)
+        for _ in range(4):
+            with pytest.raises(httpx.ConnectError):
+                await cb.call(_fail)
+        assert cb.state == OPEN
+
+    async def test_open_fails_fast(self) -> None:
+        clock = FakeClock()
+        cb = _breaker(clock)
+        cb._trip(clock.now)
+        calls = 0
+
+        async def _count() -> None:
+            nonlocal calls
+            calls += 1
+
+        with pytest.raises(MLServiceUnavailableError):
+            await cb.call(_count)
+        assert calls == 0
+
+    async def test_half_open_probes_close(self) -> None:
+        clock = FakeClock()
+        cb = _breaker(clock)
+        cb._trip(clock.now)
+        clock.now += 11
+        assert cb.state == HALF_OPEN
+        assert await cb.call(_ok) == "ok"
+        assert cb.state == HALF_OPEN
+        assert await cb.call(_ok) == "ok"
+        assert cb.state == CLOSED
+
+    async def test_half_open_failure_reopens(self) -> None:
+        clock = FakeClock()
+        cb = _breaker(clock)
+        cb._trip(clock.now)
+        clock.now += 11
+        with pytest.raises(httpx.ConnectError):
+            await cb.call(_fail)
+        assert cb.state == OPEN
+
+    async def test_client_errors_do_not_trip(self) -> None:
+        clock = FakeClock()
+        cb = _breaker(clock)
+        request = httpx.Request("POST", "http://svc/search")
+        response = httpx.Response(422, request=request)
+
+        async def _bad_request() -> None:
+            raise httpx.HTTPStatusError("422", request=request, response=response)
+
+        for _ in range(6):
+            with pytest.raises(httpx.HTTPStatusError):
+                await cb.call(_bad_request)
+        assert cb.state == CLOSED
+
+    async def test_untimed_calls_never_count_as_slow(self) -> None:
+        clock = FakeClock()
+        cb = _breaker(clock)
+
+        async def _slow_upload() -> str:
+            clock.now += 5
+            return "ok"
+
+        for _ in range(4):
+            assert await cb.call(_slow_upload, timed=False) == "ok"
+        assert cb.state == CLOSED
+        assert not cb._latencies
+
+        clock.now += 60
+        for _ in range(4):
+            await cb.call(_slow_upload)
+        assert cb.state == OPEN
+
+    async def test_hedge_returns_faster_attempt(self) -> None:
+        cb = CircuitBreaker("test-hedge", hedge_default_delay=0.01)
+        attempts = 0
+
+        async def _slow_then_fast() -> str:
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                await asyncio.sleep(1.0)
+                return "primary"
+            return "hedge"
+
+        assert await cb.call(_slow_then_fast, hedge=True) == "hedge"
+        assert attempts == 2
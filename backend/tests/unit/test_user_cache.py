@@ -0,0 +1,70 @@
+from typing import Any
+
+from services import user_cache
+from tests.unit.fakes import FakeRedis
+
+PRINCIPAL: dict[str, Any] = {
+    "id": "11111111-1111-1111-1111-111111111111",
+    "email": "a@test.com",
+    "display_name": "A",
+    "is_active": True,
+    "email_verified": True,
+}
+
+
+async def _fill(redis: FakeRedis) -> None:
+    """A cache miss followed by the DB read being written back."""
+    user_cache._local.clear()
+    miss = await user_cache.get_principal(redis, PRINCIPAL["id"])
+    assert miss.principal is None
+    await user_cache.set_principal(redis, PRINCIPAL, miss.version)
+
+
+async def test_set_then_get_from_both_tiers() -> None:
+    redis = FakeRedis()
+    await _fill(redis)
+    assert (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal == PRINCIPAL
+
+    user_cache._local.clear()
+    assert (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal == PRINCIPAL
+
+
+async def test_invalidate_clears_both_tiers() -> None:
+    redis = FakeRedis()
+    await _fill(redis)
+    await user_cache.invalidate_principal(redis, PRINCIPAL["id"])
+    assert (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal is None
+
+
+async def test_stale_read_is_not_written_back_after_invalidate() -> None:
+    redis = FakeRedis()
+    user_cache._local.clear()
+    miss = await user_cache.get_principal(redis, PRINCIPAL["id"])
+    # The user is deleted/verified between the miss and the write-back.
+    await user_cache.invalidate_principal(redis, PRINCIPAL["id"])
+    await user_cache.set_principal(redis, PRINCIPAL, miss.version)
+
+    assert (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal is None
+    await _fill(redis)
+    assert (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal == PRINCIPAL
+
+
+async def test_returned_dict_is_a_copy() -> None:
+    redis = FakeRedis()
+    await _fill(redis)
+    got = (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal
+    assert got is not None
+    got["email_verified"] = False
+    again = (await user_cache.get_principal(redis, PRINCIPAL["id"])).principal
+    assert again is not None and again["email_verified"] is True
+
+
+async def test_invalidate_survives_redis_errors() -> None:
+    class DownRedis(FakeRedis):
+        async def delete(self, *keys: str) -> None:
+            raise ConnectionError("redis down")
+
+    redis = DownRedis()
+    await _fill(redis)
+    await user_cache.invalidate_principal(redis, PRINCIPAL["id"])
+    assert PRINCIPAL["id"] not in user_cache._local
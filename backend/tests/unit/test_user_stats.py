@@ -0,0 +1,109 @@
+import contextlib
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any
+
+import pytest
+
+from services import user_stats
+
+
+class FakeConn:
+    def __init__(self) -> None:
+        self.calls: list[tuple[Any, ...]] = []
+
+    async def execute(self, query: str, *args: Any) -> None:
+        self.calls.append(args)
+
+
+@pytest.mark.parametrize(
+    ("old", "new", "count", "total", "hist"),
+    [
+        (None, Decimal("4.5"), 1, Decimal("4.5"), {8: 1}),
+        (Decimal("2.0"), Decimal("3.5"), 0, Decimal("1.5"), {3: -1, 6: 1}),
+        (Decimal("0.5"), None, -1, Decimal("-0.5"), {0: -1}),
+    ],
+)
+async def test_apply_rating_change_deltas(
+    old: Decimal | None,
+    new: Decimal | None,
+    count: int,
+    total: Decimal,
+    hist: dict[int, int],
+) -> None:
+    conn = FakeConn()
+    await user_stats.apply_rating_change(conn, "u", 7, old, new)
+
+    (args,) = conn.calls
+    assert args[:4] == ("u", 7, count, total)
+    assert args[4] == [hist.get(i, 0) for i in range(user_stats.HIST_BUCKETS)]
+
+
+async def test_get_stats_formats_row(monkeypatch: pytest.MonkeyPatch) -> None:
+    at = datetime(2026, 1, 2, tzinfo=timezone.utc)
+    row = {
+        "total": 4,
+        "score_sum": Decimal("14.0"),
+        "score_hist": [0, 0, 0, 0, 0, 1, 0, 2, 0, 1],
+        "first_at": at,
+        "last_at": at,
+        "top_genres": '[{"slug": "drama", "name": "Drama", "count": 3}]',
+    }
+
+    async def fake_execute_one(query: str, *args: Any) -> dict[str, Any]:
+        return row
+
+    monkeypatch.setattr(user_stats, "execute_one", fake_execute_one)
+    stats = await user_stats.get_stats("u")
+
+    assert stats["total_ratings"] == 4
+    assert stats["avg_rating"] == 3.5
+    assert stats["first_rated_at"] == at.isoformat()
+    assert stats["top_genres"] == [{"slug": "drama", "name": "Drama", "count": 3}]
+    assert stats["score_distribution"] == {"3.0": 1, "4.0": 2, "5.0": 1}
+
+
+async def test_get_stats_without_ratings(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def fake_execute_one(query: str, *args: Any) -> None:
+        return None
+
+    monkeypatch.setattr(user_stats, "execute_one", fake_execute_one)
+    stats = await user_stats.get_stats("u")
+
+    assert stats["total_ratings"] == 0
+    assert stats["score_distribution"] == {}
+
+
+class ReconcileConn:
+    def __init__(self, user_ids: list[str]) -> None:
+        self._user_ids = user_ids
+        self.batches: list[list[str]] = []
+        self.in_transaction = False
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        self.in_transaction = True
+        yield
+        self.in_transaction = False
+
+    async def fetch(self, query: str, after: str, limit: int) -> list[dict[str, Any]]:
+        assert "FOR UPDATE" in query and self.in_transaction
+        return [{"user_id": u} for u in self._user_ids if u > after][:limit]
+
+    async def execute(self, query: str, *args: Any) -> str:
+        if not args:
+            return "INSERT 0 0"
+        assert self.in_transaction
+        if "user_genre_counts AS u" in query:
+            return "INSERT 0 2"
+        self.batches.append(args[0])
+        return f"INSERT 0 {len(args[0])}"
+
+
+async def test_reconcile_locks_and_recomputes_in_batches(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(user_stats, "_RECONCILE_BATCH", 2)
+    conn = ReconcileConn(["a", "b", "c", "d", "e"])
+
+    assert await user_stats.reconcile(conn) == (5, 6)
+    assert conn.batches == [["a", "b"], ["c", "d"], ["e"]]
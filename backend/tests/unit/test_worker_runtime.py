@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from workers import runtime
+
+
+def test_run_reuses_one_loop() -> None:
+    async def _current() -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    assert runtime.run(_current()) is runtime.run(_current())
+
+
+def test_http_client_is_shared() -> None:
+    assert runtime.get_http() is runtime.get_http()
+
+
+def test_process_init_drops_inherited_resources(monkeypatch: pytest.MonkeyPatch) -> None:
+    inherited = runtime.get_http()
+
+    async def _no_db() -> None:
+        raise OSError("postgres down")
+
+    monkeypatch.setattr(runtime, "get_pool", _no_db)
+    runtime._on_process_init()
+    assert runtime.get_http() is not inherited
+
+    runtime._on_process_shutdown()
+    assert runtime._loop is None
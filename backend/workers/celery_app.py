@@ -4,6 +4,8 @@ from celery import Celery
 from celery.schedules import crontab
 from dotenv import load_dotenv
 
+from services.embedding_refresh import REFRESH_INTERVAL
+
 load_dotenv()
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
@@ -39,14 +41,39 @@ app.conf.beat_schedule = {
         "schedule": crontab(hour=3, minute=0),
         "options": {"expires": 3600},
     },
+    "refresh-dirty-user-embeddings": {
+        "task": "workers.tasks.recommendations.refresh_dirty_user_embeddings",
+        "schedule": REFRESH_INTERVAL,
+        "options": {"expires": REFRESH_INTERVAL},
+    },
+    "refresh-movie-neighbors": {
+        "task": "workers.tasks.recommendations.refresh_movie_neighbors",
+        "schedule": crontab(hour=4, minute=0),
+        "options": {"expires": 3600},
+    },
     "update-popularity-scores": {
         "task": "workers.tasks.analytics.update_popularity_scores",
         "schedule": crontab(minute=0),
         "options": {"expires": 3500},
     },
+    "refresh-onboarding-pool": {
+        "task": "workers.tasks.analytics.refresh_onboarding_pool",
+        "schedule": crontab(minute=30),
+        "options": {"expires": 3500},
+    },
+    "refresh-emotion-pools": {
+        "task": "workers.tasks.analytics.refresh_emotion_pools",
+        "schedule": crontab(minute=45),
+        "options": {"expires": 3500},
+    },
     "refresh-movie-avg-ratings": {
         "task": "workers.tasks.analytics.recompute_movie_ratings",
         "schedule": crontab(hour="*/6", minute=15),
         "options": {"expires": 21000},
     },
+    "reconcile-user-stats": {
+        "task": "workers.tasks.analytics.reconcile_user_stats",
+        "schedule": crontab(hour=5, minute=0),
+        "options": {"expires": 3600},
+    },
 }
@@ -0,0 +1,112 @@
+"""Per-process async resources for Celery tasks.
+
+Tasks used to `asyncio.run()` a fresh event loop and open a fresh
+`asyncpg.connect()` / `httpx.AsyncClient` on every invocation. Instead each
+worker process now owns one event loop, one asyncpg pool, one HTTP client and
+one Redis client, created at `worker_process_init` and closed at
+`worker_process_shutdown`. Tasks run their coroutine with `run()` and borrow
+the shared resources through the getters below.
+
+The resources are bound to the process's loop, so this assumes the prefork
+(or solo) pool, where a process executes one task at a time. Outside a
+prefork child (solo pool, eager mode, scripts) everything is created lazily on
+first use.
+"""
+import asyncio
+import os
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+
+import asyncpg
+import httpx
+import structlog
+from celery.signals import worker_process_init, worker_process_shutdown
+
+T = TypeVar("T")
+
+DB_POOL_MIN = 1
+DB_POOL_MAX = 4
+HTTP_TIMEOUT = 30.0
+
+_loop: asyncio.AbstractEventLoop | None = None
+_pool: asyncpg.Pool | None = None
+_http: httpx.AsyncClient | None = None
+_redis: Any = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    """Run `coro` to completion on this process's persistent loop."""
+    return _get_loop().run_until_complete(coro)
+
+
+async def get_pool() -> asyncpg.Pool:
+    global _pool
+    if _pool is None:
+        dsn = os.environ["POSTGRES_URL"].replace("postgresql+asyncpg://", "postgresql://")
+        _pool = await asyncpg.create_pool(dsn, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX)
+    return _pool
+
+
+def get_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+    return _http
+
+
+def get_redis() -> Any:
+    global _redis
+    if _redis is None:
+        import redis.asyncio as aioredis
+
+        _redis = aioredis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    return _redis
+
+
+async def _close() -> None:
+    global _pool, _http, _redis
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+@worker_process_init.connect
+def _on_process_init(**_: Any) -> None:
+    # Forked children inherit the parent's module globals; never reuse a loop
+    # or sockets that belong to another process.
+    global _loop, _pool, _http, _redis
+    _loop = _pool = _http = _redis = None
+    try:
+        run(get_pool())
+    except Exception as e:
+        # Don't kill the worker if Postgres is down at boot; the first task
+        # retries the connection.
+        structlog.get_logger().warning("worker_db_pool_init_failed", error=str(e))
+    get_http()
+    get_redis()
+
+
+@worker_process_shutdown.connect
+def _on_process_shutdown(**_: Any) -> None:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        _loop.run_until_complete(_close())
+    finally:
+        _loop.close()
+        _loop = None
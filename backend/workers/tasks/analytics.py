@@ -1,72 +1,228 @@
-import asyncio
-import os
-from typing import Any
+from datetime import datetime, timedelta
 
 import asyncpg
 import structlog
 
 from workers.celery_app import app
+from workers.runtime import get_pool, get_redis, run
+
+
+# Raw popularity before min/max normalisation to [0, 100].
+_RAW_SCORE = "(LN(GREATEST(m.rating_count, 1) + 1) * COALESCE(m.avg_rating, 3.0))::float8"
+# Rows are stamped with the rating transaction's start time, which can
+# commit after a run has already read past it; re-scan this much overlap.
+_CHANGE_LOOKBACK = timedelta(minutes=5)
+
+
+def _normalised(raw: str, lo: str, hi: str) -> str:
+    return (
+        f"ROUND(LEAST(COALESCE(({raw} - {lo}) / NULLIF({hi} - {lo}, 0), 0) * 100.0,"
+        f" 9999.9999)::numeric, 4)"
+    )
+
+
+async def _full_popularity_recompute(conn: asyncpg.Connection, now: datetime) -> int:
+    """Recompute bounds and every score; only rows whose score moves are written."""
+    updated = await conn.fetchval(
+        f"""
+        WITH computed AS (
+            SELECT m.id, {_RAW_SCORE} AS raw FROM movies m
+        ),
+        bounds AS (
+            SELECT MIN(raw) AS lo, MAX(raw) AS hi FROM computed
+        ),
+        scored AS (
+            SELECT c.id, {_normalised("c.raw", "b.lo", "b.hi")} AS score
+            FROM computed c CROSS JOIN bounds b
+        ),
+        upd AS (
+            UPDATE movies m SET popularity_score = s.score
+            FROM scored s
+            WHERE m.id = s.id AND m.popularity_score IS DISTINCT FROM s.score
+            RETURNING 1
+        ),
+        stats AS (
+            INSERT INTO popularity_stats (id, raw_min, raw_max, last_run_at, full_recompute_at)
+            SELECT 1, lo, hi, $1, $1 FROM bounds WHERE lo IS NOT NULL
+            ON CONFLICT (id) DO UPDATE SET
+                raw_min = EXCLUDED.raw_min,
+                raw_max = EXCLUDED.raw_max,
+                last_run_at = EXCLUDED.last_run_at,
+                full_recompute_at = EXCLUDED.full_recompute_at
+        )
+        SELECT COUNT(*) FROM upd
+        """,
+        now,
+    )
+    return int(updated)
+
+
+def _shifts_bounds(
+    changed: list[asyncpg.Record], lo: float, hi: float, last_run_at: datetime
+) -> bool:
+    """Whether the stored bounds may no longer be the true min/max.
+
+    True if a changed movie's raw score falls outside them, or if it held one
+    (score 0 or 100) and has moved off it. Movies created since the last run
+    were never scored, so their default score of 0 isn't a bound.
+    """
+    for row in changed:
+        raw = row["raw"]
+        if raw < lo or raw > hi:
+            return True
+        if row["created_at"] > last_run_at:
+            continue
+        if (row["old"] == 0 and raw != lo) or (row["old"] == 100 and raw != hi):
+            return True
+    return False
+
+
+async def _update_popularity(conn: asyncpg.Connection) -> tuple[str, int, int]:
+    """One scoring pass inside the caller's transaction: (mode, changed, updated)."""
+    now = await conn.fetchval("SELECT NOW()")
+    stats = await conn.fetchrow(
+        "SELECT raw_min, raw_max, last_run_at FROM popularity_stats WHERE id = 1 FOR UPDATE"
+    )
+    if stats is None:
+        return "full", 0, await _full_popularity_recompute(conn, now)
+
+    # New rows are stamped on insert too, so this one column covers imports.
+    changed = await conn.fetch(
+        f"""
+        SELECT m.id, m.popularity_score AS old, m.created_at, {_RAW_SCORE} AS raw
+        FROM movies m
+        WHERE m.ratings_changed_at > $1
+        """,
+        stats["last_run_at"] - _CHANGE_LOOKBACK,
+    )
+    lo, hi = stats["raw_min"], stats["raw_max"]
+    if _shifts_bounds(changed, lo, hi, stats["last_run_at"]):
+        return "full", len(changed), await _full_popularity_recompute(conn, now)
+
+    status = "UPDATE 0"
+    if changed:
+        status = await conn.execute(
+            f"""
+            WITH scored AS (
+                SELECT m.id, {_normalised(_RAW_SCORE, "$2", "$3")} AS score
+                FROM movies m
+                WHERE m.id = ANY($1::int[])
+            )
+            UPDATE movies m SET popularity_score = s.score
+            FROM scored s
+            WHERE m.id = s.id AND m.popularity_score IS DISTINCT FROM s.score
+            """,
+            [r["id"] for r in changed],
+            lo,
+            hi,
+        )
+    await conn.execute("UPDATE popularity_stats SET last_run_at = $1 WHERE id = 1", now)
+    return "incremental", len(changed), int(status.split()[-1])
 
 
 @app.task(name="workers.tasks.analytics.update_popularity_scores")
 def update_popularity_scores() -> None:
-    logger = structlog.get_logger()
+    """Refresh `popularity_score` for movies whose ratings changed.
+
+    The score is LN(count + 1) * avg, min/max-normalised over all movies. The
+    bounds live in `popularity_stats`; as long as no changed movie falls
+    outside them, or was itself holding one of them, only the changed movies
+    are rescored. Otherwise, and on the very first run, everything is
+    recomputed. Either way rows whose score doesn't move aren't rewritten.
+    """
 
     async def _run() -> None:
-        dsn = os.environ["POSTGRES_URL"].replace("postgresql+asyncpg://", "postgresql://")
-        conn = await asyncpg.connect(dsn)
-        try:
-            await conn.execute(
-                """
-                WITH computed AS (
-                    SELECT id,
-                        LN(GREATEST(rating_count, 1) + 1)
-                        * COALESCE(avg_rating, 3.0) AS raw
-                    FROM movies
-                ),
-                normed AS (
-                    SELECT id,
-                        (raw - MIN(raw) OVER())
-                        / NULLIF(MAX(raw) OVER() - MIN(raw) OVER(), 0) AS score
-                    FROM computed
-                )
-                UPDATE movies m
-                SET popularity_score = LEAST(COALESCE(n.score, 0) * 100.0, 9999.9999)
-                FROM normed n
-                WHERE m.id = n.id
-                """
-            )
-            logger.info("popularity_scores_updated")
-        finally:
-            await conn.close()
+        pool = await get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            mode, changed, updated = await _update_popularity(conn)
+        structlog.get_logger().info(
+            "popularity_scores_updated", mode=mode, changed=changed, updated=updated
+        )
 
-    asyncio.run(_run())
+    run(_run())
 
 
 @app.task(name="workers.tasks.analytics.recompute_movie_ratings")
 def recompute_movie_ratings() -> None:
+    """Reconcile the running rating aggregates with the `ratings` table.
+
+    The ratings endpoints maintain `rating_sum` / `rating_count` by delta, so
+    this is only a safety net for drift (e.g. two racing first-time upserts
+    of the same rating). Only rows that actually disagree are rewritten.
+    """
     logger = structlog.get_logger()
 
     async def _run() -> None:
-        dsn = os.environ["POSTGRES_URL"].replace("postgresql+asyncpg://", "postgresql://")
-        conn = await asyncpg.connect(dsn)
-        try:
-            await conn.execute(
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            status = await conn.execute(
                 """
                 UPDATE movies m SET
-                    avg_rating = r.avg_score,
-                    rating_count = r.cnt
-                FROM (
-                    SELECT movie_id,
-                        AVG(score)::numeric(3, 2) AS avg_score,
-                        COUNT(*)::int AS cnt
+                    rating_sum = COALESCE(r.total, 0),
+                    rating_count = COALESCE(r.cnt, 0),
+                    avg_rating = ROUND(r.total / NULLIF(r.cnt, 0), 2),
+                    ratings_changed_at = NOW()
+                FROM movies m2
+                LEFT JOIN (
+                    SELECT movie_id, SUM(score) AS total, COUNT(*)::int AS cnt
                     FROM ratings GROUP BY movie_id
-                ) r
-                WHERE m.id = r.movie_id
+                ) r ON r.movie_id = m2.id
+                WHERE m.id = m2.id
+                  AND (m.rating_sum IS DISTINCT FROM COALESCE(r.total, 0)
+                       OR m.rating_count IS DISTINCT FROM COALESCE(r.cnt, 0)
+                       OR m.avg_rating IS DISTINCT FROM ROUND(r.total / NULLIF(r.cnt, 0), 2))
                 """
             )
-            logger.info("movie_ratings_recomputed")
-        finally:
-            await conn.close()
+            logger.info("movie_ratings_recomputed", drifted=int(status.split()[-1]))
+
+    run(_run())
+
+
+@app.task(name="workers.tasks.analytics.refresh_onboarding_pool")
+def refresh_onboarding_pool() -> None:
+    """Recompute the divisive-movie onboarding pool and drop the API's copy."""
+    from services.onboarding import POOL_KEY, refresh_pool
+
+    logger = structlog.get_logger()
+
+    async def _run() -> None:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            size = await refresh_pool(conn)
+        await get_redis().delete(POOL_KEY)
+        logger.info("onboarding_pool_refreshed", size=size)
+
+    run(_run())
+
+
+@app.task(name="workers.tasks.analytics.refresh_emotion_pools")
+def refresh_emotion_pools() -> None:
+    """Recompute the per-emotion recommendation pools and drop the API's copy."""
+    from services.emotion_pools import POOLS_KEY, refresh_pools
+
+    logger = structlog.get_logger()
+
+    async def _run() -> None:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            size = await refresh_pools(conn)
+        await get_redis().delete(POOLS_KEY)
+        logger.info("emotion_pools_refreshed", size=size)
+
+    run(_run())
+
+
+@app.task(name="workers.tasks.analytics.reconcile_user_stats")
+def reconcile_user_stats() -> None:
+    """Repair drift in the delta-maintained `user_stats` / `user_genre_counts`."""
+    from services.user_stats import reconcile
+
+    logger = structlog.get_logger()
+
+    async def _run() -> None:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            stats, genres = await reconcile(conn)
+        logger.info("user_stats_reconciled", stats_drifted=stats, genres_drifted=genres)
 
-    asyncio.run(_run())
+    run(_run())
@@ -1,21 +1,12 @@
-import asyncio
 import os
 from typing import Any
 
 import asyncpg
-import httpx
 import numpy as np
 import structlog
 
 from workers.celery_app import app
-
-
-def _parse_vector(raw: Any, dim: int) -> np.ndarray:
-    if raw is None:
-        return np.zeros(dim, dtype=np.float32)
-    if isinstance(raw, str):
-        raw = [float(x) for x in raw.strip("[]{}").split(",") if x.strip()]
-    return np.asarray(raw, dtype=np.float32)
+from workers.runtime import get_http, get_pool, get_redis, run
 
 
 @app.task(
@@ -30,18 +21,119 @@ def refresh_all_movie_embeddings(self: Any) -> None:
 
     async def _run() -> None:
         nlp_url = os.environ.get("ML_NLP_URL", "http://localhost:8002")
-        async with httpx.AsyncClient(timeout=600.0) as client:
-            resp = await client.post(f"{nlp_url}/reindex", json={"force": False})
-            resp.raise_for_status()
-            logger.info("embedding_refresh_triggered", result=resp.json())
+        resp = await get_http().post(
+            f"{nlp_url}/reindex", json={"force": False}, timeout=600.0
+        )
+        resp.raise_for_status()
+        logger.info("embedding_refresh_triggered", result=resp.json())
 
     try:
-        asyncio.run(_run())
+        run(_run())
     except Exception as exc:
         logger.error("embedding_refresh_failed", error=str(exc))
         raise self.retry(exc=exc)
 
 
+# Only the most recent positive ratings shape the taste vector.
+_MAX_RATINGS_PER_USER = 100
+# Users taken off the dirty set per SPOP / per SQL round trip.
+_BATCH_SIZE = 500
+
+
+async def _refresh_users(conn: asyncpg.Connection, user_ids: list[str]) -> int:
+    """Recompute and upsert embeddings for `user_ids`; returns how many were written.
+
+    Each embedding is the score-weighted mean of the user's last
+    `_MAX_RATINGS_PER_USER` positive (>= 3.0) ratings, L2-normalised. Users
+    with no usable ratings keep whatever embedding they already had.
+    """
+    rows = await conn.fetch(
+        """
+        SELECT user_id::text AS user_id, embedding::real[] AS embedding, score
+        FROM (
+            SELECT r.user_id, m.embedding, r.score,
+                ROW_NUMBER() OVER (PARTITION BY r.user_id ORDER BY r.updated_at DESC) AS rn
+            FROM ratings r
+            JOIN movies m ON m.id = r.movie_id
+            WHERE r.user_id = ANY($1::uuid[])
+              AND m.embedding IS NOT NULL
+              AND r.score >= 3.0
+        ) t
+        WHERE rn <= $2
+        ORDER BY user_id
+        """,
+        user_ids,
+        _MAX_RATINGS_PER_USER,
+    )
+    if not rows:
+        return 0
+
+    # Rows arrive grouped by user, so per-user sums are one reduceat each.
+    owners = np.array([r["user_id"] for r in rows])
+    embeddings = np.array([r["embedding"] for r in rows], dtype=np.float32)
+    weights = np.array([float(r["score"]) / 5.0 for r in rows], dtype=np.float32)
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+
+    weighted = np.add.reduceat(embeddings * weights[:, np.newaxis], starts, axis=0)
+    weight_sums = np.add.reduceat(weights, starts)
+    user_embs = weighted / np.maximum(weight_sums, 1e-8)[:, np.newaxis]
+    norms = np.linalg.norm(user_embs, axis=1)
+    keep = norms > 1e-8
+    user_embs = user_embs[keep] / norms[keep][:, np.newaxis]
+    ids = owners[starts][keep].tolist()
+    if not ids:
+        return 0
+
+    vectors = ["[" + ",".join(f"{x:.6f}" for x in emb) + "]" for emb in user_embs.tolist()]
+    await conn.execute(
+        """
+        INSERT INTO user_embeddings (user_id, embedding, model_version, updated_at)
+        SELECT u, e::vector, 'weighted_mean_v1', NOW()
+        FROM UNNEST($1::uuid[], $2::text[]) AS t(u, e)
+        ON CONFLICT (user_id) DO UPDATE SET
+            embedding = EXCLUDED.embedding,
+            model_version = EXCLUDED.model_version,
+            updated_at = NOW()
+        """,
+        ids,
+        vectors,
+    )
+    return len(ids)
+
+
+@app.task(name="workers.tasks.recommendations.refresh_dirty_user_embeddings")
+def refresh_dirty_user_embeddings() -> None:
+    """Drain the dirty-user set and refresh all of their embeddings in one pass."""
+    from services.embedding_refresh import DIRTY_USERS_KEY
+
+    logger = structlog.get_logger()
+
+    async def _run() -> None:
+        redis = get_redis()
+        pool = await get_pool()
+        refreshed = seen = 0
+        async with pool.acquire() as conn:
+            while True:
+                popped = await redis.spop(DIRTY_USERS_KEY, _BATCH_SIZE)
+                if not popped:
+                    break
+                user_ids = [u.decode() if isinstance(u, bytes) else u for u in popped]
+                try:
+                    refreshed += await _refresh_users(conn, user_ids)
+                except Exception:
+                    # Put the batch back so the next run retries it.
+                    await redis.sadd(DIRTY_USERS_KEY, *user_ids)
+                    raise
+                seen += len(user_ids)
+        if seen:
+            logger.info("user_embeddings_refreshed", users=seen, refreshed=refreshed)
+
+    try:
+        run(_run())
+    except Exception as exc:
+        logger.error("user_embedding_batch_failed", error=str(exc))
+
+
 @app.task(
     bind=True,
     max_retries=3,
@@ -49,69 +141,164 @@ def refresh_all_movie_embeddings(self: Any) -> None:
     name="workers.tasks.recommendations.refresh_user_embedding",
 )
 def refresh_user_embedding(self: Any, user_id: str) -> None:
-    """Recompute user embedding as weighted mean of rated-movie embeddings."""
+    """Recompute one user's embedding immediately.
+
+    Rating writes go through the dirty set instead; this stays for ad-hoc
+    use and for jobs already sitting in the queue.
+    """
     logger = structlog.get_logger()
 
     async def _run() -> None:
-        dsn = os.environ["POSTGRES_URL"].replace("postgresql+asyncpg://", "postgresql://")
-        conn = await asyncpg.connect(dsn)
-        try:
-            rows = await conn.fetch(
-                """
-                SELECT m.embedding, r.score
-                FROM ratings r
-                JOIN movies m ON m.id = r.movie_id
-                WHERE r.user_id = $1::uuid
-                  AND m.embedding IS NOT NULL
-                  AND r.score >= 3.0
-                ORDER BY r.updated_at DESC
-                LIMIT 100
-                """,
-                user_id,
-            )
-
-            if not rows:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            if await _refresh_users(conn, [user_id]):
+                logger.info("user_embedding_refreshed", user_id=user_id)
+            else:
                 logger.info("user_embedding_skipped_no_positives", user_id=user_id)
-                return
 
-            embeddings = np.stack([_parse_vector(r["embedding"], 384) for r in rows])
-            weights = np.array([float(r["score"]) / 5.0 for r in rows], dtype=np.float32)
-            weight_sum = weights.sum()
-            if weight_sum <= 0:
-                logger.info("user_embedding_skipped_zero_weights", user_id=user_id)
-                return
-            weights = weights / weight_sum
+    try:
+        run(_run())
+    except Exception as exc:
+        logger.error("user_embedding_failed", user_id=user_id, error=str(exc))
+        raise self.retry(exc=exc)
+
+
+NEIGHBORS_K = 50
+# Rows of the similarity matrix computed per matmul (block x N float32).
+_NEIGHBOR_BLOCK = 512
+# Past this share of changed movies an incremental pass isn't worth it.
+_FULL_REFRESH_SHARE = 0.3
+
+
+def top_k_neighbors(
+    matrix: np.ndarray, rows: np.ndarray, k: int, block: int = _NEIGHBOR_BLOCK
+) -> tuple[np.ndarray, np.ndarray]:
+    """Top-`k` cosine neighbours (excluding self) for each of `rows`.
+
+    `matrix` must be L2-normalised. Works through `rows` in blocks so peak
+    memory is `block * len(matrix)` floats. Returns (indices, similarities),
+    both shaped (len(rows), k), best first.
+    """
+    k = min(k, len(matrix) - 1)
+    out_idx = np.empty((len(rows), k), dtype=np.int64)
+    out_sim = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block):
+        chunk = rows[start:start + block]
+        sims = matrix[chunk] @ matrix.T
+        sims[np.arange(len(chunk)), chunk] = -np.inf
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind="stable")
+        out_idx[start:start + len(chunk)] = np.take_along_axis(top, order, axis=1)
+        out_sim[start:start + len(chunk)] = np.take_along_axis(top_sims, order, axis=1)
+    return out_idx, out_sim
+
+
+async def _load_embeddings(conn: asyncpg.Connection) -> tuple[np.ndarray, np.ndarray]:
+    """All movie embeddings as (ids, L2-normalised float32 matrix)."""
+    ids: list[int] = []
+    vectors: list[np.ndarray] = []
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        async for r in conn.cursor(
+            "SELECT id, embedding::real[] AS embedding FROM movies "
+            "WHERE embedding IS NOT NULL ORDER BY id",
+            prefetch=2000,
+        ):
+            ids.append(r["id"])
+            vectors.append(np.asarray(r["embedding"], dtype=np.float32))
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    matrix = np.stack(vectors)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-8)
+    return np.asarray(ids, dtype=np.int64), matrix
 
-            user_emb = (embeddings * weights[:, np.newaxis]).sum(axis=0)
-            norm = float(np.linalg.norm(user_emb))
-            if norm <= 1e-8:
-                logger.info("user_embedding_skipped_zero_norm", user_id=user_id)
+
+@app.task(name="workers.tasks.recommendations.refresh_movie_neighbors")
+def refresh_movie_neighbors(full: bool = False) -> None:
+    """Recompute `movie_neighbors` for movies whose embeddings changed.
+
+    A movie's own list is recomputed when its embedding is newer than the
+    list. Other movies' lists are recomputed only if a changed movie is in
+    them or would now beat their current K-th neighbour. The first run, a
+    large change set, or `full=True` recomputes everything.
+    """
+    logger = structlog.get_logger()
+
+    async def _run() -> None:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            started = await conn.fetchval("SELECT NOW()")
+            ids, matrix = await _load_embeddings(conn)
+            if len(ids) < 2:
+                logger.info("movie_neighbors_skipped", movies=len(ids))
                 return
-            user_emb = user_emb / norm
+            position = {int(movie_id): i for i, movie_id in enumerate(ids)}
 
-            vec_str = "[" + ",".join(f"{x:.6f}" for x in user_emb.tolist()) + "]"
-            await conn.execute(
+            existing = await conn.fetch(
+                """
+                SELECT n.movie_id, n.neighbor_ids, n.similarities,
+                    m.embedding_updated_at > n.computed_at AS stale
+                FROM movie_neighbors n
+                JOIN movies m ON m.id = n.movie_id
                 """
-                INSERT INTO user_embeddings (user_id, embedding, model_version, updated_at)
-                VALUES ($1::uuid, $2::vector, 'weighted_mean_v1', NOW())
-                ON CONFLICT (user_id) DO UPDATE SET
-                    embedding = EXCLUDED.embedding,
-                    model_version = EXCLUDED.model_version,
-                    updated_at = NOW()
-                """,
-                user_id,
-                vec_str,
             )
+            dropped = [r["movie_id"] for r in existing if r["movie_id"] not in position]
+            listed = {r["movie_id"] for r in existing}
+            stale = [
+                position[r["movie_id"]]
+                for r in existing
+                if r["movie_id"] in position and r["stale"]
+            ] + [i for movie_id, i in position.items() if movie_id not in listed]
+
+            if full or not existing or len(stale) > _FULL_REFRESH_SHARE * len(ids):
+                rows = np.arange(len(ids))
+            else:
+                changed_ids = set(dropped) | {int(ids[i]) for i in stale}
+                affected = np.zeros(len(ids), dtype=bool)
+                affected[stale] = True
+                kth = np.full(len(ids), -np.inf, dtype=np.float32)
+                for r in existing:
+                    i = position.get(r["movie_id"])
+                    if i is None:
+                        continue
+                    if len(r["similarities"]) >= NEIGHBORS_K:
+                        kth[i] = r["similarities"][-1]
+                    if changed_ids.intersection(r["neighbor_ids"]):
+                        affected[i] = True
+                stale_rows = np.asarray(stale, dtype=np.int64)
+                for start in range(0, len(stale_rows), _NEIGHBOR_BLOCK):
+                    sims = matrix[stale_rows[start:start + _NEIGHBOR_BLOCK]] @ matrix.T
+                    affected |= (sims > kth).any(axis=0)
+                rows = np.flatnonzero(affected)
+
+            idx, sims = top_k_neighbors(matrix, rows, NEIGHBORS_K)
+            neighbor_ids = ids[idx]
+            records = [
+                (int(ids[row]), neighbor_ids[n].tolist(), sims[n].tolist(), started)
+                for n, row in enumerate(rows)
+            ]
+            async with conn.transaction():
+                if dropped:
+                    await conn.execute(
+                        "DELETE FROM movie_neighbors WHERE movie_id = ANY($1::int[])", dropped
+                    )
+                await conn.executemany(
+                    """
+                    INSERT INTO movie_neighbors (movie_id, neighbor_ids, similarities, computed_at)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (movie_id) DO UPDATE SET
+                        neighbor_ids = EXCLUDED.neighbor_ids,
+                        similarities = EXCLUDED.similarities,
+                        computed_at = EXCLUDED.computed_at
+                    """,
+                    records,
+                )
             logger.info(
-                "user_embedding_refreshed",
-                user_id=user_id,
-                n_ratings=len(rows),
+                "movie_neighbors_refreshed",
+                movies=len(ids),
+                recomputed=len(records),
+                changed=len(stale),
+                dropped=len(dropped),
             )
-        finally:
-            await conn.close()
 
-    try:
-        asyncio.run(_run())
-    except Exception as exc:
-        logger.error("user_embedding_failed", user_id=user_id, error=str(exc))
-        raise self.retry(exc=exc)
+    run(_run())
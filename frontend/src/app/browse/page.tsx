@@ -52,15 +52,15 @@ export default function BrowsePage() {
   const [loading, setLoading] = useState(false);
   const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
-  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const isSearchMode = debouncedQuery.trim().length >= 1;
 
   const abortRef = useRef<AbortController | null>(null);
 
   const buildBrowseUrl = useCallback(
-    (cursor: number | null) => {
+    (cursor: string | null) => {
       const params = new URLSearchParams({ limit: "30", order_by: orderBy });
-      if (cursor != null) params.set("cursor", String(cursor));
+      if (cursor != null) params.set("cursor", cursor);
       if (yearFrom) params.set("year_from", yearFrom);
       if (yearTo) params.set("year_to", yearTo);
       if (minRating) params.set("min_rating", minRating);
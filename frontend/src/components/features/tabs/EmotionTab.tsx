@@ -44,13 +44,14 @@ export function EmotionTab() {
         ? localStorage.getItem("mm_access_token")
         : null;
 
-      const form = new FormData();
-      form.append("image", blob, "capture.jpg");
-
+      // Raw image body: the backend streams it straight to the CV service.
       const resp = await fetch(`${API_URL}/v1/recommendations/emotion`, {
         method: "POST",
-        headers: token ? { Authorization: `Bearer ${token}` } : {},
-        body: form,
+        headers: {
+          "Content-Type": blob.type || "image/jpeg",
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: blob,
       });
 
       if (!resp.ok) {
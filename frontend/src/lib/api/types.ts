@@ -200,7 +200,13 @@ export interface paths {
             path?: never;
             cookie?: never;
         };
-        /** List Movies */
+        /**
+         * List Movies
+         * @description Browse movies, paginated by an opaque (sort key, id) keyset cursor.
+         *
+         *     Each page is an index range scan that stops after `limit + 1` rows, so
+         *     deep pages cost the same as the first one.
+         */
         get: operations["list_movies_v1_movies_get"];
         put?: never;
         post?: never;
@@ -217,7 +223,14 @@ export interface paths {
             path?: never;
             cookie?: never;
         };
-        /** Trending */
+        /**
+         * Trending
+         * @description Movies with the most (time-decayed) rating activity right now.
+         *
+         *     Ranking comes from `services.trending`; the response is cached for a
+         *     minute only so it follows the event stream closely. While there isn't
+         *     enough recent activity, the list is padded with all-time popular titles.
+         */
         get: operations["trending_v1_movies_trending_get"];
         put?: never;
         post?: never;
@@ -241,7 +254,8 @@ export interface paths {
          *     Selects movies with high rating_count × stddev(rating) so the user's
          *     ratings carry information (not just "everyone likes this").
          *     Diversifies by genre: greedy round-robin across genres to avoid all
-         *     drama / all action.
+         *     drama / all action. The ranked pool is precomputed (see
+         *     `services.onboarding`); every `limit` is served from the same copy.
          */
         get: operations["onboarding_movies_v1_movies_onboarding_get"];
         put?: never;
@@ -269,6 +283,50 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/v1/movies/autocomplete": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        /**
+         * Autocomplete
+         * @description Type-ahead title suggestions from the in-process index (no DB query).
+         */
+        get: operations["autocomplete_v1_movies_autocomplete_get"];
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/v1/movies/batch": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        /**
+         * Movies Batch
+         * @description Details for many movies at once, in request order.
+         *
+         *     Cache hits come from one `MGET` and are spliced into the response as
+         *     stored JSON; only the misses are queried. Unknown ids are listed in
+         *     `missing`.
+         */
+        post: operations["movies_batch_v1_movies_batch_post"];
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
     [path: `/v1/movies/${number}`]: {
         parameters: {
             query?: never;
@@ -293,7 +351,13 @@ export interface paths {
             path?: never;
             cookie?: never;
         };
-        /** Similar Movies */
+        /**
+         * Similar Movies
+         * @description Nearest movies by embedding, from the precomputed `movie_neighbors` row.
+         *
+         *     Movies without a row yet (no embedding, or added since the last
+         *     `refresh_movie_neighbors` run) fall back to a live query.
+         */
         get: operations["similar_movies_v1_movies__movie_id__similar_get"];
         put?: never;
         post?: never;
@@ -401,7 +465,14 @@ export interface paths {
         };
         get?: never;
         put?: never;
-        /** Emotion */
+        /**
+         * Emotion
+         * @description Detect the mood in a photo and recommend for it.
+         *
+         *     Send the image as the raw body (`Content-Type: image/jpeg|png|webp`) to
+         *     have it streamed through to the CV service without being buffered here;
+         *     a multipart `image` field is still accepted.
+         */
         post: operations["emotion_v1_recommendations_emotion_post"];
         delete?: never;
         options?: never;
@@ -465,11 +536,6 @@ export interface paths {
 export type webhooks = Record<string, never>;
 export interface components {
     schemas: {
-        /** Body_emotion_v1_recommendations_emotion_post */
-        Body_emotion_v1_recommendations_emotion_post: {
-            /** Image */
-            image: string;
-        };
         /** ChangePasswordRequest */
         ChangePasswordRequest: {
             /** Current Password */
@@ -532,6 +598,21 @@ export interface components {
             /** Password */
             password: string;
         };
+        /** MovieBatchRequest */
+        MovieBatchRequest: {
+            /** Ids */
+            ids: number[];
+        };
+        /** MovieBatchResponse */
+        MovieBatchResponse: {
+            /** Items */
+            items: components["schemas"]["MovieDetailResponse"][];
+            /**
+             * Missing
+             * @default []
+             */
+            missing: number[];
+        };
         /** MovieDetailResponse */
         MovieDetailResponse: {
             /** Id */
@@ -571,7 +652,7 @@ export interface components {
             /** Items */
             items: components["schemas"]["MovieResponse"][];
             /** Next Cursor */
-            next_cursor?: number | null;
+            next_cursor?: string | null;
             /** Total */
             total?: number | null;
         };
@@ -620,6 +701,17 @@ export interface components {
             /** Poster Url */
             poster_url?: string | null;
         };
+        /** MovieSuggestion */
+        MovieSuggestion: {
+            /** Id */
+            id: number;
+            /** Title */
+            title: string;
+            /** Year */
+            year?: number | null;
+            /** Poster Url */
+            poster_url?: string | null;
+        };
         /** PersonResponse */
         PersonResponse: {
             /** Id */
@@ -1183,7 +1275,7 @@ export interface operations {
     list_movies_v1_movies_get: {
         parameters: {
             query?: {
-                cursor?: number | null;
+                cursor?: string | null;
                 limit?: number;
                 year_from?: number | null;
                 year_to?: number | null;
@@ -1299,6 +1391,71 @@ export interface operations {
             };
         };
     };
+    autocomplete_v1_movies_autocomplete_get: {
+        parameters: {
+            query: {
+                q: string;
+                limit?: number;
+            };
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description Successful Response */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["MovieSuggestion"][];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
+    movies_batch_v1_movies_batch_post: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        requestBody: {
+            content: {
+                "application/json": components["schemas"]["MovieBatchRequest"];
+            };
+        };
+        responses: {
+            /** @description Successful Response */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["MovieBatchResponse"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
     get_movie_v1_movies__movie_id__get: {
         parameters: {
             query?: never;
@@ -1554,7 +1711,13 @@ export interface operations {
         };
         requestBody: {
             content: {
-                "multipart/form-data": components["schemas"]["Body_emotion_v1_recommendations_emotion_post"];
+                "image/jpeg": string;
+                "image/png": string;
+                "image/webp": string;
+                "multipart/form-data": {
+                    /** Format: binary */
+                    image: string;
+                };
             };
         };
         responses: {
@@ -1567,15 +1730,6 @@ export interface operations {
                     "application/json": components["schemas"]["RecommendResponse"];
                 };
             };
-            /** @description Validation Error */
-            422: {
-                headers: {
-                    [name: string]: unknown;
-                };
-                content: {
-                    "application/json": components["schemas"]["HTTPValidationError"];
-                };
-            };
         };
     };
     list_watchlist_v1_watchlist_get: {
@@ -0,0 +1,76 @@
+"""Micro-benchmark: face preprocessing latency by image size.
+
+Usage (from ml/cv/):
+    uv run python bench_preprocess.py [--image face.jpg] [--runs 20]
+
+Encodes the source image as JPEG at several resolutions and times two
+pipelines on each:
+
+- full     — the old path: full-size RGB + grayscale, Haar over the whole frame
+- current  — `preprocess_image_bytes`: detect on a <= DETECT_MAX_SIDE copy,
+             crop and convert only the face
+
+Without `--image` the source is synthetic noise, which times decode and
+detection but never finds a face; pass a real portrait to time the crop too.
+"""
+import argparse
+import logging
+import time
+
+import cv2
+import numpy as np
+import structlog
+
+from detector import HaarFaceDetector
+from preprocess import preprocess_image_bytes
+
+SIZES = [(640, 480), (1280, 960), (1920, 1440), (3024, 4032), (4000, 3000)]
+
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL))
+
+
+def _full_resolution(image_bytes: bytes, cascade: cv2.CascadeClassifier) -> None:
+    img_bgr = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(30, 30))
+    if len(faces):
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        cv2.resize(img_rgb[y : y + h, x : x + w], (224, 224))
+
+
+def _time_ms(fn: object, image_bytes: bytes, runs: int) -> float:
+    fn(image_bytes)  # type: ignore[operator]
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(image_bytes)  # type: ignore[operator]
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main(image: str | None, runs: int) -> None:
+    if image:
+        source = cv2.imread(image, cv2.IMREAD_COLOR)
+        if source is None:
+            raise SystemExit(f"cannot read {image}")
+    else:
+        source = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        source = cv2.GaussianBlur(source, (0, 0), 3)
+
+    cascade = HaarFaceDetector()._cascade
+    print(f"{'size':>11}  {'full ms':>9}  {'current ms':>10}  speedup")
+    for w, h in SIZES:
+        img = cv2.resize(source, (w, h), interpolation=cv2.INTER_CUBIC)
+        ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        assert ok
+        data = encoded.tobytes()
+        full = _time_ms(lambda b: _full_resolution(b, cascade), data, runs)
+        current = _time_ms(preprocess_image_bytes, data, runs)
+        print(f"{w:>5}x{h:<5}  {full:9.1f}  {current:10.1f}  {full / current:6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", help="portrait to scale to each benchmark size")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    main(args.image, args.runs)
@@ -0,0 +1,106 @@
+"""Face detectors for the preprocessing pipeline.
+
+`preprocess.py` only depends on the `FaceDetector` protocol: given a BGR image
+(already downscaled for detection) return face boxes in that image's pixel
+coordinates. `FACE_DETECTOR` selects the implementation:
+
+- `haar` (default) — OpenCV's frontal-face Haar cascade, no extra model.
+- `onnx` — an UltraFace-style ONNX detector (`FACE_DETECTOR_MODEL_PATH`):
+  one NCHW RGB input normalised as (x - 127) / 128, outputs `scores`
+  (1, N, 2) and `boxes` (1, N, 4) with corners relative to the image size.
+"""
+import os
+from functools import lru_cache
+from typing import Protocol
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+import structlog
+
+# (x, y, w, h) in pixels.
+Box = tuple[int, int, int, int]
+
+_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+
+class FaceDetector(Protocol):
+    def detect(self, image_bgr: np.ndarray, min_size: int) -> list[Box]:
+        """Faces of at least `min_size` pixels per side, in any order."""
+        ...
+
+
+class HaarFaceDetector:
+    def __init__(self) -> None:
+        self._cascade = cv2.CascadeClassifier(_CASCADE_PATH)
+        if self._cascade.empty():
+            raise RuntimeError(f"Failed to load Haar cascade at {_CASCADE_PATH}")
+
+    def detect(self, image_bgr: np.ndarray, min_size: int) -> list[Box]:
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+        faces = self._cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.1,
+            minNeighbors=4,
+            minSize=(min_size, min_size),
+        )
+        return [tuple(int(v) for v in f) for f in faces]
+
+
+class OnnxFaceDetector:
+    def __init__(
+        self,
+        model_path: str,
+        score_threshold: float = 0.7,
+        nms_threshold: float = 0.3,
+    ) -> None:
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(
+            model_path, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        inp = self._session.get_inputs()[0]
+        self._input_name = inp.name
+        self._input_hw = (int(inp.shape[2]), int(inp.shape[3]))
+        self._score_threshold = score_threshold
+        self._nms_threshold = nms_threshold
+
+    def detect(self, image_bgr: np.ndarray, min_size: int) -> list[Box]:
+        h, w = image_bgr.shape[:2]
+        in_h, in_w = self._input_hw
+        blob = cv2.dnn.blobFromImage(
+            image_bgr, 1.0 / 128, (in_w, in_h), (127, 127, 127), swapRB=True
+        )
+        scores, boxes = self._session.run(["scores", "boxes"], {self._input_name: blob})
+        conf = scores[0, :, 1]
+        keep = conf > self._score_threshold
+        if not keep.any():
+            return []
+
+        corners = boxes[0, keep] * np.array([w, h, w, h], dtype=np.float32)
+        xywh = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        kept = cv2.dnn.NMSBoxes(
+            xywh.tolist(), conf[keep].tolist(), self._score_threshold, self._nms_threshold
+        )
+        result: list[Box] = []
+        for i in np.asarray(kept).reshape(-1):
+            x, y, bw, bh = (int(round(v)) for v in xywh[i])
+            if bw >= min_size and bh >= min_size:
+                result.append((max(0, x), max(0, y), bw, bh))
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_detector() -> FaceDetector:
+    kind = os.environ.get("FACE_DETECTOR", "haar")
+    detector: FaceDetector
+    if kind == "haar":
+        detector = HaarFaceDetector()
+    elif kind == "onnx":
+        detector = OnnxFaceDetector(
+            os.environ.get("FACE_DETECTOR_MODEL_PATH", "../models/face_detector.onnx")
+        )
+    else:
+        raise RuntimeError(f"Unknown FACE_DETECTOR {kind!r}; expected 'haar' or 'onnx'")
+    structlog.get_logger().info("face_detector_loaded", detector=kind)
+    return detector
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import Any
 
@@ -6,6 +8,8 @@ import numpy as np
 import onnxruntime as ort
 import structlog
 
+from limits import cpu_limit
+
 CLASSES = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
 
 EMOTION_TO_GENRES: dict[str, list[str]] = {
@@ -29,18 +33,28 @@ EMOTION_MESSAGES: dict[str, str] = {
 }
 
 
+INPUT_SHAPE = (3, 224, 224)
+# Upper bound on requests folded into one session.run.
+MAX_BATCH = int(os.environ.get("INFER_MAX_BATCH", "16"))
+# How long the first request of a batch waits for company.
+BATCH_WAIT_S = float(os.environ.get("INFER_BATCH_WAIT_MS", "5")) / 1000
+
+
 def _softmax(logits: np.ndarray) -> np.ndarray:
-    e = np.exp(logits - logits.max())
-    return e / e.sum()
+    e = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
 
 
 @lru_cache(maxsize=1)
 def _get_session() -> ort.InferenceSession:
     model_path = os.environ.get("ONNX_MODEL_PATH", "../models/emotion_model.onnx")
+    threads = int(os.environ.get("ORT_INTRA_OP_THREADS", "0")) or cpu_limit()
 
     opts = ort.SessionOptions()
-    opts.intra_op_num_threads = 4
-    opts.inter_op_num_threads = 2
+    # One batch runs at a time, so give it every CPU the pod is allowed and
+    # no inter-op pool (the graph is a single chain).
+    opts.intra_op_num_threads = threads
+    opts.inter_op_num_threads = 1
     opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
     opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
 
@@ -56,21 +70,13 @@ def _get_session() -> ort.InferenceSession:
         path=model_path,
         input_name=input_info.name,
         input_shape=input_info.shape,
+        intra_op_threads=threads,
     )
     return session
 
 
-def predict_emotion(face_array: np.ndarray) -> dict[str, Any]:
-    """Run emotion inference on a (1, 3, 224, 224) float32 tensor.
-
-    NEVER logs face_array contents.
-    """
-    session = _get_session()
-    input_name = session.get_inputs()[0].name
-
-    raw_output = session.run(None, {input_name: face_array})[0]
-    logits = np.asarray(raw_output).reshape(-1)[: len(CLASSES)]
-    probs = _softmax(logits)
+def _to_result(logits: np.ndarray) -> dict[str, Any]:
+    probs = _softmax(logits[: len(CLASSES)])
 
     top_idx = int(np.argmax(probs))
     emotion = CLASSES[top_idx]
@@ -82,3 +88,117 @@ def predict_emotion(face_array: np.ndarray) -> dict[str, Any]:
         "genres": EMOTION_TO_GENRES[emotion],
         "message": EMOTION_MESSAGES[emotion],
     }
+
+
+def predict_emotion(face_array: np.ndarray) -> dict[str, Any]:
+    """Run emotion inference on a (1, 3, 224, 224) float32 tensor.
+
+    NEVER logs face_array contents.
+    """
+    session = _get_session()
+    input_name = session.get_inputs()[0].name
+
+    raw_output = session.run(None, {input_name: face_array})[0]
+    return _to_result(np.asarray(raw_output).reshape(-1))
+
+
+class EmotionBatcher:
+    """Groups concurrent `predict` calls into one dynamic-batch session run.
+
+    Callers' tensors are copied into a preallocated (MAX_BATCH, 3, 224, 224)
+    buffer that is bound to the session input with IO binding, so ORT reads
+    it in place. Batches run one at a time on a dedicated thread; requests
+    arriving meanwhile queue up and form the next batch. Models with a fixed
+    batch dimension of 1 get batches of one.
+
+    NEVER logs tensor contents.
+    """
+
+    def __init__(self, session: ort.InferenceSession) -> None:
+        inp = session.get_inputs()[0]
+        fixed = inp.shape[0] if isinstance(inp.shape[0], int) else None
+        self.max_batch = min(MAX_BATCH, fixed or MAX_BATCH)
+        self._session = session
+        self._input_name = inp.name
+        self._output_name = session.get_outputs()[0].name
+        self._buffer = np.empty((self.max_batch, *INPUT_SHAPE), dtype=np.float32)
+        self._binding = session.io_binding()
+        self._queue: asyncio.Queue[tuple[np.ndarray, asyncio.Future[dict[str, Any]]]] = (
+            asyncio.Queue()
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onnx")
+        self._task: asyncio.Task[None] | None = None
+        self._batch: list[tuple[np.ndarray, asyncio.Future[dict[str, Any]]]] = []
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+        self._task.add_done_callback(self._on_loop_exit)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def predict(self, face_array: np.ndarray) -> dict[str, Any]:
+        """Same result as `predict_emotion`, batched with concurrent callers."""
+        if self._task is None or self._task.done():
+            raise RuntimeError("Emotion batcher is not running")
+        future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+        await self._queue.put((face_array, future))
+        return await future
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Kept on self so `_on_loop_exit` can fail a batch cut off mid-way.
+            batch = self._batch = [await self._queue.get()]
+            deadline = loop.time() + BATCH_WAIT_S
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                try:
+                    batch.append(
+                        self._queue.get_nowait()
+                        if timeout <= 0
+                        else await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+
+            try:
+                for i, (face, _) in enumerate(batch):
+                    self._buffer[i] = face.reshape(INPUT_SHAPE)
+                logits = await loop.run_in_executor(self._executor, self._run, len(batch))
+                for row, (_, future) in zip(logits, batch, strict=True):
+                    if not future.done():
+                        future.set_result(_to_result(row))
+            except Exception as e:
+                # Fail this batch only; the loop keeps serving the next one.
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._batch = []
+
+    def _on_loop_exit(self, task: asyncio.Task[None]) -> None:
+        """Fail every caller still waiting once nothing is left to serve them."""
+        error = None if task.cancelled() else task.exception()
+        if error is not None:
+            structlog.get_logger().error("emotion_batcher_stopped", error=str(error))
+        pending = list(self._batch)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(error or RuntimeError("Emotion batcher stopped"))
+        self._batch = []
+
+    def _run(self, n: int) -> np.ndarray:
+        # The first n rows of the C-contiguous buffer are themselves
+        # contiguous, so the slice binds without a copy.
+        self._binding.bind_cpu_input(self._input_name, self._buffer[:n])
+        self._binding.bind_output(self._output_name, "cpu")
+        self._session.run_with_iobinding(self._binding)
+        return self._binding.copy_outputs_to_cpu()[0].reshape(n, -1)
@@ -0,0 +1,22 @@
+"""Resource limits of the container this service runs in."""
+import math
+import os
+from pathlib import Path
+
+
+def cpu_limit() -> int:
+    """CPUs this process may use: the cgroup quota if set, else the affinity mask."""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        if quota != "max":
+            return max(1, math.floor(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        quota_us = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period_us = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota_us > 0:
+            return max(1, math.floor(quota_us / period_us))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0))
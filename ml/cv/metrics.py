@@ -0,0 +1,25 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+stage_duration = Histogram(
+    "moviematch_cv_stage_duration_seconds",
+    "Time spent in each /detect stage",
+    ["stage"],
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5],
+)
+
+queue_wait = Histogram(
+    "moviematch_cv_queue_wait_seconds",
+    "Time a /detect job waited for a CPU worker",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0],
+)
+
+queue_depth = Gauge(
+    "moviematch_cv_queue_depth",
+    "/detect jobs admitted but not yet running on a CPU worker",
+)
+
+rejections = Counter(
+    "moviematch_cv_rejections_total",
+    "/detect requests answered 503 because the CPU stage was saturated",
+    ["reason"],
+)
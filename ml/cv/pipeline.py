@@ -0,0 +1,80 @@
+"""Bounded CPU stage for /detect.
+
+Decoding, face detection and crop preprocessing are synchronous OpenCV work
+(hundreds of ms for a large photo); run inline in the `async` handler they
+stall `/health` and every other upload. They run on a small private thread
+pool instead — OpenCV releases the GIL. Admission is capped at
+`CV_WORKERS + CV_MAX_QUEUE` jobs, and a job that waited longer than
+`CV_QUEUE_DEADLINE_MS` for a worker is dropped rather than run late. Both
+cases raise `PipelineBusyError`, which the service maps to 503.
+"""
+import asyncio
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+import metrics
+from limits import cpu_limit
+
+T = TypeVar("T")
+
+WORKERS = int(os.environ.get("CV_WORKERS", "0")) or cpu_limit()
+MAX_QUEUE = int(os.environ.get("CV_MAX_QUEUE", "8"))
+QUEUE_DEADLINE_S = float(os.environ.get("CV_QUEUE_DEADLINE_MS", "2000")) / 1000
+
+_executor: ThreadPoolExecutor | None = None
+_inflight = 0
+
+
+class PipelineBusyError(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="cv")
+    return _executor
+
+
+def _publish_depth() -> None:
+    metrics.queue_depth.set(max(_inflight - WORKERS, 0))
+
+
+async def run_cpu(fn: Callable[[], T]) -> T:
+    """Run `fn` on the CPU pool, or raise `PipelineBusyError` when saturated."""
+    global _inflight
+    if _inflight >= WORKERS + MAX_QUEUE:
+        metrics.rejections.labels(reason="queue_full").inc()
+        raise PipelineBusyError("queue_full")
+
+    enqueued = time.perf_counter()
+
+    def job() -> T:
+        waited = time.perf_counter() - enqueued
+        metrics.queue_wait.observe(waited)
+        if waited > QUEUE_DEADLINE_S:
+            raise PipelineBusyError("deadline")
+        return fn()
+
+    _inflight += 1
+    _publish_depth()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), job)
+    except PipelineBusyError as e:
+        metrics.rejections.labels(reason=e.reason).inc()
+        raise
+    finally:
+        _inflight -= 1
+        _publish_depth()
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,25 +1,113 @@
+import asyncio
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
 import cv2
 import numpy as np
 import structlog
 
+from detector import get_detector
+
 VIT_MEAN = np.array([0.5, 0.5, 0.5], dtype=np.float32)
 VIT_STD = np.array([0.5, 0.5, 0.5], dtype=np.float32)
 TARGET_SIZE = 224
 FACE_PADDING = 0.07
 MIN_FACE_SIZE = 15
 
-_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-_face_cascade = cv2.CascadeClassifier(_CASCADE_PATH)
-if _face_cascade.empty():
-    raise RuntimeError(f"Failed to load Haar cascade at {_CASCADE_PATH}")
+# Detection runs on a copy whose longer side is at most this; the box is
+# scaled back and the crop taken from the full-resolution decode.
+DETECT_MAX_SIDE = 640
+# Minimum face side at full resolution; never below the cascade's 24px window.
+MIN_DETECT_FACE = 30
+_CASCADE_WINDOW = 24
+# Spare output tensors kept for reuse; more are allocated under bursts.
+TENSOR_POOL_SIZE = 32
+
+_MEAN = VIT_MEAN.reshape(3, 1, 1)
+_STD = VIT_STD.reshape(3, 1, 1)
+_PIXEL_MAX = np.float32(255.0)
+
+_local = threading.local()
+
+
+class TensorPool:
+    """Reusable (1, 3, 224, 224) float32 model inputs.
+
+    A tensor is leased for a whole request: it is written on a CV worker
+    thread and read by the inference batcher later, so it cannot simply be
+    per-thread.
+    """
+
+    def __init__(self, size: int = TENSOR_POOL_SIZE) -> None:
+        self._size = size
+        self._free: list[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self) -> Iterator[np.ndarray]:
+        with self._lock:
+            tensor = self._free.pop() if self._free else None
+        if tensor is None:
+            tensor = np.empty((1, 3, TARGET_SIZE, TARGET_SIZE), dtype=np.float32)
+        try:
+            yield tensor
+        except asyncio.CancelledError:
+            # A worker thread may still be writing into it; let it go.
+            raise
+        except BaseException:
+            self._release(tensor)
+            raise
+        self._release(tensor)
 
+    def _release(self, tensor: np.ndarray) -> None:
+        with self._lock:
+            if len(self._free) < self._size:
+                self._free.append(tensor)
 
-def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray | None:
+
+def _resize_scratch() -> np.ndarray:
+    scratch = getattr(_local, "resized", None)
+    if scratch is None:
+        scratch = _local.resized = np.empty((TARGET_SIZE, TARGET_SIZE, 3), dtype=np.uint8)
+    return scratch
+
+
+def write_model_input(face_bgr: np.ndarray, out: np.ndarray) -> None:
+    """Resize a BGR face crop into `out` as normalised RGB planes.
+
+    Same arithmetic, in the same order and precision, as
+    `((rgb.astype(float32) / 255) - VIT_MEAN) / VIT_STD` transposed to NCHW,
+    so the result is bit-identical, without the intermediate copies.
+    """
+    resized = _resize_scratch()
+    cv2.resize(face_bgr, (TARGET_SIZE, TARGET_SIZE), dst=resized, interpolation=cv2.INTER_LINEAR)
+    planes = out[0]
+    for c in range(3):
+        # BGR -> RGB while widening to float32.
+        np.copyto(planes[c], resized[:, :, 2 - c], casting="unsafe")
+    np.divide(planes, _PIXEL_MAX, out=planes)
+    np.subtract(planes, _MEAN, out=planes)
+    np.divide(planes, _STD, out=planes)
+
+
+def preprocess_image_bytes(
+    image_bytes: bytes | bytearray,
+    timings: dict[str, float] | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray | None:
     """PRIVACY CONTRACT: bytes are processed in RAM only, never written or logged.
 
     Returns (1, 3, 224, 224) float32 ONNX-ready array, or None if no face found.
+    The array is `out` when given (e.g. leased from a `TensorPool`), else new.
+    When `timings` is given, the seconds spent in the "decode", "detect" and
+    "preprocess" stages are stored in it.
     """
     logger = structlog.get_logger()
+    if timings is None:
+        timings = {}
+    t0 = time.perf_counter()
 
     nparr = np.frombuffer(image_bytes, dtype=np.uint8)
     if nparr.size == 0:
@@ -31,20 +119,31 @@ def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray | None:
         logger.warning("image_decode_failed")
         return None
 
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    h, w = img_rgb.shape[:2]
+    t1 = time.perf_counter()
+    timings["decode"] = t1 - t0
+    h, w = img_bgr.shape[:2]
 
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-    faces = _face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=4,
-        minSize=(30, 30),
-    )
+    scale = min(1.0, DETECT_MAX_SIDE / max(h, w))
+    if scale < 1.0:
+        small = cv2.resize(
+            img_bgr,
+            (max(1, round(w * scale)), max(1, round(h * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+    else:
+        small = img_bgr
+    min_size = max(_CASCADE_WINDOW, round(MIN_DETECT_FACE * scale))
+    faces = get_detector().detect(small, min_size)
+    t2 = time.perf_counter()
+    timings["detect"] = t2 - t1
     if len(faces) == 0:
         logger.info("no_face_detected", image_wh=f"{w}x{h}")
         return None
 
+    faces = [
+        (int(x / scale), int(y / scale), int(fw / scale), int(fh / scale))
+        for x, y, fw, fh in faces
+    ]
     fx, fy, fw, fh = max(faces, key=lambda f: f[2] * f[3])
     confidence = 1.0
     pad_x = int(fw * FACE_PADDING)
@@ -59,12 +158,10 @@ def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray | None:
         logger.info("face_crop_too_small", crop=f"{crop_w}x{crop_h}")
         return None
 
-    face = img_rgb[y1:y2, x1:x2]
-    face = cv2.resize(face, (TARGET_SIZE, TARGET_SIZE), interpolation=cv2.INTER_LINEAR)
-    face = face.astype(np.float32) / 255.0
-    face = (face - VIT_MEAN) / VIT_STD
-
-    face = np.expand_dims(face.transpose(2, 0, 1), axis=0)
+    if out is None:
+        out = np.empty((1, 3, TARGET_SIZE, TARGET_SIZE), dtype=np.float32)
+    write_model_input(img_bgr[y1:y2, x1:x2], out)
+    timings["preprocess"] = time.perf_counter() - t2
 
     logger.info(
         "face_preprocessed",
@@ -72,4 +169,4 @@ def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray | None:
         face_size=f"{crop_w}x{crop_h}",
         image_size=f"{w}x{h}",
     )
-    return face.astype(np.float32)
+    return out
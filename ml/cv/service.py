@@ -1,27 +1,40 @@
 import time
+from collections.abc import Awaitable
 from contextlib import asynccontextmanager
 from typing import Any, AsyncIterator
 
 import structlog
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from prometheus_client import make_asgi_app
 from pydantic import BaseModel
 
-from inferencer import CLASSES, _get_session, predict_emotion
-from preprocess import preprocess_image_bytes
+import metrics
+import pipeline
+from detector import get_detector
+from inferencer import CLASSES, EmotionBatcher, _get_session
+from preprocess import TensorPool, preprocess_image_bytes
 
 MAX_SIZE = 5 * 1024 * 1024
 
+_tensors = TensorPool()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     structlog.get_logger().info("cv_service_starting")
-    _get_session()
-    structlog.get_logger().info("cv_service_ready")
+    batcher = EmotionBatcher(_get_session())
+    get_detector()
+    batcher.start()
+    app.state.batcher = batcher
+    structlog.get_logger().info("cv_service_ready", max_batch=batcher.max_batch)
     yield
+    await batcher.close()
+    pipeline.shutdown()
     structlog.get_logger().info("cv_service_stopped")
 
 
 app = FastAPI(title="MovieMatch CV Service", version="1.0.0", lifespan=lifespan)
+app.mount("/metrics", make_asgi_app())
 
 
 class EmotionResponse(BaseModel):
@@ -33,37 +46,79 @@ class EmotionResponse(BaseModel):
     processing_ms: int
 
 
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail={"code": "IMAGE_TOO_LARGE", "message": "Max 5MB"},
+    )
+
+
 @app.post("/detect", response_model=EmotionResponse)
-async def detect(image: UploadFile = File(...)) -> EmotionResponse:
+async def detect(request: Request, image: UploadFile = File(...)) -> EmotionResponse:
+    # One byte past the limit is enough to know it's too big.
+    return await _detect(request, image.read(MAX_SIZE + 1))
+
+
+@app.post("/detect/raw", response_model=EmotionResponse)
+async def detect_raw(request: Request) -> EmotionResponse:
+    """`/detect` with the image as the raw request body instead of multipart."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_SIZE:
+        raise _too_large()
+    return await _detect(request, _read_body(request))
+
+
+async def _read_body(request: Request) -> bytearray:
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_SIZE:
+            raise _too_large()
+    return body
+
+
+async def _detect(request: Request, read: Awaitable[bytes | bytearray]) -> EmotionResponse:
     start = time.perf_counter()
     logger = structlog.get_logger()
 
-    image_bytes = await image.read()
+    image_bytes = await read
     face_array: Any = None
-    try:
-        if len(image_bytes) > MAX_SIZE:
+    timings: dict[str, float] = {}
+    # The batcher copies the tensor into its batch before `predict` returns.
+    with _tensors.lease() as tensor:
+        try:
+            if len(image_bytes) > MAX_SIZE:
+                raise _too_large()
+
+            face_array = await pipeline.run_cpu(
+                lambda: preprocess_image_bytes(image_bytes, timings, tensor)
+            )
+        except pipeline.PipelineBusyError:
+            raise HTTPException(
+                status_code=503,
+                detail={"code": "CV_BUSY", "message": "Service is busy, retry shortly."},
+                headers={"Retry-After": "1"},
+            )
+        finally:
+            del image_bytes
+            for stage, seconds in timings.items():
+                metrics.stage_duration.labels(stage=stage).observe(seconds)
+
+        if face_array is None:
             raise HTTPException(
-                status_code=413,
-                detail={"code": "IMAGE_TOO_LARGE", "message": "Max 5MB"},
+                status_code=422,
+                detail={
+                    "code": "FACE_NOT_DETECTED",
+                    "message": "No face found. Use a clear, well-lit photo of your face.",
+                },
             )
 
-        face_array = preprocess_image_bytes(image_bytes)
-    finally:
-        del image_bytes
-
-    if face_array is None:
-        raise HTTPException(
-            status_code=422,
-            detail={
-                "code": "FACE_NOT_DETECTED",
-                "message": "No face found. Use a clear, well-lit photo of your face.",
-            },
-        )
-
-    try:
-        result = predict_emotion(face_array)
-    finally:
-        del face_array
+        infer_start = time.perf_counter()
+        try:
+            result = await request.app.state.batcher.predict(face_array)
+        finally:
+            del face_array
+        metrics.stage_duration.labels(stage="infer").observe(time.perf_counter() - infer_start)
 
     processing_ms = int((time.perf_counter() - start) * 1000)
     logger.info(
@@ -0,0 +1,88 @@
+"""Micro-benchmark: MovieLensDataset throughput in samples per second.
+
+Usage (from ml/recsys/):
+    uv run python bench_dataset.py [--movies 20000] [--users 5000] [--ratings 500000]
+
+Builds synthetic ratings and movie features shaped like `load_training_data`
+output (no database), then drains training batches two ways:
+
+- per-sample — `DataLoader(ds, batch_size)`: one `__getitem__` per rating
+               plus `default_collate`, the loader `train()` used to build
+- batched    — `make_loader(ds, batch_size)`: one vectorised `__getitem__`
+               call per batch of indices
+"""
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+from torch.utils.data import DataLoader
+
+import train
+from train import (
+    GENOME_DIM, ITEM_FEATURE_DIM, NLP_DIM, USER_FEATURE_DIM, MovieLensDataset,
+    build_item_matrices,
+)
+
+
+def _synthetic(n_movies: int, n_users: int, n_ratings: int) -> MovieLensDataset:
+    rng = np.random.default_rng(0)
+    movie_ids = np.arange(1, n_movies + 1) * 3
+    # Zipf-ish popularity, like real rating data.
+    weights = 1.0 / np.arange(1, n_movies + 1)
+    rated = rng.choice(movie_ids, size=n_ratings, p=weights / weights.sum())
+    users = rng.integers(0, n_users, size=n_ratings)
+    ratings = [
+        {"user_id": f"u{u}", "movie_id": int(m), "score": 4.5}
+        for u, m in zip(users.tolist(), rated.tolist())
+    ]
+
+    item_features = {int(m): rng.random(ITEM_FEATURE_DIM, dtype=np.float32) for m in movie_ids}
+    nlp = {int(m): rng.random(NLP_DIM, dtype=np.float32) for m in movie_ids}
+    genomes = {int(m): rng.random(GENOME_DIM, dtype=np.float32) for m in movie_ids}
+    user_ids = sorted({r["user_id"] for r in ratings})
+    user_feats = {u: rng.random(USER_FEATURE_DIM, dtype=np.float32) for u in user_ids}
+    history: dict[str, set[int]] = defaultdict(set)
+    for r in ratings:
+        history[r["user_id"]].add(r["movie_id"])
+
+    movie_map = {int(m): i + 1 for i, m in enumerate(movie_ids)}
+    return MovieLensDataset(
+        ratings, build_item_matrices(item_features, nlp, genomes, movie_map), user_feats,
+        {u: i + 1 for i, u in enumerate(user_ids)},
+        movie_map,
+        history,
+    )
+
+
+def _throughput(loader: DataLoader, max_batches: int) -> float:
+    seen = 0
+    start = time.perf_counter()
+    for i, batch in enumerate(loader):
+        seen += len(batch["pos_ids"])
+        if i + 1 >= max_batches:
+            break
+    return seen / (time.perf_counter() - start)
+
+
+def main(movies: int, users: int, ratings: int, batch_size: int, batches: int) -> None:
+    ds = _synthetic(movies, users, ratings)
+    loaders = {
+        "per-sample": DataLoader(ds, batch_size=batch_size, shuffle=True, drop_last=True),
+    }
+    if hasattr(train, "make_loader"):
+        loaders["batched"] = train.make_loader(ds, batch_size, shuffle=True)
+    print(f"{len(ds):,} ratings, {movies:,} movies, batch {batch_size}")
+    for name, loader in loaders.items():
+        print(f"  {name:<11} {_throughput(loader, batches):12,.0f} samples/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--ratings", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--batches", type=int, default=10)
+    args = parser.parse_args()
+    main(args.movies, args.users, args.ratings, args.batch_size, args.batches)
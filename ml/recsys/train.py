@@ -2,9 +2,8 @@
 import argparse
 import asyncio
 import os
-import random
 from collections import defaultdict
-from typing import Any
+from typing import Any, NamedTuple
 
 import asyncpg
 import mlflow
@@ -14,7 +13,9 @@ import pytorch_lightning as pl
 import torch
 from dotenv import load_dotenv
 from pytorch_lightning.callbacks import EarlyStopping, ModelCheckpoint
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import (
+    BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler,
+)
 
 from model import TwoTowerModel
 
@@ -229,13 +230,58 @@ def build_user_features(
     return user_features
 
 
+def _stack(
+    rows: dict, index: dict, n: int, dim: int, dtype: type = np.float32
+) -> np.ndarray:
+    """Rows of `rows` placed at `index[key]` in an (n + 1, dim) matrix; row 0
+    and keys missing from `rows` stay zero."""
+    out = np.zeros((n + 1, dim), dtype=dtype)
+    for key, i in index.items():
+        row = rows.get(key)
+        if row is not None:
+            out[i] = row
+    return out
+
+
+class ItemMatrices(NamedTuple):
+    """Per-movie (n_items + 1, d) matrices indexed by `movie_map`; built once
+    by `build_item_matrices` and shared by the train and val datasets."""
+
+    features: np.ndarray
+    nlp: np.ndarray
+    genome: np.ndarray
+
+
+def build_item_matrices(
+    item_features: dict[int, np.ndarray],
+    nlp_embeddings: dict[int, np.ndarray],
+    genomes: dict[int, np.ndarray],
+    movie_map: dict[int, int],
+) -> ItemMatrices:
+    n_items = len(movie_map)
+    return ItemMatrices(
+        features=_stack(item_features, movie_map, n_items, ITEM_FEATURE_DIM),
+        nlp=_stack(nlp_embeddings, movie_map, n_items, NLP_DIM),
+        genome=_stack(genomes, movie_map, n_items, GENOME_DIM),
+    )
+
+
 class MovieLensDataset(Dataset):
+    """Training examples (one per positive rating) backed by dense arrays.
+
+    Everything is indexed by the dense `movie_map` / `user_map` indices (0 is
+    padding): per-movie features, NLP vectors and genomes are (n_items + 1, d)
+    matrices, per-user inputs (n_users + 1, d) matrices, and each user's seen
+    movies a CSR row, so a batch is a handful of fancy-indexing gathers.
+
+    `ds[i]` returns one example; `ds[list_of_indices]` returns a whole batch
+    with negatives sampled for all rows at once — use `make_loader`.
+    """
+
     def __init__(
         self,
         ratings: list[dict[str, Any]],
-        item_features: dict[int, np.ndarray],
-        nlp_embeddings: dict[int, np.ndarray],
-        genomes: dict[int, np.ndarray],
+        items: ItemMatrices,
         user_features: dict[str, np.ndarray],
         user_map: dict[int, int],
         movie_map: dict[int, int],
@@ -243,90 +289,115 @@ class MovieLensDataset(Dataset):
         user_history_nlp: dict[str, np.ndarray] | None = None,
         user_sequence_ids: dict[str, np.ndarray] | None = None,
         neg_samples: int = NEG_SAMPLES,
+        seed: int | None = None,
     ) -> None:
-        self.ratings = ratings
-        self.item_features = item_features
-        self.nlp_embeddings = nlp_embeddings
-        self.genomes = genomes
-        self.user_features = user_features
-        self.user_map = user_map
-        self.movie_map = movie_map
-        self.user_history = user_history
-        self.user_history_nlp = user_history_nlp
-        self.user_sequence_ids = user_sequence_ids
         self.neg_samples = neg_samples
-        self.all_movie_ids = list(movie_map.keys())
-        self._zero_seq = np.zeros(HISTORY_TOP_N, dtype=np.int64)
-        self._zero_item = np.zeros(ITEM_FEATURE_DIM, dtype=np.float32)
-        self._zero_nlp = np.zeros(NLP_DIM, dtype=np.float32)
-        self._zero_genome = np.zeros(GENOME_DIM, dtype=np.float32)
-        self._zero_user = np.zeros(USER_FEATURE_DIM, dtype=np.float32)
+        self.n_items = len(movie_map)
+        self.rng = np.random.default_rng(seed)
 
-    def __len__(self) -> int:
-        return len(self.ratings)
+        # Per-example dense indices.
+        self.user_idx = np.fromiter(
+            (user_map.get(r["user_id"], 0) for r in ratings), dtype=np.int64, count=len(ratings)
+        )
+        self.pos_idx = np.fromiter(
+            (movie_map.get(r["movie_id"], 0) for r in ratings), dtype=np.int64, count=len(ratings)
+        )
 
-    def __getitem__(self, idx: int) -> dict[str, torch.Tensor]:
-        r = self.ratings[idx]
-        uid_str = str(r["user_id"])
-        uid = self.user_map.get(r["user_id"], 0)
-        mid = r["movie_id"]
-        pos_idx = self.movie_map.get(mid, 0)
-
-        seen = self.user_history.get(uid_str, set())
-        neg_ids: list[int] = []
-        neg_feats: list[np.ndarray] = []
-        neg_nlps: list[np.ndarray] = []
-        neg_genomes: list[np.ndarray] = []
-
-        attempts = 0
-        while len(neg_ids) < self.neg_samples and attempts < self.neg_samples * 4:
-            neg_mid = random.choice(self.all_movie_ids)
-            attempts += 1
-            if neg_mid in seen:
+        # Per-movie matrices, shared rather than copied.
+        self.item_feat_mat, self.nlp_mat, self.genome_mat = items
+
+        # Per-user matrices; the dicts are keyed by str(user_id).
+        user_keys = {str(uid): i for uid, i in user_map.items()}
+        n_users = len(user_map)
+        self.user_feat_mat = _stack(user_features, user_keys, n_users, USER_FEATURE_DIM)
+        self.history_nlp_mat = (
+            _stack(user_history_nlp, user_keys, n_users, NLP_DIM)
+            if user_history_nlp is not None
+            else None
+        )
+        self.sequence_mat = (
+            _stack(user_sequence_ids, user_keys, n_users, HISTORY_TOP_N, np.int64)
+            if user_sequence_ids is not None
+            else None
+        )
+
+        # Seen movies as sorted `user * (n_items + 1) + movie` keys: the CSR
+        # rows laid end to end, so membership for any (user, movie) pair is a
+        # single searchsorted over one array.
+        keys: list[np.ndarray] = []
+        for uid_str, seen in user_history.items():
+            u = user_keys.get(uid_str)
+            if u is None:
                 continue
-            neg_ids.append(self.movie_map.get(neg_mid, 0))
-            neg_feats.append(self.item_features.get(neg_mid, self._zero_item))
-            neg_nlps.append(self.nlp_embeddings.get(neg_mid, self._zero_nlp))
-            neg_genomes.append(self.genomes.get(neg_mid, self._zero_genome))
-        while len(neg_ids) < self.neg_samples:
-            neg_mid = random.choice(self.all_movie_ids)
-            neg_ids.append(self.movie_map.get(neg_mid, 0))
-            neg_feats.append(self.item_features.get(neg_mid, self._zero_item))
-            neg_nlps.append(self.nlp_embeddings.get(neg_mid, self._zero_nlp))
-            neg_genomes.append(self.genomes.get(neg_mid, self._zero_genome))
+            movies = np.fromiter((movie_map.get(m, 0) for m in seen), dtype=np.int64)
+            keys.append(u * (self.n_items + 1) + movies[movies > 0])
+        self.seen_keys = np.unique(np.concatenate(keys)) if keys else np.zeros(0, np.int64)
+
+    def __len__(self) -> int:
+        return len(self.pos_idx)
+
+    def sample_negatives(self, users: np.ndarray) -> np.ndarray:
+        """(len(users), neg_samples) movie indices, avoiding each user's seen movies.
+
+        Seen draws are redrawn up to 4 rounds; any still seen after that are
+        kept, so a user who has rated nearly everything cannot stall a batch.
+        """
+        shape = (len(users), self.neg_samples)
+        negs = self.rng.integers(1, self.n_items + 1, size=shape)
+        if not len(self.seen_keys):
+            return negs
+        row_base = (users * (self.n_items + 1))[:, None]
+        for _ in range(4):
+            cand = row_base + negs
+            pos = np.searchsorted(self.seen_keys, cand).clip(max=len(self.seen_keys) - 1)
+            clash = self.seen_keys[pos] == cand
+            n_clash = int(clash.sum())
+            if not n_clash:
+                break
+            negs[clash] = self.rng.integers(1, self.n_items + 1, size=n_clash)
+        return negs
+
+    def _batch(self, indices: np.ndarray) -> dict[str, torch.Tensor]:
+        users = self.user_idx[indices]
+        pos = self.pos_idx[indices]
+        negs = self.sample_negatives(users)
 
         out: dict[str, torch.Tensor] = {
-            "user_ids": torch.tensor(uid, dtype=torch.long),
-            "user_feats": torch.tensor(
-                self.user_features.get(uid_str, self._zero_user), dtype=torch.float32
-            ),
-            "pos_ids": torch.tensor(pos_idx, dtype=torch.long),
-            "pos_feats": torch.tensor(
-                self.item_features.get(mid, self._zero_item), dtype=torch.float32
-            ),
-            "pos_nlp": torch.tensor(
-                self.nlp_embeddings.get(mid, self._zero_nlp), dtype=torch.float32
-            ),
-            "pos_genome": torch.tensor(
-                self.genomes.get(mid, self._zero_genome), dtype=torch.float32
-            ),
-            "neg_ids": torch.tensor(neg_ids, dtype=torch.long),
-            "neg_feats": torch.tensor(np.array(neg_feats), dtype=torch.float32),
-            "neg_nlp": torch.tensor(np.array(neg_nlps), dtype=torch.float32),
-            "neg_genome": torch.tensor(np.array(neg_genomes), dtype=torch.float32),
+            "user_ids": torch.from_numpy(users),
+            "user_feats": torch.from_numpy(self.user_feat_mat[users]),
+            "pos_ids": torch.from_numpy(pos),
+            "pos_feats": torch.from_numpy(self.item_feat_mat[pos]),
+            "pos_nlp": torch.from_numpy(self.nlp_mat[pos]),
+            "pos_genome": torch.from_numpy(self.genome_mat[pos]),
+            "neg_ids": torch.from_numpy(negs),
+            "neg_feats": torch.from_numpy(self.item_feat_mat[negs]),
+            "neg_nlp": torch.from_numpy(self.nlp_mat[negs]),
+            "neg_genome": torch.from_numpy(self.genome_mat[negs]),
         }
-        if self.user_history_nlp is not None:
-            out["user_history_nlp"] = torch.tensor(
-                self.user_history_nlp.get(uid_str, self._zero_nlp),
-                dtype=torch.float32,
-            )
-        if self.user_sequence_ids is not None:
-            out["user_sequence_ids"] = torch.tensor(
-                self.user_sequence_ids.get(uid_str, self._zero_seq),
-                dtype=torch.long,
-            )
+        if self.history_nlp_mat is not None:
+            out["user_history_nlp"] = torch.from_numpy(self.history_nlp_mat[users])
+        if self.sequence_mat is not None:
+            out["user_sequence_ids"] = torch.from_numpy(self.sequence_mat[users])
         return out
 
+    def __getitem__(self, idx: int | list[int]) -> dict[str, torch.Tensor]:
+        if isinstance(idx, (int, np.integer)):
+            return {k: v[0] for k, v in self._batch(np.array([idx])).items()}
+        return self._batch(np.asarray(idx, dtype=np.int64))
+
+
+def make_loader(
+    ds: MovieLensDataset, batch_size: int, shuffle: bool, drop_last: bool = True
+) -> DataLoader:
+    """DataLoader that hands `ds` whole batches of indices (no per-sample collate)."""
+    sampler = RandomSampler(ds) if shuffle else SequentialSampler(ds)
+    return DataLoader(
+        ds,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=drop_last),
+        batch_size=None,
+        num_workers=0,
+    )
+
 
 async def _load_data(url: str) -> dict[str, Any]:
     pool = await asyncpg.create_pool(url, min_size=2, max_size=5)
@@ -439,26 +510,24 @@ def train(
         nonzero = int(np.count_nonzero(item_popularity > 1e-10))
         print(f"  popularity computed for {nonzero}/{len(item_popularity)} items")
 
+    # The genome matrix alone is ~280 MB at full catalogue size; build once.
+    items = build_item_matrices(item_features, nlp_embeddings, genomes, movie_map)
     train_ds = MovieLensDataset(
-        train_ratings, item_features, nlp_embeddings, genomes, train_user_features,
+        train_ratings, items, train_user_features,
         user_map, movie_map, user_history,
         user_history_nlp=train_history_nlp,
         user_sequence_ids=train_sequence_ids,
     )
     # val uses TRAIN-derived user features — model must predict val from train context only.
     val_ds = MovieLensDataset(
-        val_ratings, item_features, nlp_embeddings, genomes, train_user_features,
+        val_ratings, items, train_user_features,
         user_map, movie_map, user_history,
         user_history_nlp=train_history_nlp,
         user_sequence_ids=train_sequence_ids,
     )
 
-    train_loader = DataLoader(
-        train_ds, batch_size=batch_size, shuffle=True, num_workers=0, drop_last=True
-    )
-    val_loader = DataLoader(
-        val_ds, batch_size=batch_size, shuffle=False, num_workers=0, drop_last=True
-    )
+    train_loader = make_loader(train_ds, batch_size, shuffle=True)
+    val_loader = make_loader(val_ds, batch_size, shuffle=False)
 
     model = TwoTowerModel(
         n_users=len(user_map),